@@ -1,17 +1,16 @@
-
-from PySide2 import QtWidgets
-from ncachefactory.qtutils import dock_window_to_tab
-from ncachefactory.main import NCacheManager
-
-import maya.OpenMayaUI as omui
-from maya import cmds
-import os
-
+"""
+The package doesn't import anything at startup. The batch workers import
+only the modules they need and the interface (PySide2, OpenMayaUI) is loaded
+when the manager is launched.
+"""
 
 _ncachemanager_window = None
 
 
 def launch():
+    from ncachefactory.qtutils import dock_window_to_tab
+    from ncachefactory.main import NCacheManager
+
     global _ncachemanager_window
     dock = False
     if _ncachemanager_window is None:
@@ -19,4 +18,4 @@ def launch():
         _ncachemanager_window = NCacheManager()
     _ncachemanager_window.show(dockable=True)
     if dock is True:
-        dock_window_to_tab(_ncachemanager_window, "NEXDockControl")
\ No newline at end of file
+        dock_window_to_tab(_ncachemanager_window, "NEXDockControl")
@@ -67,3 +67,31 @@ def normalize_ranges(ranges):
         global_offset += offset - 1
         ranges[i] = [n - global_offset for n in ranges[i]]
     return ranges
+
+
+def group_by_shared_items(items_by_key):
+    """
+    This function receive a dict {key: [item, ...]} and return the keys
+    grouped when they share an item, directly or through other keys. A key
+    is an item of itself, a key listed in the items of another is grouped.
+    e.g. {'a': [1, 2], 'b': [2], 'c': [3]} -> [['a', 'b'], ['c']]
+    The groups are sorted and the keys too.
+    """
+    parents = {key: key for key in items_by_key}
+
+    def find(key):
+        while parents[key] != key:
+            parents[key] = parents[parents[key]]
+            key = parents[key]
+        return key
+
+    owners = {}
+    for key in sorted(items_by_key):
+        for item in [key] + list(items_by_key[key]):
+            owner = owners.setdefault(item, key)
+            parents[find(key)] = find(owner)
+
+    groups = {}
+    for key in items_by_key:
+        groups.setdefault(find(key), []).append(key)
+    return sorted(sorted(group) for group in groups.values())
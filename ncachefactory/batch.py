@@ -1,11 +1,31 @@
 import os
+import json
+import signal
 import subprocess
 import shutil
 import sys
+import threading
+import time
+from functools import partial
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
 
 from maya import cmds
+from ncachefactory.attributes import filter_invisible_nodes_for_manager
+from ncachefactory.ncache import DYNAMIC_NODES
 from ncachefactory.optionvars import MAYAPY_PATH_OPTIONVAR
-from ncachefactory.versioning import create_cacheversion
+from ncachefactory.versioning import (
+    CacheVersion, create_cacheversion, list_available_cacheversions,
+    get_last_checkpoint)
+from ncachefactory.timelimit import compute_timelimit_baseline
+from ncachefactory.scheduler import (
+    ScheduledJob, check_dependencies, find_outdated_directories)
+from ncachefactory.progress import ProgressReader
+from ncachefactory.telemetry import wait_process
+from ncachefactory.nucleus import (
+    export_dynamic_network, group_independent_nodes)
 
 
 _CURRENTDIR = os.path.dirname(os.path.realpath(__file__))
@@ -19,10 +39,330 @@ TEMPFOLDER_NAME = 'on_queue_scenes'
 WEDGINGFOLDER_NAME = 'wedging_scenes'
 BATCHSCENE_NAME = 'batch_scene_{}.ma'
 WEDGINGSCENE_NAME = 'scene_{}.ma'
+SLIMSCENE_EXTENSION = '.mb'
 WEDGING_COMMENT_TEMPLATE = """\
 Wedging Cache:
-  attribute {}
-  value {}"""
+{}"""
+WEDGING_COMMENT_LINE = "  {} = {}"
+WORKER_FLAG = '--worker'
+WORKER_MESSAGE_PREFIX = 'ncachefactory_worker:'
+FORK_WEDGES_FLAG = '--fork-wedges'
+FORK_JOBS_FLAG = '--fork-jobs'
+FORKED_PID_FILENAME = 'process.pid'
+FORKED_KILL_FILENAME = 'process.killed'
+FORKED_STATUS_FILENAME = 'process.status'
+CHECKPOINTS_FLAG = '--checkpoints'
+REFERENCE_FLAG = '--reference'
+TIMELIMIT_FACTOR_FLAG = '--timelimit-factor'
+TIMELIMIT_WARMUP_FLAG = '--timelimit-warmup'
+TIMELIMIT_BASELINE_FLAG = '--timelimit-baseline'
+CHECKPOINT_INTERVAL_FLAG = '--checkpoint-interval'
+RESUME_FLAG = '--resume'
+ISOLATE_FLAG = '--isolate'
+NO_PLAYBLAST_FLAG = '--no-playblast'
+PLAYBLAST_ONLY_FLAG = '--playblast-only'
+INPUTS_FLAG = '--inputs'
+DETECTORS_FLAG = '--detectors'
+ENCODINGS_FLAG = '--encodings'
+TARGETS_FLAG = '--targets'
+
+_worker_pool = None
+# flash duration in seconds and source scene by scene saved, they are
+# recorded in the cacheversion infos when the scene is sent.
+_flash_infos = {}
+
+
+class BatchJob(object):
+    """ This object is an handle on a job sent to a WorkerPool. The return
+    code is set by the worker when the job is done.
+    state is one of: 'pending', 'running', 'finished', 'failed' or 'killed'
+    """
+
+    def __init__(self, arguments):
+        self.arguments = arguments
+        self.state = 'pending'
+        self.worker = None
+        self.returncode = None
+
+    @property
+    def directory(self):
+        return self.arguments[0]
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        if self.state == 'pending':
+            self.state = 'killed'
+            self.returncode = -9
+        elif self.state == 'running':
+            self.worker.kill()
+
+
+class BatchProcess(object):
+    """ This object is an handle on a mayapy launched for one batch job.
+    When the platform provides os.wait4, the process is reaped with it and
+    his resource usage is added to the cacheversion infos (see the telemetry
+    module).
+    """
+
+    def __init__(self, arguments, environment):
+        self.directory = arguments[2]
+        self.process = subprocess.Popen(arguments, bufsize=-1, env=environment)
+        self.returncode = None
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def poll(self):
+        if self.returncode is not None:
+            return self.returncode
+        if not hasattr(os, 'wait4'):
+            self.returncode = self.process.poll()
+            return self.returncode
+        rusage = wait_process(self.process.pid, os.WNOHANG)
+        if rusage is None:
+            return None
+        self.returncode = rusage['returncode']
+        # the Popen object mustn't try to reap the process again.
+        self.process.returncode = self.returncode
+        CacheVersion(self.directory).add_rusage(rusage)
+        return self.returncode
+
+    def kill(self):
+        if self.poll() is None:
+            self.process.kill()
+
+
+class ProcessGroup(object):
+    """ This object is an handle on several processes recording the same
+    cacheversion. Each one cache a group of nodes which can be simulated
+    independently. The group is terminated when all the processes are
+    terminated, the first error code is returned.
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+
+    def poll(self):
+        returncodes = [process.poll() for process in self.processes]
+        if None in returncodes:
+            return None
+        return next((code for code in returncodes if code), 0)
+
+    def kill(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.kill()
+
+
+class BatchWorker(threading.Thread):
+    """ This thread own a persistent mayapy process launched in worker mode.
+    It takes the jobs in the pool queue, send them to the process and wait
+    for the end of the job before to take the next one. If the process dies
+    during a job (crash, explosion detected or job killed), the job is set
+    as killed and a new process is started.
+    """
+
+    def __init__(self, pool):
+        super(BatchWorker, self).__init__()
+        self.daemon = True
+        self.pool = pool
+        self.process = None
+        self.stopped = False
+
+    def run(self):
+        # start the mayapy before the first job to have it warm when the first
+        # job arrives.
+        self.ensure_process()
+        while True:
+            job = self.pool.queue.get()
+            if job is None:
+                with self.pool.lock:
+                    self.pool.stopping -= 1
+                    self.stopped = True
+                break
+            with self.pool.lock:
+                if job.state != 'pending':
+                    continue
+                job.state = 'running'
+                job.worker = self
+            self.ensure_process()
+            self.process.stdin.write(json.dumps(job.arguments) + '\n')
+            self.process.stdin.flush()
+            self.wait_for_job(job)
+        if self.process is not None:
+            self.process.stdin.close()
+
+    def ensure_process(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        self.process = subprocess.Popen(
+            self.pool.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=self.pool.environment,
+            universal_newlines=True)
+
+    def wait_for_job(self, job):
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                # the standard output is closed, the process is dead.
+                self.process.wait()
+                with self.pool.lock:
+                    job.state = 'killed'
+                    job.returncode = self.process.returncode or -9
+                self.process = None
+                return
+            # maya can print his own messages on the standard output, only the
+            # lines sent by the worker are considered.
+            if not line.startswith(WORKER_MESSAGE_PREFIX):
+                continue
+            message = json.loads(line[len(WORKER_MESSAGE_PREFIX):])
+            with self.pool.lock:
+                job.state = message['status']
+                job.returncode = 0 if job.state == 'finished' else 1
+            return
+
+    def kill(self):
+        if self.process is not None:
+            self.process.kill()
+
+
+class WorkerPool(object):
+    """ Pool of persistent mayapy. That avoid to pay for every batch job the
+    interpreter start, the maya initialization and the plugins loading.
+    """
+
+    def __init__(self, size, mayapy, environment):
+        self.command = [mayapy, _SCRIPT_FILEPATH, WORKER_FLAG]
+        self.environment = environment
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.workers = []
+        # number of None jobs queued and not received by a worker yet.
+        self.stopping = 0
+        self.resize(size)
+
+    @property
+    def size(self):
+        """ number of workers which will stay alive once the pending stops
+        are received """
+        with self.lock:
+            workers = [
+                worker for worker in self.workers
+                if worker.is_alive() and not worker.stopped]
+            return len(workers) - self.stopping
+
+    def resize(self, size):
+        count = self.size
+        with self.lock:
+            self.workers = [
+                worker for worker in self.workers
+                if worker.is_alive() and not worker.stopped]
+            # the workers in excess finish their current job and stop when
+            # they receive the None job.
+            for _ in range(count - size):
+                self.queue.put(None)
+                self.stopping += 1
+        for _ in range(size - count):
+            worker = BatchWorker(self)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, arguments):
+        job = BatchJob(arguments)
+        self.queue.put(job)
+        return job
+
+    def close(self):
+        """ let the workers process the jobs already sent and stop """
+        self.resize(0)
+
+    def terminate(self):
+        for _ in self.workers:
+            self.queue.put(None)
+            self.stopping += 1
+        for worker in self.workers:
+            worker.kill()
+        self.workers = []
+
+
+class ForkedJob(object):
+    """ This object is an handle on a wedging value processed by a child of
+    a mayapy launched with the --fork-wedges option. The child pid is written
+    by the parent mayapy in the cacheversion directory when it is forked.
+    """
+
+    def __init__(self, process, directory):
+        self.process = process
+        self.directory = directory
+        self.returncode = None
+
+    @property
+    def pid(self):
+        filename = os.path.join(self.directory, FORKED_PID_FILENAME)
+        if not os.path.exists(filename):
+            return None
+        with open(filename, 'r') as f:
+            return int(f.read())
+
+    def poll(self):
+        if self.returncode is not None:
+            return self.returncode
+        pid = self.pid
+        if pid is None:
+            # the child isn't forked yet, that's still pending except if the
+            # parent process died before.
+            if self.process.poll() is not None:
+                self.returncode = self.process.returncode or -9
+            return self.returncode
+        # the children aren't owned by this process, their exit status is
+        # written in the cacheversion directory by the parent.
+        filename = os.path.join(self.directory, FORKED_STATUS_FILENAME)
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                self.returncode = int(f.read())
+            return self.returncode
+        if self.process.poll() is not None:
+            # the parent died before to reap the child.
+            self.returncode = self.process.returncode or -9
+        return self.returncode
+
+    def kill(self):
+        pid = self.pid
+        if pid is None:
+            # the parent process check this file before to fork a wedging
+            # value and after to write the pid, the child is never recorded.
+            open(os.path.join(self.directory, FORKED_KILL_FILENAME), 'w').close()
+            pid = self.pid
+            if pid is None:
+                self.returncode = -9
+                return
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def get_worker_pool(size):
+    global _worker_pool
+    if _worker_pool is None:
+        mayapy = cmds.optionVar(query=MAYAPY_PATH_OPTIONVAR)
+        _worker_pool = WorkerPool(size, mayapy, copy_current_environment())
+    elif _worker_pool.size != size:
+        _worker_pool.resize(size)
+    return _worker_pool
+
+
+def close_worker_pool():
+    ''' the mayapy workers stop once the jobs already sent are done '''
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.close()
+    _worker_pool = None
 
 
 def build_unique_scene_name(workspace, scenename_template, foldername):
@@ -47,40 +387,111 @@ def copy_current_environment():
     return environment
 
 
-def save_scene_for_batch(workspace, scenename, folder):
-    currentname = cmds.file(query=True, sceneName=True)
+def save_scene_for_batch(
+        workspace, scenename, folder, slim=False, nodes=None, cameras=None):
+    ''' save the current scene in the given workspace folder. If slim is
+    True, only the dynamic network of the given nodes is exported as maya
+    binary, instead of the full scene.
+    '''
+    if slim is True:
+        scenename = os.path.splitext(scenename)[0] + SLIMSCENE_EXTENSION
     name = build_unique_scene_name(workspace, scenename, folder)
     folder = os.path.join(workspace, folder)
     filename = os.path.join(folder, name)
     if not os.path.exists(folder):
         os.makedirs(folder)
+    currentname = cmds.file(query=True, sceneName=True)
+    start_time = time.time()
+    if slim is True:
+        export_dynamic_network(filename, nodes, cameras)
+    else:
+        save_scene_copy(filename)
+    _flash_infos[filename] = {
+        'flash_time': time.time() - start_time,
+        'source_scene': currentname}
+    return filename
+
+
+def save_scene_copy(filename):
+    ''' save the current scene as maya ascii at the given path without
+    changing the current scene name '''
+    currentname = cmds.file(query=True, sceneName=True)
     cmds.file(rename=filename)
     cmds.file(save=True, type="mayaAscii")
     cmds.file(rename=currentname)
-    return filename
 
 
-def flash_current_scene(workspace):
-    return save_scene_for_batch(workspace, BATCHSCENE_NAME, TEMPFOLDER_NAME)
+def flash_current_scene(workspace, slim=False):
+    nodes = cameras = None
+    if slim is True:
+        nodes = filter_invisible_nodes_for_manager(cmds.ls(type=DYNAMIC_NODES))
+        # the playblast camera is chosen when the jobs are sent, all the
+        # cameras are kept in the scene.
+        cameras = cmds.ls(type='camera')
+    return save_scene_for_batch(
+        workspace, BATCHSCENE_NAME, TEMPFOLDER_NAME, slim=slim, nodes=nodes,
+        cameras=cameras)
+
+
+def get_batch_scene_infos(scene):
+    ''' this function collect the scene measures recorded in the
+    cacheversion infos to compare the full and the slim batch scenes.
+    '''
+    flash_infos = _flash_infos.pop(scene, {})
+    return {
+        'slim': scene.endswith(SLIMSCENE_EXTENSION),
+        'flash_time': flash_infos.get('flash_time'),
+        'source_scene': flash_infos.get('source_scene'),
+        'scene_size': os.path.getsize(scene)}
+
+
+def get_adaptive_timelimit(workspace, source_scene, factor, warmup):
+    ''' this function return the adaptive time limit options passed to the
+    batch script. The baseline is learned from the previous cacheversions
+    of the same source scene (see the timelimit module).
+    '''
+    if not factor:
+        return None
+    infos_list = [cv.infos for cv in list_available_cacheversions(workspace)]
+    return {
+        'factor': factor,
+        'warmup': warmup,
+        'baseline': compute_timelimit_baseline(infos_list, source_scene)}
 
 
 def send_batch_ncache_jobs(
         workspace, jobs, start_frame, end_frame, nodes, evaluate_every_frame,
         save_every_evaluation, playblast_viewport_options, timelimit,
-        stretchmax):
+        stretchmax, workers=0, timelimit_factor=0, timelimit_warmup=0,
+        checkpoint_interval=0, split_solvers=False, scheduler=None,
+        detectors=None):
     ''' this function precreate the python script and the folder where will
     be cached the giver jobs. A job is a dict containing tree key:
     {'name': str, 'comment': str, 'scene': str}
+    A job can contain the optional key 'depends_on': a list of names of other
+    jobs or existing cacheversions. Those are plugged as input shapes before
+    the cache. The jobs depending on other jobs are launched by the given
+    scheduler when those are finished (see the scheduler module).
+    If workers is superior to 0, the jobs are sent to a pool of persistent
+    mayapy, otherwise, a mayapy is launched per job.
+    If the timelimit factor is superior to 0, the jobs are killed when a
+    frame exceeds the median time per frame multiplied by the factor.
+    If the checkpoint interval is superior to 0, a checkpoint is saved every
+    n frames and the job can be resumed (see resume_batch_cacheversion).
+    If split_solvers is True, the nodes which can be simulated independently
+    are cached in parallel by several processes in the same cacheversion.
+    The splitted jobs don't save checkpoints.
+    The detectors are the explosion detectors settings run by the jobs (see
+    the detectors module).
     '''
+    dependencies = resolve_jobs_dependencies(workspace, jobs)
+    if scheduler is None and any(indexes for indexes, _ in dependencies):
+        raise ValueError("a scheduler is needed to send dependent jobs")
     processes = []
     cacheversions = []
-    # build the arguments list. The two None values are differents for every
-    # job and will be redefine during the loop
-    arguments = build_batch_script_arguments(
-        start_frame, end_frame, nodes, evaluate_every_frame,
-        save_every_evaluation, playblast_viewport_options, timelimit,
-        stretchmax)
     environment = copy_current_environment()
+    pool = get_worker_pool(workers) if workers > 0 else None
+    groups = group_independent_nodes(nodes) if split_solvers else [nodes]
     for job in jobs:
         cacheversion = create_cacheversion(
             workspace=workspace,
@@ -90,64 +501,295 @@ def send_batch_ncache_jobs(
             start_frame=start_frame,
             end_frame=end_frame)
         cacheversions.append(cacheversion)
-        scene = os.path.join(cacheversion.directory, NCACHESCENE_FILENAME)
+
+    for job, cacheversion, (indexes, directories) in zip(
+            jobs, cacheversions, dependencies):
+        # the slim scenes are saved as maya binary, the extension is kept.
+        extension = os.path.splitext(job['scene'])[-1]
+        scenename = os.path.splitext(NCACHESCENE_FILENAME)[0] + extension
+        scene = os.path.join(cacheversion.directory, scenename)
+        batch_infos = get_batch_scene_infos(job['scene'])
         os.rename(job['scene'], scene)
         cacheversion.set_scene(scene)
-        # replace the two arguments which are different for each jobs
-        arguments[2] = cacheversion.directory
-        arguments[3] = scene
-        process = subprocess.Popen(
-            arguments,
-            bufsize=-1,
-            env=environment)
-        processes.append(process)
+        cacheversion.set_batch_infos(**batch_infos)
+        adaptive_timelimit = get_adaptive_timelimit(
+            workspace, batch_infos['source_scene'], timelimit_factor,
+            timelimit_warmup)
+        upstreams = [cacheversions[i].directory for i in indexes]
+        inputs = upstreams + directories
+        if len(groups) > 1:
+            cacheversion.set_batch_infos(groups=groups)
+            arguments_list = []
+            for i, group in enumerate(groups):
+                # only the first group record the playblast.
+                arguments = build_batch_script_arguments(
+                    start_frame, end_frame, group, evaluate_every_frame,
+                    save_every_evaluation, playblast_viewport_options,
+                    timelimit, stretchmax, scene=scene,
+                    directory=cacheversion.directory,
+                    adaptive_timelimit=adaptive_timelimit, isolate=True,
+                    playblast=i == 0, inputs=inputs, detectors=detectors)
+                arguments_list.append(arguments)
+            launch = partial(
+                launch_batch_processes, arguments_list, environment, pool)
+        else:
+            arguments = build_batch_script_arguments(
+                start_frame, end_frame, nodes, evaluate_every_frame,
+                save_every_evaluation, playblast_viewport_options, timelimit,
+                stretchmax, scene=scene, directory=cacheversion.directory,
+                adaptive_timelimit=adaptive_timelimit,
+                checkpoint_interval=checkpoint_interval, inputs=inputs,
+                detectors=detectors)
+            # the script arguments are stored to be able to resume the job.
+            cacheversion.set_batch_infos(arguments=arguments[2:])
+            launch = partial(
+                launch_batch_process, arguments, environment, pool)
+        if scheduler is None:
+            processes.append(launch())
+            continue
+        progress = ProgressReader(cacheversion.directory)
+        scheduled_job = ScheduledJob(
+            cacheversion.directory, launch, upstreams, progress)
+        scheduler.add_job(scheduled_job)
+        processes.append(scheduled_job)
 
+    if scheduler is not None:
+        # the jobs without dependencies are launched immediately
+        scheduler.update()
     clean_batch_temp_folder(workspace)
     return cacheversions, processes
 
 
+def send_deferred_playblast_job(
+        cacheversion, nodes, start_frame, end_frame,
+        playblast_viewport_options):
+    ''' this function render the playblast of a cacheversion recorded in the
+    current scene without playblast. The scene is saved in the cacheversion
+    directory and a background mayapy connects the cache and renders the
+    playblast. The movie is added to the cacheversion when it's done. The
+    process is returned.
+    '''
+    scene = os.path.join(cacheversion.directory, NCACHESCENE_FILENAME)
+    save_scene_copy(scene)
+    cacheversion.set_scene(scene)
+    # the simulation options aren't used to render the playblast.
+    arguments = build_batch_script_arguments(
+        start_frame, end_frame, nodes, 1.0, 1, playblast_viewport_options,
+        timelimit=0, stretchmax=0, scene=scene,
+        directory=cacheversion.directory, playblast_only=True)
+    return BatchProcess(arguments, copy_current_environment())
+
+
+def send_outdated_cacheversions_jobs(workspace, scheduler, workers=0):
+    ''' this function recache the outdated cacheversions of the workspace: the
+    ones which use as input a cacheversion modified since (see the scheduler
+    module). They are launched by the scheduler after their outdated inputs.
+    The batch script arguments stored in the infos are used, the
+    cacheversions without are ignored.
+    '''
+    cacheversions = list_available_cacheversions(workspace)
+    infos = {cv.directory: cv.infos for cv in cacheversions}
+    cacheversions = {cv.directory: cv for cv in cacheversions}
+    directories = find_outdated_directories(infos)
+    mayapy = cmds.optionVar(query=MAYAPY_PATH_OPTIONVAR)
+    environment = copy_current_environment()
+    pool = get_worker_pool(workers) if workers > 0 else None
+    outdated_cacheversions = []
+    processes = []
+    for directory in directories:
+        cacheversion = cacheversions[directory]
+        arguments = cacheversion.infos.get('batch', {}).get('arguments')
+        if not arguments:
+            continue
+        arguments = [mayapy, _SCRIPT_FILEPATH] + arguments
+        launch = partial(launch_batch_process, arguments, environment, pool)
+        upstreams = [
+            input_['directory'] for input_ in cacheversion.infos['lineage']
+            if input_['directory'] in directories]
+        job = ScheduledJob(
+            directory, launch, upstreams, ProgressReader(directory))
+        scheduler.add_job(job)
+        outdated_cacheversions.append(cacheversion)
+        processes.append(job)
+    scheduler.update()
+    return outdated_cacheversions, processes
+
+
+def resolve_jobs_dependencies(workspace, jobs):
+    ''' this function return for each job a tuple: the indexes of the jobs
+    it depends on and the directories of the existing cacheversions it
+    depends on. A ValueError is raised if a dependency is invalid.
+    '''
+    names = [job['name'] for job in jobs]
+    cacheversions = None
+    dependencies = []
+    for index, job in enumerate(jobs):
+        indexes, directories = [], []
+        for name in job.get('depends_on', []):
+            if names.count(name) > 1:
+                msg = "several jobs named {}, the dependency is ambiguous"
+                raise ValueError(msg.format(name))
+            if name in names:
+                if names.index(name) == index:
+                    raise ValueError("{} depends on itself".format(name))
+                indexes.append(names.index(name))
+                continue
+            if cacheversions is None:
+                cacheversions = list_available_cacheversions(workspace)
+            matches = [cv for cv in cacheversions if cv.name == name]
+            if not matches:
+                raise ValueError("no job or cacheversion named " + name)
+            # the last modified version is used if the name is used twice.
+            matches.sort(key=lambda cv: cv.infos.get('modification_time'))
+            directories.append(matches[-1].directory)
+        dependencies.append((indexes, directories))
+    check_dependencies({
+        i: indexes for i, (indexes, _) in enumerate(dependencies)})
+    return dependencies
+
+
 def send_wedging_ncaches_jobs(
         workspace, name, start_frame, end_frame, nodes, evaluate_every_frame,
         save_every_evaluation, playblast_viewport_options, timelimit,
-        stretchmax, attribute, values):
+        stretchmax, overrides, design=None, workers=0, fork=False,
+        slim=False, checkpoints=None, reference=None, timelimit_factor=0,
+        timelimit_warmup=0, checkpoint_interval=0, detectors=None):
     ''' this function send on a maya batch multiple cache based on a wedging
-    attribute test. An attribute is specified and a list of values. The
-    launch one maya per value to process to create a cache version.
+    design. The overrides are a list of dict {attribute: value}, one maya
+    is launched per override to create a cache version. The design is the
+    description of the wedging stored in the cacheversions infos (see the
+    wedging module).
+    If fork is True and the platform support it, only one maya is launched.
+    It opens the scene once and forks itself for every override.
+    If slim is True, only the dynamic network of the nodes is sent.
+    The checkpoints are the frames where the successive halving scores are
+    recorded. The reference is a cacheversion directory used to compute the
+    divergence score (see the halving module).
+    If the timelimit factor is superior to 0, the jobs are killed when a
+    frame exceeds the median time per frame multiplied by the factor.
+    If the checkpoint interval is superior to 0, a checkpoint is saved every
+    n frames and the jobs can be resumed.
     '''
     processes = []
-    cacheversions = []
     environment = copy_current_environment()
-    scene = save_scene_for_batch(workspace, WEDGINGSCENE_NAME, WEDGINGFOLDER_NAME)
-    for value in values:
-        comment = WEDGING_COMMENT_TEMPLATE.format(attribute, value)
+    scene = save_scene_for_batch(
+        workspace, WEDGINGSCENE_NAME, WEDGINGFOLDER_NAME, slim=slim,
+        nodes=nodes, cameras=[playblast_viewport_options['camera']])
+    batch_infos = get_batch_scene_infos(scene)
+    adaptive_timelimit = get_adaptive_timelimit(
+        workspace, batch_infos['source_scene'], timelimit_factor,
+        timelimit_warmup)
+    cacheversions = create_wedging_cacheversions(
+        workspace, name, nodes, start_frame, end_frame, scene, overrides,
+        design, batch_infos)
+    if fork and is_fork_available():
+        return send_forked_wedging_job(
+            cacheversions, start_frame, end_frame, nodes, evaluate_every_frame,
+            save_every_evaluation, playblast_viewport_options, timelimit,
+            stretchmax, overrides, scene, environment, workers, checkpoints,
+            reference, adaptive_timelimit, checkpoint_interval, detectors)
+    pool = get_worker_pool(workers) if workers > 0 else None
+    for cacheversion, override in zip(cacheversions, overrides):
+        arguments = build_batch_script_arguments(
+            start_frame, end_frame, nodes, evaluate_every_frame,
+            save_every_evaluation, playblast_viewport_options,
+            timelimit, stretchmax, overrides=override, scene=scene,
+            directory=cacheversion.directory, checkpoints=checkpoints,
+            reference=reference, adaptive_timelimit=adaptive_timelimit,
+            checkpoint_interval=checkpoint_interval, detectors=detectors)
+        cacheversion.set_batch_infos(arguments=arguments[2:])
+        process = launch_batch_process(arguments, environment, pool)
+        processes.append(process)
+    return cacheversions, processes
+
+
+def create_wedging_cacheversions(
+        workspace, name, nodes, start_frame, end_frame, scene, overrides,
+        design, batch_infos):
+    cacheversions = []
+    for override in overrides:
         cacheversion = create_cacheversion(
             workspace=workspace,
             name=name,
-            comment=comment,
+            comment=build_wedging_comment(override),
             nodes=nodes,
             start_frame=start_frame,
             end_frame=end_frame,
             scene=scene)
+        cacheversion.set_batch_infos(**batch_infos)
+        cacheversion.set_wedging_infos(design, override)
         cacheversions.append(cacheversion)
+    return cacheversions
+
+
+def build_wedging_comment(overrides):
+    lines = [
+        WEDGING_COMMENT_LINE.format(attribute, value)
+        for attribute, value in sorted(overrides.items())]
+    return WEDGING_COMMENT_TEMPLATE.format('\n'.join(lines))
+
+
+def is_fork_available():
+    return sys.platform.startswith('linux') and hasattr(os, 'fork')
+
+
+def send_forked_wedging_job(
+        cacheversions, start_frame, end_frame, nodes, evaluate_every_frame,
+        save_every_evaluation, playblast_viewport_options, timelimit,
+        stretchmax, overrides, scene, environment, workers=0,
+        checkpoints=None, reference=None, adaptive_timelimit=None,
+        checkpoint_interval=0, detectors=None):
+    ''' this function launch one mayapy for the whole wedging. This one
+    forks after the scene loading to process every overrides. Workers is
+    used as maximum number of simulations running together (0 is no limit).
+    That returns one ForkedJob per cacheversion.
+    '''
+    wedges = []
+    for cacheversion, override in zip(cacheversions, overrides):
+        wedges.append([cacheversion.directory, override])
         arguments = build_batch_script_arguments(
             start_frame, end_frame, nodes, evaluate_every_frame,
             save_every_evaluation, playblast_viewport_options,
-            timelimit, stretchmax, attribute_override_name=attribute,
-            attribute_override_value=value, scene=scene,
-            directory=cacheversion.directory)
-        process = subprocess.Popen(
-            arguments,
-            env=environment,
-            bufsize=-1)
-        processes.append(process)
+            timelimit, stretchmax, overrides=override, scene=scene,
+            directory=cacheversion.directory, checkpoints=checkpoints,
+            reference=reference, adaptive_timelimit=adaptive_timelimit,
+            checkpoint_interval=checkpoint_interval, detectors=detectors)
+        # a wedge is resumed alone, without fork.
+        cacheversion.set_batch_infos(arguments=arguments[2:])
+    arguments.extend([FORK_WEDGES_FLAG, json.dumps(wedges)])
+    arguments.extend([FORK_JOBS_FLAG, str(workers)])
+    process = subprocess.Popen(arguments, bufsize=-1, env=environment)
+    processes = [
+        ForkedJob(process, cacheversion.directory)
+        for cacheversion in cacheversions]
     return cacheversions, processes
 
 
+def launch_batch_processes(arguments_list, environment, pool=None):
+    processes = [
+        launch_batch_process(arguments, environment, pool)
+        for arguments in arguments_list]
+    return ProcessGroup(processes)
+
+
+def launch_batch_process(arguments, environment, pool=None):
+    ''' launch the batch script in a new mayapy, or send it to the given
+    worker pool '''
+    # the pool can be closed before the launch of a scheduled job.
+    if pool is not None and pool.size > 0:
+        # the two first arguments are the mayapy and the script, the worker
+        # only need the script arguments.
+        return pool.submit(arguments[2:])
+    return BatchProcess(arguments, environment)
+
+
 def build_batch_script_arguments(
         start_frame, end_frame, nodes, evaluate_every_frame,
         save_every_evaluation, playblast_viewport_options, timelimit,
-        stretchmax, scene=None, directory=None, attribute_override_name="",
-        attribute_override_value=0.0):
+        stretchmax, scene=None, directory=None, overrides=None,
+        checkpoints=None, reference=None, adaptive_timelimit=None,
+        checkpoint_interval=0, isolate=False, playblast=True, inputs=None,
+        detectors=None, playblast_only=False):
     arguments = []
     # mayapy executable
     arguments.append(cmds.optionVar(query=MAYAPY_PATH_OPTIONVAR))
@@ -180,14 +822,65 @@ def build_batch_script_arguments(
     arguments.append(str(timelimit))
     # stretch max
     arguments.append(str(stretchmax))
-    # Attribute override name
-    arguments.append(attribute_override_name)
-    # Attribute overide value
-    arguments.append(str(attribute_override_value))
+    # attribute overrides
+    arguments.append(json.dumps(overrides or {}))
+    # successive halving options
+    if checkpoints:
+        arguments.extend([CHECKPOINTS_FLAG, ' '.join(map(str, checkpoints))])
+    if reference:
+        arguments.extend([REFERENCE_FLAG, reference])
+    # adaptive time limit options
+    if adaptive_timelimit:
+        arguments.extend([
+            TIMELIMIT_FACTOR_FLAG, str(adaptive_timelimit['factor']),
+            TIMELIMIT_WARMUP_FLAG, str(adaptive_timelimit['warmup'])])
+        if adaptive_timelimit['baseline'] is not None:
+            baseline = str(adaptive_timelimit['baseline'])
+            arguments.extend([TIMELIMIT_BASELINE_FLAG, baseline])
+    if checkpoint_interval:
+        arguments.extend([CHECKPOINT_INTERVAL_FLAG, str(checkpoint_interval)])
+    # independent groups options
+    if isolate:
+        arguments.append(ISOLATE_FLAG)
+    if not playblast:
+        arguments.append(NO_PLAYBLAST_FLAG)
+    # render the playblast of an existing cache
+    if playblast_only:
+        arguments.append(PLAYBLAST_ONLY_FLAG)
+    # cacheversions plugged as input shapes
+    if inputs:
+        arguments.extend([INPUTS_FLAG, json.dumps(inputs)])
+    # explosion detectors
+    if detectors:
+        arguments.extend([DETECTORS_FLAG, json.dumps(detectors)])
+    # playblast encoding presets
+    encodings = playblast_viewport_options.get('encodings')
+    if encodings:
+        arguments.extend([ENCODINGS_FLAG, json.dumps(encodings)])
+    # additional cameras and resolutions captured
+    targets = playblast_viewport_options.get('targets')
+    if targets:
+        arguments.extend([TARGETS_FLAG, json.dumps(targets)])
 
     return arguments
 
 
+def resume_batch_cacheversion(cacheversion):
+    ''' this function relaunch an interrupted batch cache from his last
+    checkpoint. That use the script arguments stored in the infos. The
+    process is returned.
+    '''
+    arguments = cacheversion.infos.get('batch', {}).get('arguments')
+    if not arguments:
+        raise ValueError("no batch arguments stored for " + cacheversion.name)
+    if get_last_checkpoint(cacheversion.directory)[1] is None:
+        raise ValueError("no checkpoint saved for " + cacheversion.name)
+    mayapy = cmds.optionVar(query=MAYAPY_PATH_OPTIONVAR)
+    arguments = [mayapy, _SCRIPT_FILEPATH] + arguments + [RESUME_FLAG]
+    environment = copy_current_environment()
+    return BatchProcess(arguments, environment)
+
+
 def clean_batch_temp_folder(workspace):
     shutil.rmtree(os.path.join(workspace, TEMPFOLDER_NAME))
 
@@ -205,6 +898,6 @@ def list_temp_multi_scenes(workspace):
     tempfolder = os.path.join(workspace, TEMPFOLDER_NAME)
     scenes = []
     for scene in os.listdir(tempfolder):
-        if scene.endswith('.ma'):
+        if scene.endswith(('.ma', SLIMSCENE_EXTENSION)):
             scenes.append(os.path.join(tempfolder, scene))
     return scenes
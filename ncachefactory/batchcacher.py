@@ -1,5 +1,6 @@
 
 import os
+import random
 from functools import partial
 
 from PySide2 import QtWidgets, QtCore, QtGui
@@ -10,11 +11,28 @@ from ncachefactory.attributes import (
     list_wedgable_attributes, list_channelbox_highlited_plugs)
 from ncachefactory.batch import (
     clean_batch_temp_folder, flash_current_scene, list_temp_multi_scenes,
-    is_temp_folder_empty, BATCHCACHE_NAME, WEDGINGCACHE_NAME)
+    is_temp_folder_empty, is_fork_available, BATCHCACHE_NAME,
+    WEDGINGCACHE_NAME)
 from ncachefactory.optionvars import (
     EXPLOSION_TOLERENCE_OPTIONVAR, EXPLOSION_DETECTION_OPTIONVAR,
-    TIMELIMIT_ENABLED_OPTIONVAR, TIMELIMIT_OPTIONVAR, ensure_optionvars_exists)
+    TIMELIMIT_ENABLED_OPTIONVAR, TIMELIMIT_OPTIONVAR, BATCH_WORKERS_OPTIONVAR,
+    BATCH_FORK_WEDGING_OPTIONVAR, BATCH_SLIM_SCENES_OPTIONVAR,
+    BATCH_CHECKPOINT_INTERVAL_OPTIONVAR, BATCH_SPLIT_SOLVERS_OPTIONVAR,
+    BATCH_MEMORY_LIMIT_OPTIONVAR,
+    ADAPTIVE_TIMELIMIT_ENABLED_OPTIONVAR, ADAPTIVE_TIMELIMIT_FACTOR_OPTIONVAR,
+    ADAPTIVE_TIMELIMIT_WARMUP_OPTIONVAR, NOT_FINITE_DETECTION_OPTIONVAR,
+    VELOCITY_DETECTION_OPTIONVAR, VELOCITY_LIMIT_OPTIONVAR,
+    BOUNDING_BOX_DETECTION_OPTIONVAR, BOUNDING_BOX_LIMIT_OPTIONVAR,
+    SELF_PENETRATION_DETECTION_OPTIONVAR, SELF_PENETRATION_LIMIT_OPTIONVAR,
+    DETECTORS_STRIDE_OPTIONVAR, DETECTORS_BUDGET_OPTIONVAR,
+    ensure_optionvars_exists)
 from ncachefactory.arrayutils import compute_wedging_values
+from ncachefactory.wedging import (
+    compute_wedging_design, build_design_infos, DESIGN_METHODS, GRID)
+from ncachefactory.halving import METRICS
+from ncachefactory.detectors import (
+    NOT_FINITE, VELOCITY, BOUNDING_BOX, SELF_PENETRATION)
+from ncachefactory.versioning import list_available_cacheversions
 
 
 ATTRIBUTEPICKER_WINDOW_NAME = "Pick plug from selection"
@@ -29,7 +47,7 @@ class BatchCacher(QtWidgets.QWidget):
 
     def __init__(self, parent=None):
         super(BatchCacher, self).__init__(parent)
-        self.setFixedHeight(350)
+        self.setFixedHeight(800)
         self.workspace = None
         self.selection_model = None
         self.model = MultiCacheTableModel()
@@ -85,6 +103,55 @@ class BatchCacher(QtWidgets.QWidget):
         self._values_builder.setToolTip("Build value list")
         self._values_builder.setFixedSize(18, 18)
         self._values_builder.released.connect(self._call_values_builder)
+        self._add_parameter = QtWidgets.QPushButton("+")
+        self._add_parameter.setToolTip("Add attribute and values to design")
+        self._add_parameter.setFixedSize(18, 18)
+        self._add_parameter.released.connect(self._call_add_parameter)
+        self.parameters_model = WedgingParametersTableModel()
+        self.parameters_table = WedgingParametersTableView()
+        self.parameters_table.set_model(self.parameters_model)
+        self._remove_parameter = QtWidgets.QAction(get_icon("trash.png"), '', self)
+        self._remove_parameter.setToolTip("Remove selected parameters")
+        method = self._call_remove_selected_parameters
+        self._remove_parameter.triggered.connect(method)
+        self.parameters_toolbar = QtWidgets.QToolBar()
+        self.parameters_toolbar.setIconSize(QtCore.QSize(15, 15))
+        self.parameters_toolbar.addAction(self._remove_parameter)
+        self._method = QtWidgets.QComboBox()
+        self._method.addItems(DESIGN_METHODS)
+        self._method.currentIndexChanged.connect(self.update_wedging_tabs_states)
+        self._budget = QtWidgets.QSpinBox()
+        self._budget.setMinimum(0)
+        self._budget.setMaximum(10000)
+        self._budget.setValue(16)
+        text = (
+            "Maximum number of jobs sent.\nThe grid design accept 0 as no "
+            "limit,\nthe random designs use the values min and max.")
+        self._budget.setToolTip(text)
+        self._budget.valueChanged.connect(self.update_wedging_tabs_states)
+        self._wedging_design = None
+        self._wedging_overrides = None
+        self._halving = QtWidgets.QCheckBox("Successive halving")
+        text = (
+            "Rank the wedging caches at checkpoint frames (20%, 40%, 80% of "
+            "the range)\nand kill the worst ones. The survivors continue to "
+            "the next checkpoint.")
+        self._halving.setToolTip(text)
+        self._halving.stateChanged.connect(self.update_halving_states)
+        self._halving_metric = QtWidgets.QComboBox()
+        self._halving_metric.addItems(METRICS)
+        self._halving_keep_ratio = QtWidgets.QDoubleSpinBox()
+        self._halving_keep_ratio.setMinimum(0.1)
+        self._halving_keep_ratio.setMaximum(0.9)
+        self._halving_keep_ratio.setSingleStep(0.1)
+        self._halving_keep_ratio.setValue(0.5)
+        self._halving_keep_ratio.setToolTip("Fraction kept at each checkpoint")
+        self._halving_reference = QtWidgets.QComboBox()
+        text = (
+            "Cacheversion compared for the divergence metric.\nIt must have "
+            "points snapshots at the same checkpoints.")
+        self._halving_reference.setToolTip(text)
+        self.update_halving_states()
 
         self.cache_wedging = QtWidgets.QPushButton("Cache all")
         method = partial(self._send_wedging_cache, selection=False)
@@ -107,6 +174,15 @@ class BatchCacher(QtWidgets.QWidget):
         self.values_layout.setSpacing(0)
         self.values_layout.addWidget(self._values)
         self.values_layout.addWidget(self._values_builder)
+        self.values_layout.addWidget(self._add_parameter)
+
+        self.design_layout = QtWidgets.QHBoxLayout()
+        self.design_layout.setContentsMargins(0, 0, 0, 0)
+        self.design_layout.addWidget(self._method)
+        self.design_layout.addWidget(QtWidgets.QLabel("Budget"))
+        self.design_layout.addWidget(self._budget)
+        self.design_layout.addStretch(1)
+        self.design_layout.addWidget(self.parameters_toolbar)
 
         self.wedging = QtWidgets.QWidget()
         self.wedging_form = QtWidgets.QFormLayout()
@@ -117,6 +193,17 @@ class BatchCacher(QtWidgets.QWidget):
         self.wedging_layout = QtWidgets.QVBoxLayout(self.wedging)
         self.wedging_layout.setSpacing(2)
         self.wedging_layout.addLayout(self.wedging_form)
+        self.wedging_layout.addWidget(self.parameters_table)
+        self.wedging_layout.addLayout(self.design_layout)
+        self.halving_layout = QtWidgets.QHBoxLayout()
+        self.halving_layout.setContentsMargins(0, 0, 0, 0)
+        self.halving_layout.addWidget(self._halving)
+        self.halving_layout.addWidget(self._halving_metric)
+        self.halving_layout.addWidget(QtWidgets.QLabel("Keep"))
+        self.halving_layout.addWidget(self._halving_keep_ratio)
+        self.halving_layout.addWidget(QtWidgets.QLabel("Reference"))
+        self.halving_layout.addWidget(self._halving_reference)
+        self.wedging_layout.addLayout(self.halving_layout)
         self.wedging_layout.addWidget(self.cache_wedging_selection)
         self.wedging_layout.addWidget(self.cache_wedging)
 
@@ -130,12 +217,21 @@ class BatchCacher(QtWidgets.QWidget):
         self.killer_group = QtWidgets.QGroupBox('Auto kill simulation options')
         self.killer_group.setLayout(self.options_layout)
 
+        self.batch_options = BatchOptions()
+        self.batch_options_layout = QtWidgets.QHBoxLayout()
+        self.batch_options_layout.addWidget(self.batch_options)
+        self.batch_group = QtWidgets.QGroupBox('Batch options')
+        self.batch_group.setLayout(self.batch_options_layout)
+
         self.layout = QtWidgets.QVBoxLayout(self)
         self.layout.addWidget(self.tabwidget)
         self.layout.addWidget(self.killer_group)
+        self.layout.addWidget(self.batch_group)
+        self.update_wedging_tabs_states()
 
     def set_workspace(self, workspace):
         self.workspace = workspace
+        self.update_halving_references()
         if self.model and self.model.jobs:
             self.model.clear_jobs()
         if is_temp_folder_empty(self.workspace):
@@ -155,29 +251,81 @@ class BatchCacher(QtWidgets.QWidget):
         self.cache_selection.setEnabled(False)
 
     def update_wedging_tabs_states(self, *signals_args):
-        enable = all([
-            self._wedging_name.text() != "",
+        enable = self.is_parameter_valid()
+        self._add_parameter.setEnabled(enable)
+        enable = self._wedging_name.text() != "" and (
+            enable or bool(self.parameters_model.parameters))
+        self.cache_wedging.setEnabled(enable)
+        self.cache_wedging_selection.setEnabled(enable)
+
+    def update_halving_states(self, *signals_args):
+        enable = self._halving.isChecked()
+        self._halving_metric.setEnabled(enable)
+        self._halving_keep_ratio.setEnabled(enable)
+        self._halving_reference.setEnabled(enable)
+
+    def update_halving_references(self):
+        self._halving_reference.clear()
+        self._halving_reference.addItem("None", None)
+        if self.workspace is None or not os.path.exists(self.workspace):
+            return
+        for cacheversion in list_available_cacheversions(self.workspace):
+            self._halving_reference.addItem(
+                cacheversion.name, cacheversion.directory)
+
+    def is_parameter_valid(self):
+        return all([
             cmds.objExists(self._attribute.text()),
             self._values.text().split(",") != [""],
             all([is_float(n) for n in self._values.text().split(",")])])
-        self.cache_wedging.setEnabled(enable)
-        self.cache_wedging_selection.setEnabled(enable)
 
     @property
     def jobs(self):
         return self.model.jobs
 
-    @property
-    def attribute(self):
-        return self._attribute.text()
-
     @property
     def wedging_name(self):
         return self._wedging_name.text()
 
     @property
     def wedging_values(self):
-        return map(float, self._values.text().split(","))
+        return list(map(float, self._values.text().split(",")))
+
+    @property
+    def wedging_parameters(self):
+        """ the parameters added to the table. If the table is empty, the
+        attribute and values currently filled are used """
+        if self.parameters_model.parameters:
+            return self.parameters_model.parameters
+        return [{'attribute': self._attribute.text(),
+                 'values': self.wedging_values}]
+
+    @property
+    def wedging_design(self):
+        """ the design infos of the last wedging sent """
+        return self._wedging_design
+
+    @property
+    def wedging_overrides(self):
+        """ the overrides computed for the last wedging sent """
+        return self._wedging_overrides
+
+    @property
+    def halving_enabled(self):
+        return self._halving.isChecked()
+
+    @property
+    def halving_metric(self):
+        return self._halving_metric.currentText()
+
+    @property
+    def halving_keep_ratio(self):
+        return self._halving_keep_ratio.value()
+
+    @property
+    def halving_reference(self):
+        return self._halving_reference.itemData(
+            self._halving_reference.currentIndex())
 
     def _call_remove_selected_jobs(self):
         jobs = self.table.selected_jobs
@@ -192,7 +340,8 @@ class BatchCacher(QtWidgets.QWidget):
     def _call_flash_scene(self):
         if self.workspace is None:
             return
-        scene = flash_current_scene(self.workspace)
+        slim = self.batch_options.slim_scenes
+        scene = flash_current_scene(self.workspace, slim=slim)
         job = {'name': BATCHCACHE_NAME, 'comment': '', 'scene': scene}
         self.model.add_job(job)
         self.cache_all.setEnabled(bool(self.model.jobs))
@@ -213,6 +362,23 @@ class BatchCacher(QtWidgets.QWidget):
         self._attribute.setText(plugs[-1])
         self.update_wedging_tabs_states()
 
+    def _call_add_parameter(self):
+        parameter = {
+            'attribute': self._attribute.text(),
+            'values': self.wedging_values}
+        attributes = [p['attribute'] for p in self.parameters_model.parameters]
+        if parameter['attribute'] in attributes:
+            return cmds.warning("attribute already added to the design")
+        self.parameters_model.add_parameter(parameter)
+        self._attribute.setText("")
+        self._values.setText("")
+        self.update_wedging_tabs_states()
+
+    def _call_remove_selected_parameters(self):
+        for parameter in self.parameters_table.selected_parameters or []:
+            self.parameters_model.remove_parameter(parameter)
+        self.update_wedging_tabs_states()
+
     def _call_values_builder(self):
         dialog = ValuesBuilder()
         result = dialog.exec_()
@@ -222,14 +388,29 @@ class BatchCacher(QtWidgets.QWidget):
         self.update_wedging_tabs_states()
 
     def _send_wedging_cache(self, selection=False):
-        if not cmds.objExists(self._attribute.text()):
-            return QtWidgets.QMessageBox.warning(
-                None, "Error", "Attribute specified doesn't exists.")
+        if not self.parameters_model.parameters:
+            if not cmds.objExists(self._attribute.text()):
+                return QtWidgets.QMessageBox.warning(
+                    None, "Error", "Attribute specified doesn't exists.")
+            try:
+                self.wedging_values
+            except:
+                return QtWidgets.QMessageBox.warning(
+                    None, "Error",
+                    "Invalid wedging values. Must be list of float")
+        parameters = self.wedging_parameters
+        method = self._method.currentText()
+        budget = self._budget.value()
+        # the seed is recorded in the design to be able to reproduce it.
+        seed = None if method == GRID else random.randint(0, 999999)
         try:
-            self.wedging_values
-        except:
-            return QtWidgets.QMessageBox.warning(
-                None, "Error", "Invalid wedging values. Must be list of float")
+            overrides = compute_wedging_design(
+                parameters, method=method, budget=budget, seed=seed)
+        except ValueError as e:
+            return QtWidgets.QMessageBox.warning(None, "Error", str(e))
+        self._wedging_overrides = overrides
+        self._wedging_design = build_design_infos(
+            parameters, method=method, budget=budget, seed=seed)
         if selection is True:
             self.sendWedgingCacheSelectionRequested.emit()
         else:
@@ -276,8 +457,9 @@ class MultiCacheTableView(QtWidgets.QTableView):
 
 
 class MultiCacheTableModel(QtCore.QAbstractTableModel):
-    HEADERS = "Name", "Comment", "Scene"
-    KEYS = "name", "comment", "scene"
+    HEADERS = "Name", "Comment", "Depends on", "Scene"
+    KEYS = "name", "comment", "depends_on", "scene"
+    EDITABLE_KEYS = "name", "comment", "depends_on"
 
     def __init__(self, parent=None):
         super(MultiCacheTableModel, self).__init__(parent)
@@ -316,6 +498,9 @@ class MultiCacheTableModel(QtCore.QAbstractTableModel):
         if role != QtCore.Qt.EditRole:
             return
         row, column = index.row(), index.column()
+        if self.KEYS[column] == 'depends_on':
+            # the dependencies are edited as names separated by comma.
+            data = [name.strip() for name in data.split(',') if name.strip()]
         self.layoutAboutToBeChanged.emit()
         self.jobs[row][self.KEYS[column]] = data
         self.layoutChanged.emit()
@@ -323,7 +508,7 @@ class MultiCacheTableModel(QtCore.QAbstractTableModel):
 
     def flags(self, index):
         flags = QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
-        if index.column() < 2:
+        if self.KEYS[index.column()] in self.EDITABLE_KEYS:
             flags |= QtCore.Qt.ItemIsEditable
         return flags
 
@@ -332,7 +517,90 @@ class MultiCacheTableModel(QtCore.QAbstractTableModel):
             return
         row, column = index.row(), index.column()
         if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            if self.KEYS[column] == 'depends_on':
+                return ', '.join(self.jobs[row].get('depends_on', []))
             return self.jobs[row][self.KEYS[column]]
+        if role == QtCore.Qt.ToolTipRole and self.KEYS[column] == 'depends_on':
+            return (
+                "Names of the jobs or cacheversions plugged as input shapes."
+                "\nThe job is launched when the jobs it depends on are done.")
+
+
+class WedgingParametersTableView(QtWidgets.QTableView):
+
+    def __init__(self, parent=None):
+        super(WedgingParametersTableView, self).__init__(parent)
+        self._model = None
+        self._selection_model = None
+        self.configure()
+
+    def configure(self):
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setAlternatingRowColors(True)
+        self.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.setFocusPolicy(QtCore.Qt.NoFocus)
+        mode = QtWidgets.QHeaderView.ResizeToContents
+        self.verticalHeader().setSectionResizeMode(mode)
+        self.horizontalHeader().setStretchLastSection(True)
+
+    @property
+    def selected_parameters(self):
+        if self._model is None:
+            return
+        indexes = self._selection_model.selectedIndexes()
+        if not indexes:
+            return None
+        indexes = [i.row() for i in indexes if i.column() == 0]
+        return [self._model.parameters[i] for i in indexes]
+
+    def set_model(self, model):
+        self.setModel(model)
+        self._model = model
+        self._selection_model = self.selectionModel()
+
+
+class WedgingParametersTableModel(QtCore.QAbstractTableModel):
+    HEADERS = "Attribute", "Values"
+
+    def __init__(self, parent=None):
+        super(WedgingParametersTableModel, self).__init__(parent)
+        self.parameters = []
+
+    def add_parameter(self, parameter):
+        self.layoutAboutToBeChanged.emit()
+        self.parameters.append(parameter)
+        self.layoutChanged.emit()
+
+    def remove_parameter(self, parameter):
+        self.layoutAboutToBeChanged.emit()
+        self.parameters.remove(parameter)
+        self.layoutChanged.emit()
+
+    def columnCount(self, _=None):
+        return len(self.HEADERS)
+
+    def rowCount(self, _=None):
+        return len(self.parameters)
+
+    def headerData(self, section, orientation, role):
+        if role != QtCore.Qt.DisplayRole:
+            return
+        if orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        else:
+            return str(section + 1)
+
+    def data(self, index, role):
+        if not index.isValid():
+            return
+        row, column = index.row(), index.column()
+        if role == QtCore.Qt.DisplayRole:
+            parameter = self.parameters[row]
+            if column == 0:
+                return parameter['attribute']
+            return ", ".join(map(str, parameter['values']))
 
 
 def get_clean_tempfile_confirmation_dialog():
@@ -353,7 +621,7 @@ class SimulationKillerOptions(QtWidgets.QWidget):
     def __init__(self, parent=None):
         super(SimulationKillerOptions, self).__init__(parent)
 
-        text = 'detect edge to streched (cloth only)'
+        text = 'detect edge to streched (cloth and hair)'
         self._detect_explosion = QtWidgets.QCheckBox(text)
         self._explosion_tolerance = QtWidgets.QSlider(QtCore.Qt.Horizontal)
         self._explosion_tolerance.setMinimum(2)
@@ -378,12 +646,106 @@ class SimulationKillerOptions(QtWidgets.QWidget):
         self._timelimit_layout.addWidget(self._timelimit_enable)
         self._timelimit_layout.addWidget(self._timelimit)
 
+        text = 'x median time per frame'
+        self._adaptive_timelimit_enable = QtWidgets.QCheckBox(text)
+        text = (
+            "Kill the simulation when a frame is slower than the median time "
+            "per frame\nmultiplied by this factor. During the warm up, the "
+            "median of the previous\ncaches of the same scene is used.")
+        self._adaptive_timelimit_enable.setToolTip(text)
+        self._adaptive_timelimit_factor = QtWidgets.QDoubleSpinBox()
+        self._adaptive_timelimit_factor.setMinimum(1.5)
+        self._adaptive_timelimit_factor.setMaximum(100)
+        self._adaptive_timelimit_factor.setFixedWidth(75)
+        self._adaptive_timelimit_warmup = QtWidgets.QSpinBox()
+        self._adaptive_timelimit_warmup.setMinimum(1)
+        self._adaptive_timelimit_warmup.setMaximum(1000)
+        self._adaptive_timelimit_warmup.setFixedWidth(75)
+        self._adaptive_timelimit_warmup.setToolTip("Warm up frames")
+        self._adaptive_widget = QtWidgets.QWidget()
+        self._adaptive_layout = QtWidgets.QHBoxLayout(self._adaptive_widget)
+        self._adaptive_layout.setContentsMargins(0, 0, 0, 0)
+        self._adaptive_layout.addWidget(self._adaptive_timelimit_factor)
+        self._adaptive_layout.addWidget(self._adaptive_timelimit_enable)
+        self._adaptive_layout.addWidget(QtWidgets.QLabel("warm up"))
+        self._adaptive_layout.addWidget(self._adaptive_timelimit_warmup)
+
+        self._detect_not_finite = QtWidgets.QCheckBox('nan or infinite')
+        text = 'units per frame'
+        self._detect_velocity = QtWidgets.QCheckBox(text)
+        self._velocity_limit = QtWidgets.QDoubleSpinBox()
+        self._velocity_limit.setMinimum(0.01)
+        self._velocity_limit.setMaximum(100000)
+        self._velocity_limit.setFixedWidth(75)
+        self._velocity_widget = QtWidgets.QWidget()
+        self._velocity_layout = QtWidgets.QHBoxLayout(self._velocity_widget)
+        self._velocity_layout.setContentsMargins(0, 0, 0, 0)
+        self._velocity_layout.addWidget(self._velocity_limit)
+        self._velocity_layout.addWidget(self._detect_velocity)
+
+        text = 'x initial bounding box'
+        self._detect_bounding_box = QtWidgets.QCheckBox(text)
+        self._bounding_box_limit = QtWidgets.QDoubleSpinBox()
+        self._bounding_box_limit.setMinimum(1.1)
+        self._bounding_box_limit.setMaximum(1000)
+        self._bounding_box_limit.setFixedWidth(75)
+        self._bounding_box_widget = QtWidgets.QWidget()
+        layout = QtWidgets.QHBoxLayout(self._bounding_box_widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self._bounding_box_limit)
+        layout.addWidget(self._detect_bounding_box)
+
+        text = '% of collapsed edges (cloth only)'
+        self._detect_self_penetration = QtWidgets.QCheckBox(text)
+        text = (
+            "Kill the simulation when too many edges are shorter than 20% of "
+            "their rest\nlength. That happens when the cloth cross itself.")
+        self._detect_self_penetration.setToolTip(text)
+        self._self_penetration_limit = QtWidgets.QDoubleSpinBox()
+        self._self_penetration_limit.setMinimum(0.1)
+        self._self_penetration_limit.setMaximum(100)
+        self._self_penetration_limit.setFixedWidth(75)
+        self._self_penetration_widget = QtWidgets.QWidget()
+        layout = QtWidgets.QHBoxLayout(self._self_penetration_widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self._self_penetration_limit)
+        layout.addWidget(self._detect_self_penetration)
+
+        self._detectors_stride = QtWidgets.QSpinBox()
+        self._detectors_stride.setMinimum(1)
+        self._detectors_stride.setMaximum(64)
+        self._detectors_stride.setFixedWidth(75)
+        self._detectors_stride.setToolTip("Run the detectors every n frames")
+        self._detectors_budget = QtWidgets.QSpinBox()
+        self._detectors_budget.setMinimum(0)
+        self._detectors_budget.setMaximum(10000)
+        self._detectors_budget.setFixedWidth(75)
+        text = (
+            "Milliseconds per frame allowed to each detector. When a "
+            "detector exceeds\nhis budget, his stride is doubled (0 is no "
+            "budget).")
+        self._detectors_budget.setToolTip(text)
+        self._sampling_widget = QtWidgets.QWidget()
+        self._sampling_layout = QtWidgets.QHBoxLayout(self._sampling_widget)
+        self._sampling_layout.setContentsMargins(0, 0, 0, 0)
+        self._sampling_layout.addWidget(self._detectors_stride)
+        self._sampling_layout.addWidget(QtWidgets.QLabel("frames stride"))
+        self._sampling_layout.addWidget(self._detectors_budget)
+        self._sampling_layout.addWidget(QtWidgets.QLabel("ms budget"))
+
         self.layout = QtWidgets.QFormLayout(self)
         self.layout.setSpacing(0)
         self.layout.addRow("Stretch limit:", self._detect_explosion)
         self.layout.addRow("", self._explosion_widget)
         self.layout.addItem(QtWidgets.QSpacerItem(10, 10))
         self.layout.addRow("Time limit:", self._timelimit_widget)
+        self.layout.addRow("Adaptive limit:", self._adaptive_widget)
+        self.layout.addItem(QtWidgets.QSpacerItem(10, 10))
+        self.layout.addRow("Invalid positions:", self._detect_not_finite)
+        self.layout.addRow("Velocity limit:", self._velocity_widget)
+        self.layout.addRow("Bounding box limit:", self._bounding_box_widget)
+        self.layout.addRow("Self penetration:", self._self_penetration_widget)
+        self.layout.addRow("Detectors sampling:", self._sampling_widget)
 
         self.set_optionvars()
         self.update_ui_states()
@@ -394,6 +756,25 @@ class SimulationKillerOptions(QtWidgets.QWidget):
         self._timelimit_enable.stateChanged.connect(self.save_optionvars)
         self._timelimit_enable.stateChanged.connect(self.update_ui_states)
         self._timelimit.textEdited.connect(self.save_optionvars)
+        method = self.save_optionvars
+        self._adaptive_timelimit_enable.stateChanged.connect(method)
+        self._adaptive_timelimit_enable.stateChanged.connect(self.update_ui_states)
+        self._adaptive_timelimit_factor.valueChanged.connect(method)
+        self._adaptive_timelimit_warmup.valueChanged.connect(method)
+        self._detect_not_finite.stateChanged.connect(method)
+        self._detect_velocity.stateChanged.connect(method)
+        self._detect_velocity.stateChanged.connect(self.update_ui_states)
+        self._velocity_limit.valueChanged.connect(method)
+        self._detect_bounding_box.stateChanged.connect(method)
+        self._detect_bounding_box.stateChanged.connect(self.update_ui_states)
+        self._bounding_box_limit.valueChanged.connect(method)
+        self._detect_self_penetration.stateChanged.connect(method)
+        method = self.update_ui_states
+        self._detect_self_penetration.stateChanged.connect(method)
+        method = self.save_optionvars
+        self._self_penetration_limit.valueChanged.connect(method)
+        self._detectors_stride.valueChanged.connect(method)
+        self._detectors_budget.valueChanged.connect(method)
 
     def update_ui_states(self, *signals_args):
         state = self._detect_explosion.isChecked()
@@ -403,6 +784,15 @@ class SimulationKillerOptions(QtWidgets.QWidget):
         self._explosion_tolerance_label.setText(text)
         state = self._timelimit_enable.isChecked()
         self._timelimit.setEnabled(state)
+        state = self._adaptive_timelimit_enable.isChecked()
+        self._adaptive_timelimit_factor.setEnabled(state)
+        self._adaptive_timelimit_warmup.setEnabled(state)
+        state = self._detect_velocity.isChecked()
+        self._velocity_limit.setEnabled(state)
+        state = self._detect_bounding_box.isChecked()
+        self._bounding_box_limit.setEnabled(state)
+        state = self._detect_self_penetration.isChecked()
+        self._self_penetration_limit.setEnabled(state)
 
     def set_optionvars(self):
         ensure_optionvars_exists()
@@ -414,6 +804,30 @@ class SimulationKillerOptions(QtWidgets.QWidget):
         self._detect_explosion.setChecked(value)
         value = cmds.optionVar(query=EXPLOSION_TOLERENCE_OPTIONVAR)
         self._explosion_tolerance.setValue(value)
+        value = cmds.optionVar(query=ADAPTIVE_TIMELIMIT_ENABLED_OPTIONVAR)
+        self._adaptive_timelimit_enable.setChecked(value)
+        value = cmds.optionVar(query=ADAPTIVE_TIMELIMIT_FACTOR_OPTIONVAR)
+        self._adaptive_timelimit_factor.setValue(value)
+        value = cmds.optionVar(query=ADAPTIVE_TIMELIMIT_WARMUP_OPTIONVAR)
+        self._adaptive_timelimit_warmup.setValue(value)
+        value = cmds.optionVar(query=NOT_FINITE_DETECTION_OPTIONVAR)
+        self._detect_not_finite.setChecked(value)
+        value = cmds.optionVar(query=VELOCITY_DETECTION_OPTIONVAR)
+        self._detect_velocity.setChecked(value)
+        value = cmds.optionVar(query=VELOCITY_LIMIT_OPTIONVAR)
+        self._velocity_limit.setValue(value)
+        value = cmds.optionVar(query=BOUNDING_BOX_DETECTION_OPTIONVAR)
+        self._detect_bounding_box.setChecked(value)
+        value = cmds.optionVar(query=BOUNDING_BOX_LIMIT_OPTIONVAR)
+        self._bounding_box_limit.setValue(value)
+        value = cmds.optionVar(query=SELF_PENETRATION_DETECTION_OPTIONVAR)
+        self._detect_self_penetration.setChecked(value)
+        value = cmds.optionVar(query=SELF_PENETRATION_LIMIT_OPTIONVAR)
+        self._self_penetration_limit.setValue(value)
+        value = cmds.optionVar(query=DETECTORS_STRIDE_OPTIONVAR)
+        self._detectors_stride.setValue(value)
+        value = cmds.optionVar(query=DETECTORS_BUDGET_OPTIONVAR)
+        self._detectors_budget.setValue(value)
 
     def save_optionvars(self, *signals_args):
         value = self._timelimit_enable.isChecked()
@@ -424,6 +838,35 @@ class SimulationKillerOptions(QtWidgets.QWidget):
         cmds.optionVar(intValue=[EXPLOSION_DETECTION_OPTIONVAR, value])
         value = self._explosion_tolerance.value()
         cmds.optionVar(intValue=[EXPLOSION_TOLERENCE_OPTIONVAR, value])
+        value = self._adaptive_timelimit_enable.isChecked()
+        optionvar = ADAPTIVE_TIMELIMIT_ENABLED_OPTIONVAR
+        cmds.optionVar(intValue=[optionvar, value])
+        value = self._adaptive_timelimit_factor.value()
+        optionvar = ADAPTIVE_TIMELIMIT_FACTOR_OPTIONVAR
+        cmds.optionVar(floatValue=[optionvar, value])
+        value = self._adaptive_timelimit_warmup.value()
+        optionvar = ADAPTIVE_TIMELIMIT_WARMUP_OPTIONVAR
+        cmds.optionVar(intValue=[optionvar, value])
+        value = self._detect_not_finite.isChecked()
+        cmds.optionVar(intValue=[NOT_FINITE_DETECTION_OPTIONVAR, value])
+        value = self._detect_velocity.isChecked()
+        cmds.optionVar(intValue=[VELOCITY_DETECTION_OPTIONVAR, value])
+        value = self._velocity_limit.value()
+        cmds.optionVar(floatValue=[VELOCITY_LIMIT_OPTIONVAR, value])
+        value = self._detect_bounding_box.isChecked()
+        cmds.optionVar(intValue=[BOUNDING_BOX_DETECTION_OPTIONVAR, value])
+        value = self._bounding_box_limit.value()
+        cmds.optionVar(floatValue=[BOUNDING_BOX_LIMIT_OPTIONVAR, value])
+        value = self._detect_self_penetration.isChecked()
+        optionvar = SELF_PENETRATION_DETECTION_OPTIONVAR
+        cmds.optionVar(intValue=[optionvar, value])
+        value = self._self_penetration_limit.value()
+        optionvar = SELF_PENETRATION_LIMIT_OPTIONVAR
+        cmds.optionVar(floatValue=[optionvar, value])
+        value = self._detectors_stride.value()
+        cmds.optionVar(intValue=[DETECTORS_STRIDE_OPTIONVAR, value])
+        value = self._detectors_budget.value()
+        cmds.optionVar(intValue=[DETECTORS_BUDGET_OPTIONVAR, value])
 
     @property
     def detect_explosion(self):
@@ -441,6 +884,161 @@ class SimulationKillerOptions(QtWidgets.QWidget):
             return 0
         return int(self._timelimit.text())
 
+    @property
+    def timelimit_factor(self):
+        if not self._adaptive_timelimit_enable.isChecked():
+            return 0
+        return self._adaptive_timelimit_factor.value()
+
+    @property
+    def timelimit_warmup(self):
+        return self._adaptive_timelimit_warmup.value()
+
+    @property
+    def detectors(self):
+        """ return the explosion detectors settings sent to the batch
+        script (see the detectors module) """
+        detectors = []
+        if self._detect_not_finite.isChecked():
+            detectors.append({'name': NOT_FINITE})
+        if self._detect_velocity.isChecked():
+            threshold = self._velocity_limit.value()
+            detectors.append({'name': VELOCITY, 'threshold': threshold})
+        if self._detect_bounding_box.isChecked():
+            threshold = self._bounding_box_limit.value()
+            detectors.append({'name': BOUNDING_BOX, 'threshold': threshold})
+        if self._detect_self_penetration.isChecked():
+            threshold = self._self_penetration_limit.value() / 100.0
+            detectors.append(
+                {'name': SELF_PENETRATION, 'threshold': threshold})
+        budget = self._detectors_budget.value() / 1000.0
+        for detector in detectors:
+            detector['stride'] = self._detectors_stride.value()
+            detector['budget'] = budget or None
+        return detectors
+
+
+class BatchOptions(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(BatchOptions, self).__init__(parent)
+        self._workers = QtWidgets.QSpinBox()
+        self._workers.setMinimum(0)
+        self._workers.setMaximum(64)
+        self._workers.setFixedWidth(75)
+        text = (
+            "Number of persistent mayapy processing the jobs one after the "
+            "other.\n0 launch a new mayapy for every job.")
+        self._workers.setToolTip(text)
+        self._fork_wedging = QtWidgets.QCheckBox("Fork wedging (linux only)")
+        text = (
+            "Open the wedging scene once and fork the mayapy for every value."
+            "\nThe workers number limits the simulations running together.")
+        self._fork_wedging.setToolTip(text)
+        self._fork_wedging.setEnabled(is_fork_available())
+        self._slim_scenes = QtWidgets.QCheckBox("Slim scenes")
+        text = (
+            "Send only the dynamic network of the cached nodes as maya binary"
+            "\n(nucleus, colliders, input meshes history, fields, "
+            "constraints and cameras).")
+        self._slim_scenes.setToolTip(text)
+        self._checkpoint_interval = QtWidgets.QSpinBox()
+        self._checkpoint_interval.setMinimum(0)
+        self._checkpoint_interval.setMaximum(9999)
+        self._checkpoint_interval.setFixedWidth(75)
+        text = (
+            "Save the dynamic state every n frames to be able to resume a "
+            "crashed\nor killed job from the monitor. 0 disable the "
+            "checkpoints.")
+        self._checkpoint_interval.setToolTip(text)
+        self._split_solvers = QtWidgets.QCheckBox("Split independent solvers")
+        text = (
+            "Cache the nodes which don't share a solver or a collider in "
+            "parallel\nprocesses writing the same version. Only the first "
+            "process records\nthe playblast and no checkpoint is saved.")
+        self._split_solvers.setToolTip(text)
+        self._memory_limit = QtWidgets.QSpinBox()
+        self._memory_limit.setMinimum(0)
+        self._memory_limit.setMaximum(4096)
+        self._memory_limit.setFixedWidth(75)
+        self._memory_limit.setSuffix(" GB")
+        text = (
+            "Start a job only if the memory used by the running jobs plus "
+            "the\nhighest memory peak reported stay under this limit. 0 "
+            "disable the limit.")
+        self._memory_limit.setToolTip(text)
+
+        self.layout = QtWidgets.QFormLayout(self)
+        self.layout.setSpacing(0)
+        self.layout.addRow("Persistent workers:", self._workers)
+        self.layout.addRow("", self._fork_wedging)
+        self.layout.addRow("", self._slim_scenes)
+        self.layout.addRow("Checkpoint every:", self._checkpoint_interval)
+        self.layout.addRow("", self._split_solvers)
+        self.layout.addRow("Memory limit:", self._memory_limit)
+
+        self.set_optionvars()
+        self._workers.valueChanged.connect(self.save_optionvars)
+        self._fork_wedging.stateChanged.connect(self.save_optionvars)
+        self._slim_scenes.stateChanged.connect(self.save_optionvars)
+        self._checkpoint_interval.valueChanged.connect(self.save_optionvars)
+        self._split_solvers.stateChanged.connect(self.save_optionvars)
+        self._memory_limit.valueChanged.connect(self.save_optionvars)
+
+    def set_optionvars(self):
+        ensure_optionvars_exists()
+        value = cmds.optionVar(query=BATCH_WORKERS_OPTIONVAR)
+        self._workers.setValue(value)
+        value = cmds.optionVar(query=BATCH_FORK_WEDGING_OPTIONVAR)
+        self._fork_wedging.setChecked(value)
+        value = cmds.optionVar(query=BATCH_SLIM_SCENES_OPTIONVAR)
+        self._slim_scenes.setChecked(value)
+        value = cmds.optionVar(query=BATCH_CHECKPOINT_INTERVAL_OPTIONVAR)
+        self._checkpoint_interval.setValue(value)
+        value = cmds.optionVar(query=BATCH_SPLIT_SOLVERS_OPTIONVAR)
+        self._split_solvers.setChecked(value)
+        value = cmds.optionVar(query=BATCH_MEMORY_LIMIT_OPTIONVAR)
+        self._memory_limit.setValue(value)
+
+    def save_optionvars(self, *signals_args):
+        value = self._workers.value()
+        cmds.optionVar(intValue=[BATCH_WORKERS_OPTIONVAR, value])
+        value = self._fork_wedging.isChecked()
+        cmds.optionVar(intValue=[BATCH_FORK_WEDGING_OPTIONVAR, int(value)])
+        value = self._slim_scenes.isChecked()
+        cmds.optionVar(intValue=[BATCH_SLIM_SCENES_OPTIONVAR, int(value)])
+        value = self._checkpoint_interval.value()
+        optionvar = BATCH_CHECKPOINT_INTERVAL_OPTIONVAR
+        cmds.optionVar(intValue=[optionvar, value])
+        value = self._split_solvers.isChecked()
+        cmds.optionVar(intValue=[BATCH_SPLIT_SOLVERS_OPTIONVAR, int(value)])
+        value = self._memory_limit.value()
+        cmds.optionVar(intValue=[BATCH_MEMORY_LIMIT_OPTIONVAR, value])
+
+    @property
+    def workers(self):
+        return self._workers.value()
+
+    @property
+    def fork_wedging(self):
+        return self._fork_wedging.isEnabled() and self._fork_wedging.isChecked()
+
+    @property
+    def slim_scenes(self):
+        return self._slim_scenes.isChecked()
+
+    @property
+    def checkpoint_interval(self):
+        return self._checkpoint_interval.value()
+
+    @property
+    def memory_limit(self):
+        """ return the memory limit in megabytes, 0 is no limit """
+        return self._memory_limit.value() * 1024
+
+    @property
+    def split_solvers(self):
+        return self._split_solvers.isChecked()
+
 
 class ValuesBuilder(QtWidgets.QDialog):
     def __init__(self, parent=None):
@@ -18,9 +18,7 @@ from ncachefactory.versioning import (
     create_cacheversion, ensure_workspace_folder_exists, find_file_match,
     clear_cacheversion_content, cacheversion_contains_node,
     move_playblast_to_cacheversion, extract_xml_attributes)
-from ncachefactory.mesh import (
-    create_mesh_for_geo_cache, attach_geo_cache,
-    is_deformed_mesh_too_stretched)
+from ncachefactory.mesh import create_mesh_for_geo_cache, attach_geo_cache
 from ncachefactory.ncloth import (
     find_input_mesh_dagpath, clean_inputmesh_connection,
     find_output_mesh_dagpath)
@@ -28,7 +26,8 @@ from ncachefactory.ncache import (
     import_ncache, record_ncache, DYNAMIC_NODES, clear_cachenodes,
     list_connected_cachefiles, list_connected_cacheblends, append_ncache)
 from ncachefactory.playblast import (
-    start_playblast_record, stop_playblast_record)
+    start_playblast_record, stop_playblast_record, encode_playblast_presets,
+    register_playblast_captures)
 from ncachefactory.attributes import (
     save_pervertex_maps, list_node_attributes_values,
     clean_namespaces_in_attributes_dict, ORIGINAL_INPUTSHAPE_ATTRIBUTE,
@@ -83,7 +82,9 @@ def create_and_record_cacheversion(
 
     if playblast is True:
         temp_path = stop_playblast_record(cacheversion.directory)
-        move_playblast_to_cacheversion(temp_path, cacheversion)
+        playblast = move_playblast_to_cacheversion(temp_path, cacheversion)
+        register_playblast_captures(cacheversion, playblast)
+        encode_playblast_presets(cacheversion, playblast)
     return cacheversion
 
 
@@ -119,7 +120,9 @@ def record_in_existing_cacheversion(
 
     if playblast is True:
         temp_path = stop_playblast_record(cacheversion.directory)
-        move_playblast_to_cacheversion(temp_path, cacheversion)
+        playblast = move_playblast_to_cacheversion(temp_path, cacheversion)
+        register_playblast_captures(cacheversion, playblast)
+        encode_playblast_presets(cacheversion, playblast)
 
 
 def append_to_cacheversion(
@@ -157,7 +160,9 @@ def append_to_cacheversion(
 
     if playblast is True:
         temp_path = stop_playblast_record(cacheversion.directory)
-        move_playblast_to_cacheversion(temp_path, cacheversion)
+        playblast = move_playblast_to_cacheversion(temp_path, cacheversion)
+        register_playblast_captures(cacheversion, playblast)
+        encode_playblast_presets(cacheversion, playblast)
 
 
 def plug_cacheversion(cacheversion, groupname, suffix, inattr, nodes=None):
@@ -216,6 +221,25 @@ def plug_cacheversion_to_restshape(cacheversion, nodes=None):
         nodes=nodes)
 
 
+def record_cacheversion_playblast(
+        cacheversion, start_frame, end_frame, nodes=None,
+        playblast_viewport_options=None):
+    """ connect the cacheversion and render his playblast from the cache on
+    the given range. That's used to render the playblast of a cache after
+    his simulation (deferred playblast). The time callback has to be
+    registered (see timecallbacks.register_time_callback) """
+    connect_cacheversion(cacheversion, nodes=nodes, behavior=0)
+    start_playblast_record(
+        directory=cacheversion.directory, **playblast_viewport_options)
+    for frame in range(int(start_frame), int(end_frame) + 1):
+        cmds.currentTime(frame, edit=True)
+    temp_path = stop_playblast_record(cacheversion.directory)
+    playblast = move_playblast_to_cacheversion(temp_path, cacheversion)
+    register_playblast_captures(cacheversion, playblast)
+    encode_playblast_presets(cacheversion, playblast)
+    return playblast
+
+
 def connect_cacheversion(cacheversion, nodes=None, behavior=0):
     nodes = nodes or cmds.ls(type=DYNAMIC_NODES)
     nodes = filter_invisible_nodes_for_manager(nodes)
@@ -2,7 +2,6 @@
 import ConfigParser
 
 import maya.OpenMaya as om
-import maya.OpenMayaUI as omui
 from maya import cmds
 
 from ncachefactory.optionvars import CONFIGFILE_PATH
@@ -24,6 +23,8 @@ def find_existing_production_cameras():
 
 
 def find_current_camera():
+    # the ui module is imported only when it's needed.
+    import maya.OpenMayaUI as omui
     view = omui.M3dView.active3dView()
     camera = om.MDagPath()
     view.getCamera(camera)
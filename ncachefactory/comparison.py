@@ -0,0 +1,132 @@
+"""
+This module contains the comparison movie renderer. The render is run by
+the encoding service, out of the interface thread.
+The playblasts of several cacheversions are aligned on their frame range
+(see arrayutils.normalize_ranges) and combined by an ffmpeg filter graph in a
+single pass. The versions are padded with black frames before their start.
+Three modes are available:
+    side by side: the versions are stacked horizontally.
+    wipe: every version shows a vertical strip of the image.
+    difference: the difference between the first version and the others.
+A version with several playblasts (after a resume) is concatenated first.
+The playblasts are expected to share the same resolution.
+"""
+
+import re
+import subprocess
+
+from ncachefactory.arrayutils import normalize_ranges
+
+
+SIDE_BY_SIDE = 'side by side'
+WIPE = 'wipe'
+DIFFERENCE = 'difference'
+COMPARISON_MODES = SIDE_BY_SIDE, WIPE, DIFFERENCE
+LABEL_OPTIONS = 'fontsize=24:fontcolor=white:box=1:boxcolor=black@0.5'
+OUTPUT_ARGUMENTS = '-c:v', 'libx264', '-pix_fmt', 'yuv420p'
+
+
+def get_comparison_offsets(ranges):
+    """ return the number of frames to pad before every version to align
+    them """
+    return [range_[0] for range_ in normalize_ranges(ranges)]
+
+
+def sanitize_label(name):
+    # the filter graph has several escaping levels, the special characters
+    # are simply replaced.
+    return re.sub(r"[^\w\-. ]", "_", name)
+
+
+def build_drawtext_filter(name, x='(w-tw)/2'):
+    text = sanitize_label(name)
+    return "drawtext=text='{}':x={}:y=h-th-10:{}".format(
+        text, x, LABEL_OPTIONS)
+
+
+def build_comparison_filtergraph(playblast_counts, offsets, names, mode):
+    """ this function build the filter graph combining the versions. The
+    playblast_counts is the number of playblast inputs of every version, in
+    the order of the command line inputs. The graph output is labeled [out]
+    """
+    if mode not in COMPARISON_MODES:
+        raise ValueError("unknown comparison mode: {}".format(mode))
+    count = len(playblast_counts)
+    if count < 2:
+        raise ValueError("at least two versions are needed to compare")
+    chains = []
+    index = 0
+    for i, (playblast_count, offset) in enumerate(
+            zip(playblast_counts, offsets)):
+        inputs = ''.join(
+            '[{}:v]'.format(j) for j in range(index, index + playblast_count))
+        index += playblast_count
+        filters = []
+        if playblast_count > 1:
+            filters.append('concat=n={}:v=1:a=0'.format(playblast_count))
+        filters.append('setsar=1')
+        if offset:
+            filters.append('tpad=start={}:color=black'.format(offset))
+        if mode == SIDE_BY_SIDE:
+            filters.append(build_drawtext_filter(names[i]))
+        elif mode == WIPE:
+            x = 'w*{}/{}+10'.format(i, count)
+            filters.append(build_drawtext_filter(names[i], x=x))
+        chains.append('{}{}[v{}]'.format(inputs, ','.join(filters), i))
+
+    if mode == SIDE_BY_SIDE:
+        inputs = ''.join('[v{}]'.format(i) for i in range(count))
+        chains.append('{}hstack=inputs={}[out]'.format(inputs, count))
+
+    elif mode == WIPE:
+        base = 'v0'
+        for i in range(1, count):
+            output = 'out' if i == count - 1 else 'w{}'.format(i)
+            chains.append('[v{0}]crop=iw/{1}:ih:iw*{0}/{1}:0[s{0}]'.format(
+                i, count))
+            chains.append('[{}][s{}]overlay=x=W*{}/{}:y=0[{}]'.format(
+                base, i, i, count, output))
+            base = output
+
+    elif mode == DIFFERENCE:
+        references = ''.join('[r{}]'.format(i) for i in range(1, count))
+        chains.append('[v0]split={}{}'.format(count - 1, references))
+        for i in range(1, count):
+            name = '{} - {}'.format(names[0], names[i])
+            chains.append(
+                '[r{0}][v{0}]blend=all_mode=difference,{1}[d{0}]'.format(
+                    i, build_drawtext_filter(name)))
+        if count == 2:
+            chains[-1] = chains[-1][:-len('[d1]')] + '[out]'
+        else:
+            inputs = ''.join('[d{}]'.format(i) for i in range(1, count))
+            chains.append('{}hstack=inputs={}[out]'.format(inputs, count - 1))
+
+    return ';'.join(chains)
+
+
+def build_comparison_arguments(
+        ffmpeg, playblast_lists, ranges, names, mode, output):
+    """ this function build the ffmpeg command line rendering the comparison.
+    The playblast_lists contains the playblasts of every version, the ranges
+    are their cached frame ranges """
+    arguments = [ffmpeg, '-y', '-loglevel', 'error']
+    for playblasts in playblast_lists:
+        for playblast in playblasts:
+            arguments.extend(['-i', playblast])
+    filtergraph = build_comparison_filtergraph(
+        playblast_counts=[len(playblasts) for playblasts in playblast_lists],
+        offsets=get_comparison_offsets(ranges),
+        names=names,
+        mode=mode)
+    arguments.extend(['-filter_complex', filtergraph, '-map', '[out]'])
+    arguments.extend(OUTPUT_ARGUMENTS)
+    arguments.append(output)
+    return arguments
+
+
+def render_comparison(ffmpeg, playblast_lists, ranges, names, mode, output):
+    arguments = build_comparison_arguments(
+        ffmpeg, playblast_lists, ranges, names, mode, output)
+    subprocess.check_call(arguments)
+    return output
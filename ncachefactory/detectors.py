@@ -0,0 +1,263 @@
+"""
+This module contains the explosion detectors run by the batch simulations
+between the frames. The samples are read in the scene by the sanity
+module.
+A detector checks the output of every dynamic node simulated (see
+NodeSample) and returns the reason if it finds an explosion. Each detector has
+a sampling stride: it's run every n frames only. He has also a cost budget in
+seconds per frame. When his average cost exceeds the budget, his stride is
+doubled. Numpy is used if available.
+The detectors are sent to the batch script as json list:
+    [{'name': 'velocity', 'threshold': 50.0, 'stride': 1, 'budget': 0.05}]
+When a detector fires, the detection is recorded in the cacheversion infos:
+    'detection': {
+        'detector': 'velocity',
+        'node': 'nClothShape1',
+        'frame': 125,
+        'reason': 'vertex velocity 125.3 exceeds 50.0 units per frame'}
+"""
+
+from math import sqrt, isinf, isnan
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ncachefactory.profiling import clock
+
+
+NOT_FINITE = 'not finite'
+VELOCITY = 'velocity'
+BOUNDING_BOX = 'bounding box'
+SELF_PENETRATION = 'self penetration'
+# edges shorter than this ratio of their rest length are considered
+# collapsed. That happens when the cloth cross itself.
+COLLAPSE_RATIO = 0.2
+COST_WINDOW = 5
+MAXIMUM_STRIDE = 64
+
+
+class NodeSample(object):
+    """ This object is the state of a dynamic node output at a frame. The
+    points are a flat list [x, y, z, x, y, z ...]. The stretch ratios are
+    computed on demand by the given function (see the stretch module) and
+    shared by the detectors.
+    """
+
+    def __init__(self, node, points, ratios_function=None, is_mesh=True):
+        self.node = node
+        self.points = points
+        self.ratios_function = ratios_function
+        self.is_mesh = is_mesh
+        self._ratios = None
+
+    @property
+    def ratios(self):
+        if self._ratios is None and self.ratios_function is not None:
+            self._ratios = self.ratios_function(self.points)
+        return self._ratios
+
+
+class Detector(object):
+    name = None
+
+    def __init__(self, threshold=None, stride=1, budget=None):
+        self.threshold = threshold
+        self.stride = max(1, int(stride))
+        self.budget = budget
+        self.last_frame = None
+        self.costs = []
+
+    def is_due(self, frame):
+        if self.last_frame is None:
+            return True
+        return frame - self.last_frame >= self.stride
+
+    def check(self, frame, samples):
+        """ check all the samples and return a detection dict or None """
+        self.last_frame = frame
+        start_time = clock()
+        try:
+            for sample in samples:
+                reason = self.detect(frame, sample)
+                if reason:
+                    return {
+                        'detector': self.name,
+                        'node': sample.node,
+                        'frame': frame,
+                        'reason': reason}
+        finally:
+            self.costs = (self.costs + [clock() - start_time])[-COST_WINDOW:]
+
+    def detect(self, frame, sample):
+        """ return the reason of the explosion detected on the sample or
+        None. This is reimplemented by every detector. """
+        return None
+
+    def adapt_stride(self):
+        """ double the stride if the average cost exceeds the budget. Return
+        True if the stride changed """
+        if not self.budget or len(self.costs) < COST_WINDOW:
+            return False
+        cost = sum(self.costs) / len(self.costs)
+        if cost <= self.budget or self.stride >= MAXIMUM_STRIDE:
+            return False
+        self.stride *= 2
+        self.costs = []
+        return True
+
+
+class NotFiniteDetector(Detector):
+    name = NOT_FINITE
+
+    def detect(self, frame, sample):
+        if numpy is not None:
+            finite = numpy.isfinite(numpy.asarray(sample.points)).all()
+        else:
+            finite = not any(isnan(v) or isinf(v) for v in sample.points)
+        if not finite:
+            return "nan or infinite position found"
+
+
+class VelocityDetector(Detector):
+    """ This detector compares the points with the ones of the previous
+    check. The threshold is in scene units per frame. """
+    name = VELOCITY
+
+    def __init__(self, *args, **kwargs):
+        super(VelocityDetector, self).__init__(*args, **kwargs)
+        self.previous = {}
+
+    def detect(self, frame, sample):
+        previous_frame, previous_points = self.previous.get(
+            sample.node, (None, None))
+        self.previous[sample.node] = frame, sample.points
+        if previous_points is None or frame <= previous_frame:
+            return None
+        if len(previous_points) != len(sample.points):
+            return None
+        displacement = compute_max_displacement(previous_points, sample.points)
+        velocity = displacement / (frame - previous_frame)
+        if velocity > self.threshold:
+            message = "vertex velocity {:.2f} exceeds {} units per frame"
+            return message.format(velocity, self.threshold)
+
+
+class BoundingBoxDetector(Detector):
+    """ This detector compares the bounding box diagonal with the one at the
+    first check. The threshold is a growth factor. """
+    name = BOUNDING_BOX
+
+    def __init__(self, *args, **kwargs):
+        super(BoundingBoxDetector, self).__init__(*args, **kwargs)
+        self.initial_diagonals = {}
+
+    def detect(self, frame, sample):
+        diagonal = compute_bounding_box_diagonal(sample.points)
+        initial = self.initial_diagonals.setdefault(sample.node, diagonal)
+        if not initial:
+            return None
+        growth = diagonal / initial
+        if growth > self.threshold:
+            message = "bounding box grown {:.2f} times (limit {})"
+            return message.format(growth, self.threshold)
+
+
+class SelfPenetrationDetector(Detector):
+    """ This detector uses the collapsed edges as proxy of the self
+    penetrations. The threshold is the fraction of collapsed edges allowed.
+    Only the meshes are checked. """
+    name = SELF_PENETRATION
+
+    def detect(self, frame, sample):
+        if not sample.is_mesh or sample.ratios is None:
+            return None
+        ratios = sample.ratios
+        if not len(ratios):
+            return None
+        if numpy is not None:
+            collapsed = int((numpy.asarray(ratios) < COLLAPSE_RATIO).sum())
+        else:
+            collapsed = len([r for r in ratios if r < COLLAPSE_RATIO])
+        fraction = collapsed / float(len(ratios))
+        if fraction > self.threshold:
+            message = "{:.1%} of the edges are collapsed (limit {:.1%})"
+            return message.format(fraction, self.threshold)
+
+
+DETECTORS = {
+    NOT_FINITE: NotFiniteDetector,
+    VELOCITY: VelocityDetector,
+    BOUNDING_BOX: BoundingBoxDetector,
+    SELF_PENETRATION: SelfPenetrationDetector}
+
+
+class DetectorSuite(object):
+    """ This object runs the detectors due at a frame. The samples are
+    created by a function only if at least one detector is due. """
+
+    def __init__(self, detectors):
+        # the positions have to be valid before to check anything else.
+        self.detectors = sorted(
+            detectors, key=lambda d: d.name != NOT_FINITE)
+        self.messages = []
+
+    def check(self, frame, samples_function):
+        detectors = [d for d in self.detectors if d.is_due(frame)]
+        if not detectors:
+            return None
+        samples = samples_function()
+        for detector in detectors:
+            detection = detector.check(frame, samples)
+            if detection:
+                return detection
+            if detector.adapt_stride():
+                message = "{} detector exceeds his budget, stride set to {}"
+                self.messages.append(
+                    message.format(detector.name, detector.stride))
+        return None
+
+    def pop_messages(self):
+        messages, self.messages = self.messages, []
+        return messages
+
+
+def create_detectors(settings):
+    """ this function create the detectors from their json description """
+    detectors = []
+    for setting in settings:
+        cls = DETECTORS.get(setting['name'])
+        if cls is None:
+            raise ValueError("unknown detector: {}".format(setting['name']))
+        detectors.append(cls(
+            threshold=setting.get('threshold'),
+            stride=setting.get('stride', 1),
+            budget=setting.get('budget')))
+    return detectors
+
+
+def compute_max_displacement(points1, points2):
+    if numpy is not None:
+        vectors = (
+            numpy.asarray(points2, dtype=float) -
+            numpy.asarray(points1, dtype=float)).reshape(-1, 3)
+        return float(numpy.sqrt((vectors * vectors).sum(axis=1)).max())
+    displacement = 0.0
+    for i in range(0, len(points1), 3):
+        displacement = max(displacement, sqrt(
+            (points2[i] - points1[i]) ** 2 +
+            (points2[i + 1] - points1[i + 1]) ** 2 +
+            (points2[i + 2] - points1[i + 2]) ** 2))
+    return displacement
+
+
+def compute_bounding_box_diagonal(points):
+    if not len(points):
+        return 0.0
+    if numpy is not None:
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        size = points.max(axis=0) - points.min(axis=0)
+        return float(numpy.sqrt((size * size).sum()))
+    size = [
+        max(points[i::3]) - min(points[i::3]) for i in range(3)]
+    return sqrt(sum(value ** 2 for value in size))
@@ -0,0 +1,354 @@
+"""
+This module contains the streaming movie encoder used by the playblasts.
+A persistent ffmpeg receives the jpeg images on his standard input as they
+are rendered (image2pipe). The jpeg frames are copied in a fragmented mp4:
+every frame is a keyframe and starts a fragment. The movie is readable at
+any time during the record and stays valid if the process is killed.
+Finishing the record only closes the pipe.
+The burn-ins (version name, comment, overrides, frame and simulation time) are
+drawn by ffmpeg during the encoding. ffmpeg decodes the frames asynchronously,
+a text shared with the encoder could be read for another frame. So the frame
+number is computed by drawtext from the frame index and the other values
+travel inside the jpeg they belong to: an EXIF image description segment is
+inserted in every frame sent. The mjpeg decoder exports it as frame metadata
+and drawtext prints it. The jpeg are encoded again in this case, they can't be
+copied through a filter.
+Several cameras and resolutions can be captured during the same record. Every
+additional capture is streamed to his own encoder, in a movie named from the
+main one (see get_capture_filename).
+The movie streamed can be encoded again with named presets defined in the
+config.cfg (e.g. an intra-only proxy to scrub, a light review movie and a
+lossless archive). The size and the encoding time of every preset are
+recorded in the cacheversion infos.
+The movies assembled after the record (partial playblasts, contact sheets,
+comparisons) are encoded by a bounded pool of threads (see EncodingService).
+The completion callbacks are called in the interface thread by a timer of
+the manager (see process_encoding_callbacks), to never block the interface on
+ffmpeg.
+"""
+
+import os
+import re
+import struct
+import logging
+import traceback
+import shlex
+import threading
+import subprocess
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+from ncachefactory.profiling import clock
+
+
+STREAMED_MOVIE_FILENAME = 'ncache_playblast.mp4'
+FRAGMENTED_MP4_FLAGS = '+frag_keyframe+empty_moov+default_base_moof'
+DEFAULT_FRAMERATE = 24
+# the mjpeg decoder exports the EXIF tags as frame metadata by tag name.
+BURNIN_METADATA_KEY = 'ImageDescription'
+BURNIN_TEXT = r"%{{metadata\:{}}}".format(BURNIN_METADATA_KEY)
+BURNIN_FRAME_TEXT = r"frame %{{eif\:n+{}\:d}}"
+BURNIN_OPTIONS = (
+    'fontsize=18:fontcolor=white:line_spacing=4:box=1:'
+    'boxcolor=black@0.5:boxborderw=4')
+EXIF_DESCRIPTION_TAG = 0x010E
+EXIF_ASCII_TYPE = 2
+# a jpeg segment length is stored on 16 bits.
+EXIF_MAXIMUM_TEXT_SIZE = 60000
+BURNIN_CODEC_ARGUMENTS = '-c:v', 'mjpeg', '-q:v', '2'
+ENCODING_WORKERS = 2
+# let ffmpeg use all the cores available.
+ENCODING_THREADS_ARGUMENTS = '-threads', '0'
+PENDING = 'pending'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+
+_encoding_service = None
+
+
+def get_streamed_movie_filename(directory):
+    return os.path.join(directory, STREAMED_MOVIE_FILENAME)
+
+
+def get_capture_filename(movie, camera, width, height):
+    """ return the filename of a movie captured with another camera or
+    resolution, next to the given main movie:
+    playblast_0000.mp4 -> playblast_0000.closeupShape_640x360.mp4 """
+    # the camera can be a dag path or contains a namespace.
+    label = '{}_{}x{}'.format(re.sub(r"[^\w\-]", "_", camera), width, height)
+    return '{}.{}.mp4'.format(os.path.splitext(movie)[0], label)
+
+
+def build_encoder_arguments(
+        ffmpeg, output, framerate=DEFAULT_FRAMERATE, burnin=False,
+        start_frame=0):
+    arguments = [
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "image2pipe", "-vcodec", "mjpeg",
+        "-framerate", str(framerate), "-i", "-"]
+    if not burnin:
+        arguments.extend(["-codec", "copy"])
+    else:
+        arguments.extend(["-vf", build_burnin_filter(start_frame)])
+        arguments.extend(BURNIN_CODEC_ARGUMENTS)
+    arguments.extend(["-movflags", FRAGMENTED_MP4_FLAGS, output])
+    return arguments
+
+
+def build_burnin_filter(start_frame=0):
+    """ the text sent with every frame is drawn on the top left, the frame
+    number on the bottom left. The frame index n starts at 0 on the first
+    image received. """
+    frame_text = BURNIN_FRAME_TEXT.format(int(start_frame))
+    return (
+        "drawtext=text='{}':x=10:y=10:{},"
+        "drawtext=text='{}':x=10:y=h-th-10:{}").format(
+            BURNIN_TEXT, BURNIN_OPTIONS, frame_text, BURNIN_OPTIONS)
+
+
+def format_burnin(infos, seconds=None):
+    """ this function build the burn-in text of a frame. The infos is a dict
+    containing the cacheversion 'name', 'comment' and the attributes
+    'overrides'. The frame number is drawn by the encoder. """
+    lines = [infos.get('name'), infos.get('comment')]
+    overrides = infos.get('overrides') or {}
+    lines.extend(
+        "{} = {}".format(attribute, value)
+        for attribute, value in sorted(overrides.items()))
+    if seconds is not None:
+        lines.append("{:.2f} s/frame".format(seconds))
+    return "\n".join(line for line in lines if line)
+
+
+def build_exif_description(text):
+    """ this function return a jpeg APP1 segment containing an EXIF image
+    description: the tiff header (little endian), an IFD with a single entry
+    and the text pointed by this entry. """
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    text = text[:EXIF_MAXIMUM_TEXT_SIZE] + b'\0'
+    # tiff header (8) + entries count (2) + entry (12) + next IFD offset (4)
+    text_offset = 26
+    tiff = (
+        b'II*\0' + struct.pack('<I', 8) + struct.pack('<H', 1) +
+        struct.pack(
+            '<HHII', EXIF_DESCRIPTION_TAG, EXIF_ASCII_TYPE, len(text),
+            text_offset) +
+        struct.pack('<I', 0) + text)
+    data = b'Exif\0\0' + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(data) + 2) + data
+
+
+def add_jpeg_description(data, text):
+    """ insert the text as EXIF image description just after the start of
+    image marker of the jpeg data given """
+    if data[:2] != b'\xff\xd8':
+        raise ValueError("the data given isn't a jpeg image")
+    return data[:2] + build_exif_description(text) + data[2:]
+
+
+class MovieEncoder(object):
+    """ This object own a ffmpeg process writing a fragmented mp4 from the
+    jpeg images sent one after the other.
+    """
+
+    def __init__(
+            self, ffmpeg, output, framerate=DEFAULT_FRAMERATE, burnin=False):
+        self.ffmpeg = ffmpeg
+        self.output = output
+        self.framerate = framerate
+        self.burnin = burnin
+        self.process = None
+        self.frames = 0
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, start_frame=0):
+        """ the start frame is the number burnt on the first image """
+        arguments = build_encoder_arguments(
+            self.ffmpeg, self.output, self.framerate, self.burnin,
+            start_frame)
+        self.process = subprocess.Popen(arguments, stdin=subprocess.PIPE)
+
+    def add_image(self, filename, text=None):
+        with open(filename, 'rb') as f:
+            self.add_frame(f.read(), text)
+
+    def add_frame(self, data, text=None):
+        """ the text is the burn-in of this frame only """
+        if self.burnin and text:
+            data = add_jpeg_description(data, text)
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+        self.frames += 1
+
+    def close(self):
+        """ close the pipe and wait for ffmpeg to write the last fragment.
+        The ffmpeg return code is returned. """
+        if self.process is None:
+            return None
+        self.process.stdin.close()
+        returncode = self.process.wait()
+        return returncode
+
+
+def compile_image_sequence(ffmpeg, images):
+    """ this function an mp4 video from the jpgeg given. In the same folder.
+    The jpeg filenames pattern must finish by ".%6d.jpg" to be understood by
+    the function
+    """
+    output = images[0][:-11] + ".mp4"
+    # this line analyse the filename given and build a filename expression
+    # understood by FFMMPEG. %6d mean 6 digit frame number.
+    images_expression = re.sub(r".\d\d\d\d\d\d.jpg", ".%6d.jpg", (images[0]))
+    # on some ffmpeg versions, that need the start frame specified for images
+    # sequences. This line infer the first frame from the first filename
+    startframe = int(images[0].split('.')[-2])
+    arguments = [
+        ffmpeg, "-framerate", "24", "-start_number", str(startframe),
+        "-i", images_expression, "-codec", "copy", output]
+    subprocess.check_call(arguments)
+    return output
+
+
+def get_encoding_filename(playblast, preset):
+    return '{}.{}.mp4'.format(os.path.splitext(playblast)[0], preset)
+
+
+def build_preset_arguments(ffmpeg, source, output, preset_arguments):
+    arguments = [ffmpeg, '-y', '-loglevel', 'error', '-i', source]
+    arguments.extend(shlex.split(preset_arguments))
+    arguments.extend(ENCODING_THREADS_ARGUMENTS)
+    arguments.append(output)
+    return arguments
+
+
+def encode_preset(ffmpeg, source, preset, preset_arguments):
+    """ encode the source movie with the preset given and return the encoding
+    description recorded in the infos """
+    output = get_encoding_filename(source, preset)
+    arguments = build_preset_arguments(
+        ffmpeg, source, output, preset_arguments)
+    start_time = clock()
+    subprocess.check_call(arguments)
+    return {
+        'preset': preset,
+        'filename': output,
+        'size': os.path.getsize(output),
+        'seconds': clock() - start_time}
+
+
+def summarize_encodings(infos_list):
+    """ this function return the average size in bytes and encoding time of
+    every preset recorded in the infos given:
+    {'review': {'count': 3, 'size': 2516582, 'seconds': 4.2}} """
+    totals = {}
+    for infos in infos_list:
+        for encoding in infos.get('encodings') or []:
+            total = totals.setdefault(
+                encoding['preset'], {'count': 0, 'size': 0, 'seconds': 0})
+            total['count'] += 1
+            total['size'] += encoding['size']
+            total['seconds'] += encoding['seconds']
+    for total in totals.values():
+        total['size'] = total['size'] / float(total['count'])
+        total['seconds'] = total['seconds'] / float(total['count'])
+    return totals
+
+
+class EncodingJob(object):
+    """ This object describe a function run by the EncodingService. The
+    callback receives the job when it's done, the result or the error are
+    stored on it. """
+
+    def __init__(self, function, callback=None):
+        self.function = function
+        self.callback = callback
+        self.state = PENDING
+        self.result = None
+        self.error = None
+
+    def run(self):
+        self.state = RUNNING
+        try:
+            self.result = self.function()
+            self.state = FINISHED
+        except Exception as error:
+            self.error = error
+            self.state = FAILED
+
+
+class EncodingService(object):
+    """ This object runs the encoding jobs in a bounded pool of threads. The
+    jobs done are queued until process_callbacks is called, regularly, from
+    the interface thread.
+    """
+
+    def __init__(self, size=ENCODING_WORKERS):
+        self.queue = Queue()
+        self.done = Queue()
+        self.threads = []
+        for _ in range(size):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            job.run()
+            self.done.put(job)
+
+    def submit(self, function, callback=None):
+        job = EncodingJob(function, callback)
+        self.queue.put(job)
+        return job
+
+    def process_callbacks(self):
+        """ call the callbacks of the jobs done and return those jobs """
+        jobs = []
+        while not self.done.empty():
+            job = self.done.get()
+            jobs.append(job)
+            if job.callback is None:
+                continue
+            try:
+                job.callback(job)
+            except Exception:
+                # a broken callback mustn't lose the other jobs done.
+                message = 'encoding callback failed:\n'
+                logging.error(message + traceback.format_exc())
+        return jobs
+
+    def terminate(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        self.threads = []
+
+
+def get_encoding_service():
+    global _encoding_service
+    if _encoding_service is None:
+        _encoding_service = EncodingService()
+    return _encoding_service
+
+
+def process_encoding_callbacks():
+    if _encoding_service is not None:
+        _encoding_service.process_callbacks()
+
+
+def terminate_encoding_service():
+    global _encoding_service
+    if _encoding_service is None:
+        return
+    _encoding_service.terminate()
+    _encoding_service = None
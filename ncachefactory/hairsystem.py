@@ -0,0 +1,46 @@
+"""
+This module contains utils to access the curves simulated by the hair
+systems. The output curves of the follicles are compared to their start
+curves to check the stretch.
+"""
+
+from maya import cmds
+import maya.api.OpenMaya as om2
+
+
+def find_follicles(hairsystem):
+    follicles = cmds.listConnections(
+        hairsystem + '.outputHair', shapes=True, type='follicle') or []
+    return sorted(set(follicles))
+
+
+def find_curves_dagpaths(hairsystem):
+    """ return a list of tuple (start curve, output curve) as MDagPath for
+    every follicle of the hair system which has both curves """
+    curves = []
+    for follicle in find_follicles(hairsystem):
+        output_curves = cmds.listConnections(
+            follicle + '.outCurve', shapes=True, type='nurbsCurve')
+        history = cmds.listHistory(follicle + '.startPosition') or []
+        start_curves = cmds.ls(history, type='nurbsCurve', long=True)
+        if not output_curves or not start_curves:
+            continue
+        selection_list = om2.MSelectionList()
+        selection_list.add(start_curves[0])
+        selection_list.add(output_curves[0])
+        curves.append(
+            (selection_list.getDagPath(0), selection_list.getDagPath(1)))
+    return curves
+
+
+def get_curves_points(dagpaths, space=om2.MSpace.kWorld):
+    """ return the cvs positions of all the curves as flat list of float
+    [x, y, z, ...] """
+    return [
+        value for dagpath in dagpaths
+        for point in om2.MFnNurbsCurve(dagpath).cvPositions(space)
+        for value in (point.x, point.y, point.z)]
+
+
+def get_curves_lengths(dagpaths):
+    return [om2.MFnNurbsCurve(dagpath).length() for dagpath in dagpaths]
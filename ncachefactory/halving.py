@@ -0,0 +1,156 @@
+"""
+This module contains the successive halving tools used to stop early the
+worst wedging caches. The batch simulations record scores at checkpoint
+frames (see checkpoints.json in the cacheversion directory). When all the
+running simulations reached a checkpoint, they are ranked and the worst
+fraction is killed. The survivors continue to the next checkpoint.
+The scores are lower is better:
+    - stretch: the highest stretch ratio of the output meshes edges.
+    - divergence: the points average distance with a reference cacheversion
+    snapshot at the same frame.
+    - time per frame: the average seconds spent per frame simulated.
+"""
+
+import os
+import json
+from array import array
+from math import ceil, sqrt, isinf, isnan
+
+
+SCORES_FILENAME = 'checkpoints.json'
+SNAPSHOT_FILENAME = 'points_{}.bin'
+STRETCH = 'stretch'
+DIVERGENCE = 'divergence'
+TIME_PER_FRAME = 'time per frame'
+METRICS = STRETCH, DIVERGENCE, TIME_PER_FRAME
+DEFAULT_FIRST_CHECKPOINT = 0.2
+
+
+def compute_checkpoints(
+        start_frame, end_frame, first_checkpoint=DEFAULT_FIRST_CHECKPOINT):
+    """
+    This function return the checkpoint frames. The first checkpoint is set
+    at the given fraction of the range and the fraction is doubled for each
+    next checkpoint (e.g 20%, 40%, 80%).
+    """
+    duration = end_frame - start_frame
+    checkpoints = []
+    fraction = first_checkpoint
+    while fraction < 1:
+        frame = int(round(start_frame + duration * fraction))
+        if frame not in checkpoints and start_frame < frame < end_frame:
+            checkpoints.append(frame)
+        fraction *= 2
+    return checkpoints
+
+
+def save_points_snapshot(directory, frame, points):
+    filename = os.path.join(directory, SNAPSHOT_FILENAME.format(frame))
+    with open(filename, 'wb') as f:
+        array('d', points).tofile(f)
+
+
+def load_points_snapshot(directory, frame):
+    filename = os.path.join(directory, SNAPSHOT_FILENAME.format(frame))
+    if not os.path.exists(filename):
+        return None
+    points = array('d')
+    with open(filename, 'rb') as f:
+        points.fromfile(f, os.path.getsize(filename) // points.itemsize)
+    return points
+
+
+def compute_divergence(points, reference_points):
+    """
+    This function return the average distance between two flat points arrays
+    [x, y, z, x, y, z ...]. That return None if the topologies are different.
+    """
+    if not points or len(points) != len(reference_points):
+        return None
+    total = 0.0
+    for i in range(0, len(points), 3):
+        total += sqrt(sum(
+            (points[i + j] - reference_points[i + j]) ** 2 for j in range(3)))
+    return total / (len(points) // 3)
+
+
+def record_checkpoint_scores(directory, frame, scores):
+    data = load_checkpoints_scores(directory)
+    data[frame] = scores
+    filename = os.path.join(directory, SCORES_FILENAME)
+    # the file is read by the ui during the simulation, it's written in a
+    # temporary file and renamed to never expose a partially written file.
+    temporary = filename + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump({str(k): v for k, v in data.items()}, f, indent=2)
+    if os.path.exists(filename) and os.name == 'nt':
+        os.remove(filename)
+    os.rename(temporary, filename)
+
+
+def load_checkpoints_scores(directory):
+    filename = os.path.join(directory, SCORES_FILENAME)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        return {int(k): v for k, v in json.load(f).items()}
+
+
+class SuccessiveHalving(object):
+    """ This object rank the jobs at every checkpoint and kill the worst ones.
+    The update method has to be called regularly, the monitor does it.
+    A job is described by his cacheversion directory, his process (which
+    provide a poll method) and a kill function which receive a message.
+    """
+
+    def __init__(self, checkpoints, metric=STRETCH, keep_ratio=0.5):
+        self.checkpoints = checkpoints
+        self.metric = metric
+        self.keep_ratio = keep_ratio
+        self.round = 0
+        self.jobs = []
+        self.survivors = []
+
+    def add_job(self, directory, process, kill_function):
+        job = directory, process, kill_function
+        self.jobs.append(job)
+        self.survivors.append(job)
+
+    @property
+    def finished(self):
+        return self.round >= len(self.checkpoints) or len(self.survivors) < 2
+
+    def update(self):
+        if self.finished:
+            return
+        frame = self.checkpoints[self.round]
+        scores = {}
+        for job in self.survivors:
+            directory, process, _ = job
+            checkpoint_scores = load_checkpoints_scores(directory).get(frame)
+            if checkpoint_scores is None:
+                if process.poll() is None:
+                    # still simulating, the round is not complete.
+                    return
+                # the job died before the checkpoint (killed or exploded)
+                continue
+            score = checkpoint_scores.get(self.metric)
+            scores[job] = float('inf') if score is None else score
+
+        values = set(scores.values())
+        if len(values) < 2 or all(isinf(v) or isnan(v) for v in values):
+            # the scores can't rank the jobs (e.g. a divergence without
+            # reference), all of them continue to the next checkpoint.
+            self.round += 1
+            return
+        ranked = sorted(scores, key=lambda job: scores[job])
+        keep = max(1, int(ceil(len(ranked) * self.keep_ratio)))
+        for job in ranked[keep:]:
+            kill_function = job[2]
+            message = (
+                "killed by successive halving at frame {}, {} = {}, "
+                "worse than the {} best").format(
+                    frame, self.metric, scores[job], keep)
+            kill_function(message)
+        self.survivors = ranked[:keep]
+        self.round += 1
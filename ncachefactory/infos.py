@@ -1,25 +1,36 @@
 
+import os
+import logging
 import datetime
 from functools import partial
 import subprocess
 
 from maya import cmds
-from PySide2 import QtWidgets, QtCore
+from PySide2 import QtWidgets, QtCore, QtGui
 
 from ncachefactory.versioning import (
-    filter_cacheversions_containing_nodes, cacheversion_contains_node)
+    filter_cacheversions_containing_nodes, cacheversion_contains_node,
+    load_json, INFOS_FILENAME)
+from ncachefactory.scheduler import find_outdated_inputs
+from ncachefactory.profiling import SOLVER, CPU_SUFFIX
 from ncachefactory.cachemanager import (
     filter_connected_cacheversions, connect_cacheversion, apply_settings,
     plug_cacheversion_to_inputmesh, plug_cacheversion_to_restshape,
     recover_original_inputmesh)
 from ncachefactory.optionvars import (
-    MEDIAPLAYER_PATH_OPTIONVAR, CACHEVERSION_SORTING_TYPE_OPTIONVAR)
+    MEDIAPLAYER_PATH_OPTIONVAR, CACHEVERSION_SORTING_TYPE_OPTIONVAR,
+    FFMPEG_PATH_OPTIONVAR)
+from ncachefactory.encoding import get_encoding_service
+from ncachefactory.thumbnails import (
+    generate_thumbnails, get_thumbnail_filenames, is_thumbnail_outdated,
+    get_frame_count, SPRITE_COLUMNS, SPRITE_ROWS)
 from ncachefactory.qtutils import get_icon
 from ncachefactory.attributessetters import (
     DynamicMapTransferWindow, AttributesTransferWindow)
 
 
 TIMEFORMAT = " %H:%M - %d/%m/%Y"
+THUMBNAIL_ICON_SIZE = 64, 36
 
 
 class WorkspaceCacheversionsExplorer(QtWidgets.QWidget):
@@ -28,7 +39,7 @@ class WorkspaceCacheversionsExplorer(QtWidgets.QWidget):
 
     def __init__(self, parent=None):
         super(WorkspaceCacheversionsExplorer, self).__init__(parent)
-        self.setFixedHeight(500)
+        self.setFixedHeight(654)
         self.cacheversion = None
         self.nodes = None
         self.map_setter = None
@@ -44,7 +55,10 @@ class WorkspaceCacheversionsExplorer(QtWidgets.QWidget):
         self.version_selector = QtWidgets.QComboBox()
         self.version_selector.setSizePolicy(maxpolicy)
         self.version_selector.setModel(self.version_selector_model)
+        self.version_selector.setIconSize(QtCore.QSize(*THUMBNAIL_ICON_SIZE))
         self.version_selector.currentIndexChanged.connect(self._call_index_changed)
+        method = self._call_thumbnails_generated
+        self.version_selector_model.thumbnailsGenerated.connect(method)
         self.version_toolbar = CacheversionToolbar()
         method = self._update_cacheversions_order
         self.version_toolbar.sortingOrderModified.connect(method)
@@ -55,6 +69,8 @@ class WorkspaceCacheversionsExplorer(QtWidgets.QWidget):
         self.version_layout.addWidget(self.version_selector)
         self.version_layout.addWidget(self.version_toolbar)
 
+        self.thumbnail = ThumbnailViewer()
+
         self.groupbox_infos = QtWidgets.QGroupBox()
         self.cacheversion_infos = CacheversionInfosWidget()
         self.cacheversion_infos.infosModified.connect(self.infosModified.emit)
@@ -101,6 +117,7 @@ class WorkspaceCacheversionsExplorer(QtWidgets.QWidget):
         self.layout = QtWidgets.QVBoxLayout(self)
         self.layout.setSpacing(4)
         self.layout.addLayout(self.version_layout)
+        self.layout.addWidget(self.thumbnail)
         self.layout.addWidget(self.groupbox_infos)
         self.layout.addLayout(self.connect_layout)
         self.layout.addLayout(self.connect_layout2)
@@ -160,9 +177,11 @@ class WorkspaceCacheversionsExplorer(QtWidgets.QWidget):
         if not self.version_selector_model.cacheversions:
             self.cacheversion = None
             self.cacheversion_infos.set_cacheversion(None)
+            self.update_thumbnail()
             return
         self.cacheversion = self.version_selector_model.cacheversions[index]
         self.cacheversion_infos.set_cacheversion(self.cacheversion)
+        self.update_thumbnail()
         self.update_ui_states()
 
     def get_connectable_nodes(self):
@@ -210,6 +229,18 @@ class WorkspaceCacheversionsExplorer(QtWidgets.QWidget):
             self.cacheversion, nodes=nodes or None, parent=self)
         self.map_setter.show()
 
+    def update_thumbnail(self):
+        if self.cacheversion is None:
+            self.thumbnail.set_thumbnails(None, None)
+            return
+        thumbnails = self.version_selector_model.get_thumbnails(
+            self.cacheversion)
+        self.thumbnail.set_thumbnails(*thumbnails)
+
+    def _call_thumbnails_generated(self, cacheversion):
+        if cacheversion is self.cacheversion:
+            self.update_thumbnail()
+
     def _call_show_playblasts(self):
         mediaplayer = cmds.optionVar(query=MEDIAPLAYER_PATH_OPTIONVAR)
         if not mediaplayer:
@@ -222,10 +253,17 @@ class WorkspaceCacheversionsExplorer(QtWidgets.QWidget):
 
 
 class CacheversionsListModel(QtCore.QAbstractListModel):
+    """ The thumbnails are loaded when they are displayed the first time. The
+    missing ones are generated by the encoding service, the icons are updated
+    when the generation callback is called. """
+    thumbnailsGenerated = QtCore.Signal(object)
 
     def __init__(self, parent=None):
         super(CacheversionsListModel, self).__init__(parent)
         self.cacheversions = []
+        self.icons = {}
+        self.pending = set()
+        self.failed = set()
 
     def rowCount(self, *unused_signal_args):
         return len(self.cacheversions)
@@ -240,6 +278,126 @@ class CacheversionsListModel(QtCore.QAbstractListModel):
             return
         if role == QtCore.Qt.DisplayRole:
             return self.cacheversions[index.row()].name
+        if role == QtCore.Qt.DecorationRole:
+            return self.get_icon(self.cacheversions[index.row()])
+
+    def get_icon(self, cacheversion):
+        if cacheversion.directory in self.icons:
+            return self.icons[cacheversion.directory]
+        poster, _ = self.get_thumbnails(cacheversion)
+        if poster is None:
+            return None
+        icon = QtGui.QIcon(poster)
+        self.icons[cacheversion.directory] = icon
+        return icon
+
+    def get_thumbnails(self, cacheversion):
+        """ return the poster and the sprite sheet filenames if they are
+        generated, otherwise, the generation is requested and None, None is
+        returned """
+        playblasts = cacheversion.infos.get('playblasts')
+        if not playblasts:
+            return None, None
+        if is_thumbnail_outdated(cacheversion.directory, playblasts):
+            self.request_thumbnails(cacheversion)
+            return None, None
+        return get_thumbnail_filenames(cacheversion.directory)
+
+    def request_thumbnails(self, cacheversion):
+        directory = cacheversion.directory
+        if directory in self.pending or directory in self.failed:
+            return
+        self.pending.add(cacheversion.directory)
+        function = partial(
+            generate_thumbnails,
+            ffmpeg=cmds.optionVar(query=FFMPEG_PATH_OPTIONVAR),
+            directory=cacheversion.directory,
+            playblasts=cacheversion.infos.get('playblasts'),
+            frames=get_frame_count(cacheversion.infos))
+        callback = partial(self.thumbnails_generated, cacheversion)
+        get_encoding_service().submit(function, callback)
+
+    def thumbnails_generated(self, cacheversion, job):
+        self.pending.discard(cacheversion.directory)
+        if job.error is not None:
+            # the generation isn't requested again for this session.
+            self.failed.add(cacheversion.directory)
+            message = "thumbnails generation failed: {}"
+            logging.warning(message.format(job.error))
+            return
+        self.icons.pop(cacheversion.directory, None)
+        if cacheversion in self.cacheversions:
+            row = self.cacheversions.index(cacheversion)
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index)
+        self.thumbnailsGenerated.emit(cacheversion)
+
+
+class ThumbnailViewer(QtWidgets.QWidget):
+    """ This widget display the poster frame of the cacheversion. When the
+    mouse hovers it, the sprite sheet frames are scrubbed following the
+    mouse position. """
+
+    def __init__(self, parent=None):
+        super(ThumbnailViewer, self).__init__(parent)
+        self.setFixedHeight(90)
+        self.setMouseTracking(True)
+        self.poster = None
+        self.sprites = None
+        self.sprite_index = None
+
+    def set_thumbnails(self, poster, sprites):
+        self.poster = QtGui.QPixmap(poster) if poster else None
+        self.sprites = QtGui.QPixmap(sprites) if sprites else None
+        self.sprite_index = None
+        self.repaint()
+
+    def mouseMoveEvent(self, event):
+        if self.sprites is None:
+            return
+        count = SPRITE_COLUMNS * SPRITE_ROWS
+        ratio = event.pos().x() / float(max(1, self.width()))
+        self.sprite_index = min(count - 1, max(0, int(ratio * count)))
+        self.repaint()
+
+    def leaveEvent(self, event):
+        self.sprite_index = None
+        self.repaint()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter()
+        painter.begin(self)
+        try:
+            draw_thumbnail(painter, self)
+        except Exception:
+            import traceback
+            print(traceback.format_exc())
+        finally:
+            painter.end()
+
+
+def draw_thumbnail(painter, viewer):
+    rect = viewer.rect()
+    painter.fillRect(rect, QtGui.QColor("#252525"))
+    if viewer.sprite_index is not None:
+        width = viewer.sprites.width() // SPRITE_COLUMNS
+        height = viewer.sprites.height() // SPRITE_ROWS
+        row, column = divmod(viewer.sprite_index, SPRITE_COLUMNS)
+        source = QtCore.QRect(column * width, row * height, width, height)
+        pixmap = viewer.sprites.copy(source)
+    elif viewer.poster is not None:
+        pixmap = viewer.poster
+    else:
+        flags = QtCore.Qt.AlignCenter
+        painter.setPen(QtGui.QPen(QtGui.QColor("#ACACAC")))
+        painter.drawText(QtCore.QRectF(rect), flags, "No thumbnail")
+        return
+    pixmap = pixmap.scaled(
+        rect.size(), QtCore.Qt.KeepAspectRatio,
+        QtCore.Qt.SmoothTransformation)
+    x = (rect.width() - pixmap.width()) // 2
+    y = (rect.height() - pixmap.height()) // 2
+    painter.drawPixmap(x, y, pixmap)
 
 
 class CacheversionInfosWidget(QtWidgets.QWidget):
@@ -260,6 +418,17 @@ class CacheversionInfosWidget(QtWidgets.QWidget):
         self.comment.textChanged.connect(self._call_comment_changed)
         self.scene = QtWidgets.QLineEdit('')
         self.scene.setReadOnly(True)
+        self.batch = QtWidgets.QLabel("---")
+        self.lineage = QtWidgets.QLabel("---")
+        self.lineage.setWordWrap(True)
+        self.profile = QtWidgets.QLabel("---")
+        self.profile.setWordWrap(True)
+        self.detection = QtWidgets.QLabel("---")
+        self.detection.setWordWrap(True)
+        self.encodings = QtWidgets.QLabel("---")
+        self.encodings.setWordWrap(True)
+        self.captures = QtWidgets.QLabel("---")
+        self.captures.setWordWrap(True)
         self.nodes_table_model = NodeInfosTableModel()
         self.nodes_table_view = NodeInfosTableView()
         self.nodes_table_view.setModel(self.nodes_table_model)
@@ -271,6 +440,12 @@ class CacheversionInfosWidget(QtWidgets.QWidget):
         self.form_layout.addRow("Name:", self.name)
         self.form_layout.addRow("Comment:", self.comment)
         self.form_layout.addRow("Scene:", self.scene)
+        self.form_layout.addRow("Batch:", self.batch)
+        self.form_layout.addRow("Inputs:", self.lineage)
+        self.form_layout.addRow("Profile:", self.profile)
+        self.form_layout.addRow("Explosion:", self.detection)
+        self.form_layout.addRow("Encodings:", self.encodings)
+        self.form_layout.addRow("Captures:", self.captures)
 
         self.layout = QtWidgets.QVBoxLayout(self)
         self.layout.addLayout(self.form_layout)
@@ -288,6 +463,12 @@ class CacheversionInfosWidget(QtWidgets.QWidget):
             self.creation_date.setText("---")
             self.modification_date.setText("---")
             self.scene.setText('')
+            self.batch.setText("---")
+            self.lineage.setText("---")
+            self.profile.setText("---")
+            self.detection.setText("---")
+            self.encodings.setText("---")
+            self.captures.setText("---")
             return
         scene = cacheversion.infos.get("scene") or 'No scene saved'
         creation = cacheversion.infos.get("creation_time")
@@ -296,6 +477,15 @@ class CacheversionInfosWidget(QtWidgets.QWidget):
         modification = datetime.datetime.fromtimestamp(modification)
         self.name.setText(cacheversion.infos["name"])
         self.scene.setText(scene)
+        self.batch.setText(format_batch_infos(cacheversion.infos.get('batch')))
+        self.lineage.setText(format_lineage(cacheversion.infos.get('lineage')))
+        self.profile.setText(format_profile(cacheversion.infos.get('profile')))
+        detection = cacheversion.infos.get('detection')
+        self.detection.setText(format_detection(detection))
+        encodings = cacheversion.infos.get('encodings')
+        self.encodings.setText(format_encodings(encodings))
+        captures = cacheversion.infos.get('captures')
+        self.captures.setText(format_captures(captures))
         self.creation_date.setText(creation.strftime(TIMEFORMAT))
         self.modification_date.setText(modification.strftime(TIMEFORMAT))
         self.comment.setText(cacheversion.infos.get("comment"))
@@ -314,6 +504,74 @@ class CacheversionInfosWidget(QtWidgets.QWidget):
         self.cacheversion.set_comment(self.comment.toHtml())
 
 
+def format_batch_infos(infos):
+    if not infos:
+        return "---"
+    texts = ['slim scene' if infos.get('slim') else 'full scene']
+    if infos.get('scene_size') is not None:
+        texts.append('{:.1f} Mb'.format(infos['scene_size'] / 1048576.0))
+    if infos.get('flash_time') is not None:
+        texts.append('saved in {:.1f}s'.format(infos['flash_time']))
+    if infos.get('scene_open_time') is not None:
+        texts.append('opened in {:.1f}s'.format(infos['scene_open_time']))
+    return ', '.join(texts)
+
+
+def format_lineage(lineage):
+    if not lineage:
+        return "---"
+    infos_by_directory = {}
+    for input_ in lineage:
+        filename = os.path.join(input_['directory'], INFOS_FILENAME)
+        if os.path.exists(filename):
+            infos_by_directory[input_['directory']] = load_json(filename)
+    outdated = find_outdated_inputs(lineage, infos_by_directory)
+    texts = [
+        input_['name'] + (' (outdated)' if input_ in outdated else '')
+        for input_ in lineage]
+    return ', '.join(texts)
+
+
+def format_profile(profile):
+    if not profile or not profile['summary']['frames']:
+        return "---"
+    summary = profile['summary']
+    totals = summary['totals']
+    texts = ['solver {:.1f}s (cpu {:.1f}s)'.format(
+        totals[SOLVER], totals[SOLVER + CPU_SUFFIX])]
+    callbacks = sorted(
+        (total, column) for column, total in totals.items()
+        if column != SOLVER and not column.endswith(CPU_SUFFIX))
+    for total, column in reversed(callbacks):
+        texts.append('{} {:.1f}s'.format(column, total))
+    if summary['overhead'] is not None:
+        texts.append('overhead {:.0%}'.format(summary['overhead']))
+    return ', '.join(texts)
+
+
+def format_detection(detection):
+    if not detection:
+        return "---"
+    text = '{detector} on {node} at frame {frame}: {reason}'
+    return text.format(**detection)
+
+
+def format_encodings(encodings):
+    if not encodings:
+        return "---"
+    text = '{} {:.1f}MB in {:.1f}s'
+    return ', '.join(
+        text.format(e['preset'], e['size'] / 1048576.0, e['seconds'])
+        for e in encodings)
+
+
+def format_captures(captures):
+    if not captures:
+        return "---"
+    text = '{camera} {width}x{height}'
+    return ', '.join(text.format(**capture) for capture in captures)
+
+
 class NodeInfosTableView(QtWidgets.QTableView):
     def __init__(self, parent=None):
         super(NodeInfosTableView, self).__init__(parent)
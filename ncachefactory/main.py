@@ -1,5 +1,6 @@
 
 import os
+import logging
 from functools import partial
 import webbrowser
 
@@ -27,17 +28,26 @@ from ncachefactory.optionvars import (
     MULTICACHE_EXP_OPTIONVAR, ensure_optionvars_exists)
 from ncachefactory.batchcacher import BatchCacher
 from ncachefactory.attributes import filter_invisible_nodes_for_manager
-from ncachefactory.batch import send_batch_ncache_jobs, send_wedging_ncaches_jobs
+from ncachefactory.batch import (
+    send_batch_ncache_jobs, send_wedging_ncaches_jobs,
+    send_outdated_cacheversions_jobs, send_deferred_playblast_job,
+    close_worker_pool)
 from ncachefactory.timecallbacks import (
     register_time_callback, add_to_time_callback, unregister_time_callback,
-    time_verbose, clear_time_callback_functions)
+    time_verbose, clear_time_callback_functions, save_frame_profile)
 from ncachefactory.monitoring import MultiCacheMonitor
+from ncachefactory.encoding import (
+    process_encoding_callbacks, terminate_encoding_service)
+from ncachefactory.halving import (
+    SuccessiveHalving, compute_checkpoints, DIVERGENCE)
+from ncachefactory.scheduler import JobScheduler, MemoryAdmission
 from ncachefactory.workspace import (
     get_default_workspace, set_last_used_workspace)
 from ncachefactory.workspacesetter import WorkspaceWidget
 
 HELPFOLDER = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'help')
 WINDOW_TITLE = "nCache Factory"
+BACKGROUND_UPDATE_INTERVAL = 250
 
 
 class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
@@ -47,11 +57,21 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self.setWindowTitle(WINDOW_TITLE)
         self.workspace = None
         self.processes = []
+        self.deferred_playblasts = []
 
         self.pathoptions = PathOptions(self)
         self.workspace_widget = WorkspaceWidget()
         self.nodetable = DynamicNodesTableWidget()
         self.batch_monitor = MultiCacheMonitor(parent=self)
+        # the encodings and the deferred playblasts can finish after the
+        # monitor is closed. The timer isn't stopped when the manager is
+        # closed for the same reason.
+        self.background_timer = QtCore.QTimer(self)
+        self.background_timer.timeout.connect(process_encoding_callbacks)
+        self.background_timer.timeout.connect(self.check_deferred_playblasts)
+        self.background_timer.start(BACKGROUND_UPDATE_INTERVAL)
+        application = QtWidgets.QApplication.instance()
+        application.aboutToQuit.connect(terminate_encoding_service)
 
         self.senders = CacheSendersWidget()
         method = partial(self.create_cache, selection=False)
@@ -132,6 +152,10 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self.show_monitor = QtWidgets.QAction('Batch cache monitor', self.menufile)
         self.menufile.addAction(self.show_monitor)
         self.show_monitor.triggered.connect(self.batch_monitor.show)
+        text = 'Recache outdated versions'
+        self.recache_outdated = QtWidgets.QAction(text, self.menufile)
+        self.menufile.addAction(self.recache_outdated)
+        self.recache_outdated.triggered.connect(self.send_outdated_caches)
         self.help = QtWidgets.QAction('Help', self.menufile)
         self.menufile.addAction(self.help)
         self.help.triggered.connect(self._call_help)
@@ -166,12 +190,15 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         self.comparison.closeEvent(event)
         self.workspace_widget.closeEvent(event)
         self.save_optionvars()
+        close_worker_pool()
 
     def set_workspace(self, workspace):
         self.workspace = workspace
         self.nodetable.set_workspace(workspace)
         self.batchcacher.set_workspace(workspace)
         self.workspace_widget.set_workspace(workspace)
+        self.playblast.set_workspace(
+            workspace, list_available_cacheversions(workspace))
         self.nodetable.update_layout()
 
     def selection_changed(self):
@@ -245,7 +272,9 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             nodes = cmds.ls(type=DYNAMIC_NODES)
             nodes = filter_invisible_nodes_for_manager(nodes)
 
-        create_and_record_cacheversion(
+        playblast = self.playblast.record_playblast
+        deferred = playblast and self.is_playblast_deferred()
+        cacheversion = create_and_record_cacheversion(
             workspace=workspace,
             start_frame=start_frame,
             end_frame=end_frame,
@@ -253,8 +282,11 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             behavior=self.cacheoptions.behavior,
             evaluate_every_frame=self.cacheoptions.samples_evaluated,
             save_every_evaluation=self.cacheoptions.samples_recorded,
-            playblast=self.playblast.record_playblast,
+            playblast=playblast and not deferred,
             playblast_viewport_options=self.playblast.viewport_options)
+        save_frame_profile(cacheversion)
+        if deferred:
+            self.send_deferred_playblast(cacheversion, nodes, start_frame)
 
         self.nodetable.set_workspace(workspace)
         self.nodetable.update_layout()
@@ -262,6 +294,45 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
         unregister_time_callback()
         clear_time_callback_functions()
 
+    def is_playblast_deferred(self):
+        if not self.playblast.deferred_playblast:
+            return False
+        mayapy = cmds.optionVar(query=MAYAPY_PATH_OPTIONVAR)
+        if os.path.exists(mayapy) is False:
+            cmds.warning("invalid mayapy path set, playblast not deferred")
+            return False
+        return True
+
+    def send_deferred_playblast(self, cacheversion, nodes, start_frame):
+        nodes = nodes or filter_invisible_nodes_for_manager(
+            cmds.ls(type=DYNAMIC_NODES))
+        # the range really cached is set at the end of the record.
+        end_frame = cmds.currentTime(query=True)
+        process = send_deferred_playblast_job(
+            cacheversion=cacheversion,
+            nodes=nodes,
+            start_frame=start_frame,
+            end_frame=end_frame,
+            playblast_viewport_options=self.playblast.viewport_options)
+        self.processes.append(process)
+        self.deferred_playblasts.append((cacheversion, process))
+        message = "playblast of {} rendered in background"
+        logging.info(message.format(cacheversion.name))
+
+    def check_deferred_playblasts(self):
+        """ the deferred playblasts aren't followed by the monitor, they
+        don't write any progression. The failures are reported here. """
+        running = []
+        for cacheversion, process in self.deferred_playblasts:
+            returncode = process.poll()
+            if returncode is None:
+                running.append((cacheversion, process))
+            elif returncode != 0:
+                message = "playblast of {} failed, see the log in {}"
+                cmds.warning(
+                    message.format(cacheversion.name, cacheversion.directory))
+        self.deferred_playblasts = running
+
     def erase_cache(self, selection=True):
         register_time_callback()
         if self.cacheoptions.verbose is True:
@@ -299,6 +370,7 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             save_every_evaluation=self.cacheoptions.samples_recorded,
             playblast=self.playblast.record_playblast,
             playblast_viewport_options=self.playblast.viewport_options)
+        save_frame_profile(cacheversions[0])
         self.nodetable.update_layout()
         self.selection_changed()
         unregister_time_callback()
@@ -343,6 +415,7 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             save_every_evaluation=self.cacheoptions.samples_recorded,
             playblast=self.playblast.record_playblast,
             playblast_viewport_options=self.playblast.viewport_options)
+        save_frame_profile(cacheversion, append=True)
         self.nodetable.update_layout()
         self.selection_changed()
         unregister_time_callback()
@@ -365,7 +438,31 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             return cmds.warning("no nodes selected")
 
         start_frame, end_frame = self.cacheoptions.range
-        cacheversions, processes = send_batch_ncache_jobs(
+        scheduler = self.create_scheduler()
+        try:
+            cacheversions, processes = self._send_batch_ncache_jobs(
+                nodes, start_frame, end_frame, scheduler)
+        except ValueError as error:
+            return cmds.warning(str(error))
+        self.processes.extend(processes)
+        for cacheversion, process in zip(cacheversions, processes):
+            self.batch_monitor.add_job(cacheversion, process)
+        self.batch_monitor.add_scheduler(scheduler)
+        self.batch_monitor.show()
+        self.batchcacher.clear()
+        self.nodetable.set_workspace(self.workspace)
+        self.nodetable.update_layout()
+        self.selection_changed()
+
+    def create_scheduler(self):
+        limit = self.batchcacher.batch_options.memory_limit
+        if not limit:
+            return JobScheduler()
+        return JobScheduler(admission=MemoryAdmission(limit))
+
+    def _send_batch_ncache_jobs(
+            self, nodes, start_frame, end_frame, scheduler):
+        return send_batch_ncache_jobs(
             workspace=self.workspace,
             jobs=self.batchcacher.jobs,
             start_frame=start_frame,
@@ -375,15 +472,34 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             save_every_evaluation=self.cacheoptions.samples_recorded,
             playblast_viewport_options=self.playblast.viewport_options,
             timelimit=self.batchcacher.options.timelimit,
-            stretchmax=self.batchcacher.options.explosion_detection_tolerance)
+            stretchmax=self.batchcacher.options.explosion_detection_tolerance,
+            timelimit_factor=self.batchcacher.options.timelimit_factor,
+            timelimit_warmup=self.batchcacher.options.timelimit_warmup,
+            workers=self.batchcacher.batch_options.workers,
+            checkpoint_interval=(
+                self.batchcacher.batch_options.checkpoint_interval),
+            split_solvers=self.batchcacher.batch_options.split_solvers,
+            scheduler=scheduler,
+            detectors=self.batchcacher.options.detectors)
+
+    def send_outdated_caches(self):
+        if self.workspace is None:
+            return cmds.warning("invalid workspace set")
+        mayapy = cmds.optionVar(query=MAYAPY_PATH_OPTIONVAR)
+        if os.path.exists(mayapy) is False:
+            return cmds.warning("invalid mayapy path set")
+        scheduler = self.create_scheduler()
+        cacheversions, processes = send_outdated_cacheversions_jobs(
+            workspace=self.workspace,
+            scheduler=scheduler,
+            workers=self.batchcacher.batch_options.workers)
+        if not cacheversions:
+            return cmds.warning("no outdated cacheversion to recache")
         self.processes.extend(processes)
         for cacheversion, process in zip(cacheversions, processes):
             self.batch_monitor.add_job(cacheversion, process)
+        self.batch_monitor.add_scheduler(scheduler)
         self.batch_monitor.show()
-        self.batchcacher.clear()
-        self.nodetable.set_workspace(self.workspace)
-        self.nodetable.update_layout()
-        self.selection_changed()
 
     def send_wedging_cache(self, selection=False):
         if self.workspace is None:
@@ -402,6 +518,13 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             return cmds.warning("no nodes selected")
 
         start_frame, end_frame = self.cacheoptions.range
+        checkpoints = None
+        if self.batchcacher.halving_enabled:
+            if (self.batchcacher.halving_metric == DIVERGENCE and
+                    self.batchcacher.halving_reference is None):
+                message = "a reference is needed to rank by divergence"
+                return cmds.warning(message)
+            checkpoints = compute_checkpoints(start_frame, end_frame)
         cacheversions, processes = send_wedging_ncaches_jobs(
             workspace=self.workspace,
             name=self.batchcacher.wedging_name,
@@ -413,11 +536,27 @@ class NCacheManager(MayaQWidgetDockableMixin, QtWidgets.QWidget):
             playblast_viewport_options=self.playblast.viewport_options,
             timelimit=self.batchcacher.options.timelimit,
             stretchmax=self.batchcacher.options.explosion_detection_tolerance,
-            attribute=self.batchcacher.attribute,
-            values=self.batchcacher.wedging_values)
+            timelimit_factor=self.batchcacher.options.timelimit_factor,
+            timelimit_warmup=self.batchcacher.options.timelimit_warmup,
+            overrides=self.batchcacher.wedging_overrides,
+            design=self.batchcacher.wedging_design,
+            workers=self.batchcacher.batch_options.workers,
+            fork=self.batchcacher.batch_options.fork_wedging,
+            slim=self.batchcacher.batch_options.slim_scenes,
+            checkpoints=checkpoints,
+            reference=self.batchcacher.halving_reference,
+            checkpoint_interval=(
+                self.batchcacher.batch_options.checkpoint_interval),
+            detectors=self.batchcacher.options.detectors)
         self.processes.extend(processes)
         for cacheversion, process in zip(cacheversions, processes):
             self.batch_monitor.add_job(cacheversion, process)
+        if checkpoints:
+            halving = SuccessiveHalving(
+                checkpoints=checkpoints,
+                metric=self.batchcacher.halving_metric,
+                keep_ratio=self.batchcacher.halving_keep_ratio)
+            self.batch_monitor.add_halving(halving, cacheversions)
         self.batch_monitor.show()
         self.nodetable.set_workspace(self.workspace)
         self.nodetable.update_layout()
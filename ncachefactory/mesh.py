@@ -1,5 +1,11 @@
 from maya import cmds, mel
 import maya.api.OpenMaya as om2
+from ncachefactory.stretch import StretchChecker
+try:
+    import numpy
+except ImportError:
+    # mayapy doesn't always ship numpy.
+    numpy = None
 
 
 CONNECT_GEO_CACHE_MEL_COMMAND = """\
@@ -9,6 +15,9 @@ string $geometries[] = {{"{}"}};
 doImportCacheFile($filename, $filetype, $geometries, {{}});\
 """
 
+# the edge lengths are compared in object space as MItMeshEdge.length does.
+OBJECT_SPACE = om2.MSpace.kObject
+
 
 def get_mesh_color(mesh):
     if not mesh:
@@ -105,20 +114,68 @@ def attach_geo_cache(mesh, xml_file):
 def is_deformed_mesh_too_stretched(
         deformed_mesh, reference_mesh, tolerence_factor=2):
     """ This function compare a deformed mesh to a reference mesh and query if
-    some edges seems too stretched. The algorytm is simple, is parse the two
-    meshes, compare edge per edge. If mesh deformed edge is longer than the
+    some edges seems too stretched. If a deformed edge is longer than the
     reference mesh one multiplied by the tolerence factor, the function return
-    False, else it return True.
+    True, else it return False.
+    """
+    ratio = compute_deformed_mesh_stretch_ratio(deformed_mesh, reference_mesh)
+    return ratio > tolerence_factor
+
+
+def compute_deformed_mesh_stretch_ratio(deformed_mesh, reference_mesh):
+    """ This function compare a deformed mesh to a reference mesh and return
+    the highest ratio between a deformed edge length and the reference one.
+    """
+    checker = create_stretch_checker(reference_mesh)
+    summary = checker.summarize(get_mesh_points(deformed_mesh, OBJECT_SPACE))
+    return summary['max'] if summary else 0.0
+
+
+def create_stretch_checker(reference_mesh):
+    """ This function extract the edges topology and the rest lengths of the
+    reference mesh. The checker returned compute the stretch of a deformed
+    mesh sharing the same topology from his points only.
+    """
+    dagpath = om2.MSelectionList().add(reference_mesh).getDagPath(0)
+    return create_dagpath_stretch_checker(dagpath)
+
+
+def create_dagpath_stretch_checker(dagpath):
+    return StretchChecker(
+        get_dagpath_edges(dagpath), get_dagpath_points(dagpath, OBJECT_SPACE))
+
+
+def get_dagpath_edges(dagpath):
+    edge_iterator = om2.MItMeshEdge(dagpath)
+    edges = []
+    while not edge_iterator.isDone():
+        edges.extend((edge_iterator.vertexId(0), edge_iterator.vertexId(1)))
+        edge_iterator.next()
+    return edges
+
+
+def get_mesh_points(mesh, space=om2.MSpace.kWorld):
+    """ return the mesh points positions as flat list of float [x, y, z, ...]
     """
-    selection_list = om2.MSelectionList()
-    selection_list.add(deformed_mesh)
-    selection_list.add(reference_mesh)
-    deformed_edge_iterator = om2.MItMeshEdge(selection_list.getDagPath(0))
-    reference_edge_iterator = om2.MItMeshEdge(selection_list.getDagPath(1))
-    while not reference_edge_iterator.isDone():
-        limit = tolerence_factor * reference_edge_iterator.length()
-        if deformed_edge_iterator.length() > limit:
-            return True
-        reference_edge_iterator.next()
-        deformed_edge_iterator.next()
-    return False
\ No newline at end of file
+    dagpath = om2.MSelectionList().add(mesh).getDagPath(0)
+    return get_dagpath_points(dagpath, space)
+
+
+def get_dagpath_points(dagpath, space=om2.MSpace.kWorld):
+    """ return the points as flat numpy array if numpy is available. The
+    MPointArray doesn't expose a buffer, so the coordinates are still read
+    point by point but they're written directly in the array, without the
+    homogeneous w coordinate and the intermediate lists. """
+    points = om2.MFnMesh(dagpath).getPoints(space)
+    values = (
+        value for point in points for value in (point.x, point.y, point.z))
+    if numpy is not None:
+        return numpy.fromiter(values, dtype=float, count=3 * len(points))
+    return list(values)
+
+
+def is_same_topology(dagpath1, dagpath2):
+    mesh1, mesh2 = om2.MFnMesh(dagpath1), om2.MFnMesh(dagpath2)
+    return (
+        mesh1.numVertices == mesh2.numVertices and
+        mesh1.numEdges == mesh2.numEdges)
@@ -1,9 +1,10 @@
 import os
 from math import ceil, sqrt
+from functools import partial
 from PySide2 import QtWidgets, QtGui, QtCore
 from maya import cmds
 
-from ncachefactory.playblast import compile_movie
+from ncachefactory.playblast import submit_movie_compilation
 from ncachefactory.cachemanager import connect_cacheversion
 from ncachefactory.ncache import list_connected_cachefiles
 from ncachefactory.arrayutils import overlap_arrays_from_ranges, range_ranges
@@ -11,11 +12,20 @@ from ncachefactory.sequencereader import (
     SequenceImageReader, ImageViewer, SequenceStackedImagesReader,
     ContactSheetImagesReader)
 from ncachefactory.versioning import (
-    get_log_filename, list_tmp_jpeg_under_cacheversion)
+    get_log_filename, list_tmp_jpeg_under_cacheversion, get_last_checkpoint,
+    move_playblast_to_cacheversion)
+from ncachefactory.encoding import get_streamed_movie_filename
+from ncachefactory.batch import resume_batch_cacheversion
+from ncachefactory.progress import (
+    ProgressReader, write_progress_event, summarize_progress,
+    format_progress, KILLED, FINISHED)
+from ncachefactory.telemetry import (
+    summarize_resources, extract_resource_series)
 
 
 WINDOW_TITLE = "Batch cacher monitoring"
 CACHEVERSION_SELECTION_TITLE = "Select cache to compare"
+MONITOR_MESSAGE_PREFIX = "MONITOR: "
 
 
 class MultiCacheMonitor(QtWidgets.QWidget):
@@ -28,6 +38,8 @@ class MultiCacheMonitor(QtWidgets.QWidget):
         self.tab_widget.setTabsClosable(True)
         self.tab_widget.tabCloseRequested.connect(self.tab_closed)
         self.job_panels = []
+        self.halvings = []
+        self.schedulers = []
 
         self.layout = QtWidgets.QHBoxLayout(self)
         self.layout.setContentsMargins(2, 2, 2, 2)
@@ -49,6 +61,29 @@ class MultiCacheMonitor(QtWidgets.QWidget):
         self.tab_widget.addTab(job_panel, cacheversion.name)
         self.tab_widget.setCurrentIndex(len(self.job_panels) - 1)
 
+    def add_halving(self, halving, cacheversions):
+        """ register a successive halving controller for the jobs of the
+        given cacheversions. The monitor update it regularly and kill the jobs
+        through their panels to keep the ui consistent. """
+        for job_panel in self.job_panels:
+            if job_panel.cacheversion not in cacheversions:
+                continue
+            kill_function = partial(self._call_halving_kill, job_panel)
+            halving.add_job(
+                job_panel.cacheversion.directory,
+                job_panel.process,
+                kill_function)
+        self.halvings.append(halving)
+
+    def add_scheduler(self, scheduler):
+        """ register a job scheduler. The monitor update it regularly to
+        launch the jobs when their dependencies are finished. """
+        self.schedulers.append(scheduler)
+
+    def _call_halving_kill(self, job_panel, message):
+        job_panel.log.add_message(message)
+        job_panel._call_kill(reason=message)
+
     def showEvent(self, *events):
         super(MultiCacheMonitor, self).showEvent(*events)
         self.timer.start(47, self)
@@ -73,6 +108,12 @@ class MultiCacheMonitor(QtWidgets.QWidget):
         if next(self.updater) is True:
             for job_panel in self.job_panels:
                 job_panel.update()
+            for halving in self.halvings:
+                halving.update()
+            self.halvings = [h for h in self.halvings if not h.finished]
+            for scheduler in self.schedulers:
+                scheduler.update()
+            self.schedulers = [s for s in self.schedulers if not s.finished]
 
     def _call_comparison(self, job_panel):
         cacheversions = [jp.cacheversion for jp in self.job_panels]
@@ -91,11 +132,18 @@ class MultiCacheMonitor(QtWidgets.QWidget):
             arrays=[job_panel.images._pixmaps, job_panel2.images._pixmaps],
             ranges=[range1, range2])
         frames = range_ranges([range1, range2])
+        playblast_lists = []
+        for cacheversion in job_panel.cacheversion, job_panel2.cacheversion:
+            # the playblasts are added by the process at the end of the job.
+            cacheversion.update()
+            playblast_lists.append(cacheversion.infos.get('playblasts'))
         comparator = SequenceStackedImagesReader(
             pixmaps1=pixmaps1,
             pixmaps2=pixmaps2,
             frames=frames,
             names=names,
+            playblast_lists=playblast_lists,
+            ranges=[range1, range2],
             parent=self)
         comparator.show()
         self.comparators.append(comparator)
@@ -140,12 +188,19 @@ class JobPanel(QtWidgets.QWidget):
         startframe = cacheversion.infos['start_frame']
         endframe = cacheversion.infos['end_frame']
         self.images = SequenceImageReader(range_=[startframe, endframe])
+        self.progress = ProgressReader(cacheversion.directory)
+        self.progress_label = QtWidgets.QLabel(format_progress(
+            summarize_progress([]), endframe))
+        self.resources = ResourceGraph()
         self.log = InteractiveLog(filepath=self.logfile)
         self.connect_cache = QtWidgets.QPushButton('Connect cache')
         self.connect_cache.released.connect(self._call_connect_cache)
         self.connect_cache.setEnabled(False)
         self.kill_button = QtWidgets.QPushButton('Kill')
         self.kill_button.released.connect(self._call_kill)
+        self.resume_button = QtWidgets.QPushButton('Resume')
+        self.resume_button.setEnabled(False)
+        self.resume_button.released.connect(self._call_resume)
         self.compare = QtWidgets.QPushButton('Compare with')
         self.compare.setEnabled(False)
         self.compare.released.connect(self._call_compare)
@@ -159,9 +214,12 @@ class JobPanel(QtWidgets.QWidget):
         self.log_layout = QtWidgets.QVBoxLayout(self.log_widget)
         self.log_layout.setContentsMargins(0, 0, 0, 0)
         self.log_layout.setSpacing(2)
+        self.log_layout.addWidget(self.progress_label)
+        self.log_layout.addWidget(self.resources)
         self.log_layout.addWidget(self.log)
         self.log_layout.addWidget(self.connect_cache)
         self.log_layout.addWidget(self.kill_button)
+        self.log_layout.addWidget(self.resume_button)
         self.log_layout.addWidget(self.compare)
         self.log_layout.addWidget(self.contactsheet)
         self.log_layout.addWidget(self.playstop)
@@ -175,7 +233,20 @@ class JobPanel(QtWidgets.QWidget):
         self.layout.addWidget(self.splitter)
 
     def update(self):
-        if self.log.is_log_changed() is False or self.finished is True:
+        if self.finished is True:
+            return
+        self.update_progress()
+        if self.log.is_log_changed() is False:
+            if self.process.poll() is None:
+                return
+            # the last images can be missed by the monitor, the end of the
+            # job is decided from the process and the progress stream.
+            if self.is_interrupted() is False:
+                self.finish()
+                return
+            # the process is terminated before the end of the cache. It
+            # crashed or has been killed outside of the ui.
+            self.interrupt()
             return
         self.log.update()
         jpegs = list_tmp_jpeg_under_cacheversion(self.cacheversion)
@@ -202,10 +273,36 @@ class JobPanel(QtWidgets.QWidget):
             if self.contactsheet.isEnabled() is False:
                 self.contactsheet.setEnabled(True)
 
-        if self.images.isfull() is True:
-            self.finished = True
-            self.images.finish()
-            self.kill_button.setEnabled(False)
+        # the playblast can be finished before the end of the process when
+        # the cache is splitted in several processes.
+        if self.images.isfull() is True and self.process.poll() is not None:
+            self.finish()
+
+    def is_interrupted(self):
+        """ a terminated job is interrupted if his process failed or if one
+        of the processes recording the cache didn't write the finished event
+        """
+        if self.process.poll():
+            return True
+        self.update_progress()
+        statuses = self.progress.statuses.values()
+        if not statuses:
+            return True
+        return any(event['event'] != FINISHED for event in statuses)
+
+    def update_progress(self):
+        if not self.progress.read():
+            return
+        summary = summarize_progress(self.progress.events)
+        end_frame = self.cacheversion.infos['end_frame']
+        self.progress_label.setText(format_progress(summary, end_frame))
+        self.resources.set_events(self.progress.events)
+
+    def finish(self):
+        self.finished = True
+        self.images.finish()
+        self.kill_button.setEnabled(False)
+        self.update_progress()
 
     def _call_connect_cache(self):
         startframe = self.cacheversion.infos['start_frame']
@@ -222,10 +319,32 @@ class JobPanel(QtWidgets.QWidget):
             cmds.setAttr(cachenode + '.originalEnd', endframe)
             cmds.setAttr(cachenode + '.sourceEnd', endframe)
 
-    def _call_kill(self):
-        self.kill()
+    def _call_kill(self, reason=None):
+        self.kill(reason)
         self.kill_button.setEnabled(False)
 
+    def _call_resume(self):
+        frame, _ = get_last_checkpoint(self.cacheversion.directory)
+        if frame is None:
+            return
+        # the images recorded after the checkpoint are simulated again.
+        count = max(0, frame - self.cacheversion.infos['start_frame'])
+        self.imagepath = self.imagepath[:count]
+        self.images.truncate(count)
+        # the events of the interrupted run are ignored. That's done before
+        # the launch to not skip the first events of the resumed process.
+        self.progress.skip()
+        end_frame = self.cacheversion.infos['end_frame']
+        self.progress_label.setText(
+            format_progress(summarize_progress([]), end_frame))
+        self.resources.set_events([])
+        self.process = resume_batch_cacheversion(self.cacheversion)
+        self.finished = False
+        self.kill_button.setEnabled(True)
+        self.resume_button.setEnabled(False)
+        message = "resume from checkpoint at frame {}".format(frame)
+        self.log.add_message(message)
+
     def _call_playstop(self):
         self.is_playing = not self.is_playing
         self.playstop.setText("Stop" if self.is_playing else "Play")
@@ -236,12 +355,26 @@ class JobPanel(QtWidgets.QWidget):
     def _call_contact_sheet(self):
         self.contactSheetRequested.emit(self)
 
-    def kill(self):
+    def kill(self, reason=None):
         if self.finished is True:
             return
-        self.finished = True
         self.process.kill()
+        write_progress_event(
+            self.cacheversion.directory, KILLED,
+            reason=reason or "killed from the monitor")
+        self.interrupt()
+
+    def interrupt(self):
+        """ stop the panel update, set the range cached and compile the
+        partial playblast of a job terminated before the end """
+        self.finished = True
+        self.kill_button.setEnabled(False)
         self.images.kill()
+        self.update_progress()
+        # the infos can be edited by the process since the panel creation
+        self.cacheversion.update()
+        frame, _ = get_last_checkpoint(self.cacheversion.directory)
+        self.resume_button.setEnabled(frame is not None)
         images = list_tmp_jpeg_under_cacheversion(self.cacheversion)
         # if the cache is not started yet, no images are already recorded
         # otherwise, this compil the partial playblast and set the good range
@@ -250,21 +383,103 @@ class JobPanel(QtWidgets.QWidget):
             # edit the range at the current frame stop
             self.cacheversion.set_range(end_frame=start_frame)
             return
-        # edit the range at the current frame stop
-        self.cacheversion.set_range(end_frame=start_frame + len(images))
-        source = compile_movie(images)
-        for image in images:
-            os.remove(image)
+        # edit the range at the current frame stop. After a resume, the
+        # images recorded before the checkpoint are already compiled.
+        count = max(len(images), len(self.imagepath))
+        self.cacheversion.set_range(end_frame=start_frame + count)
         directory = self.cacheversion.directory
-        destination = os.path.join(directory, os.path.basename(source))
-        os.rename(source, destination)
-        self.cacheversion.add_playblast(destination)
+        movie = get_streamed_movie_filename(directory)
+        if os.path.exists(movie):
+            # the movie streamed during the record is valid until the last
+            # frame rendered.
+            move_playblast_to_cacheversion(movie, self.cacheversion)
+            remove_images(images)
+            return
+        # the compilation is done by the encoding service to not freeze the
+        # interface. The monitor calls the callbacks.
+        callback = partial(self.movie_compiled, images)
+        submit_movie_compilation(images, callback)
+
+    def movie_compiled(self, images, job):
+        if job.error is None:
+            directory = self.cacheversion.directory
+            destination = os.path.join(directory, os.path.basename(job.result))
+            os.rename(job.result, destination)
+            self.cacheversion.add_playblast(destination)
+        remove_images(images)
+
+
+class ResourceGraph(QtWidgets.QWidget):
+    """ This widget plot the memory used by the job every frame and display
+    the last resources sampled (see the telemetry module). """
+
+    def __init__(self, parent=None):
+        super(ResourceGraph, self).__init__(parent)
+        self.setFixedHeight(60)
+        self.series = []
+        self.summary = None
+
+    def set_events(self, events):
+        self.series = extract_resource_series(events, 'rss')
+        self.summary = summarize_resources(events)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter()
+        painter.begin(self)
+        try:
+            drawresourcegraph(painter, self)
+        except Exception:
+            import traceback
+            print(traceback.format_exc())
+        finally:
+            painter.end()
+
+
+def drawresourcegraph(painter, graph):
+    rect = graph.rect()
+    painter.setPen(QtCore.Qt.NoPen)
+    painter.setBrush(QtGui.QColor(35, 35, 35))
+    painter.drawRect(rect)
+    if not graph.series:
+        return
+    frames = [frame for frame, _ in graph.series]
+    values = [value for _, value in graph.series]
+    first, span = frames[0], max(frames[-1] - frames[0], 1)
+    maximum = max(values) or 1
+    points = [
+        QtCore.QPointF(
+            rect.left() + (frame - first) * rect.width() / span,
+            rect.bottom() - value * (rect.height() - 15) / maximum)
+        for frame, value in graph.series]
+    painter.setPen(QtGui.QPen(QtGui.QColor(100, 200, 120)))
+    painter.drawPolyline(QtGui.QPolygonF(points))
+    painter.setPen(QtGui.QPen(QtGui.QColor(200, 200, 200)))
+    flags = QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop
+    text = format_resources(graph.summary)
+    painter.drawText(rect.adjusted(4, 2, 0, 0), flags, text)
+
+
+def format_resources(summary):
+    if not summary:
+        return ''
+    texts = ['{:.0f} MB (peak {:.0f} MB)'.format(
+        summary['rss'], summary['peak_rss'])]
+    if summary['cpu'] is not None:
+        texts.append('cpu {:.0f}s'.format(summary['cpu']))
+    if summary['write_bytes'] is not None:
+        texts.append('written {:.0f} MB'.format(
+            summary['write_bytes'] / 1048576.0))
+    if summary['files'] is not None:
+        texts.append('{} files'.format(summary['files']))
+    return ' | '.join(texts)
 
 
 class InteractiveLog(QtWidgets.QWidget):
     def __init__(self, parent=None, filepath=''):
         super(InteractiveLog, self).__init__(parent)
         self.logsize = None
+        self.offset = 0
         self.document = QtGui.QTextDocument()
         self.text = QtWidgets.QTextEdit()
         self.text.setReadOnly(True)
@@ -286,13 +501,29 @@ class InteractiveLog(QtWidgets.QWidget):
         return True
 
     def update(self):
-        with open(self.filepath, "r") as f:
+        # only the text written since the last update is read and appended
+        # to the document.
+        if os.path.getsize(self.filepath) < self.offset:
+            self.offset = 0
+            self.document.clear()
+        with open(self.filepath, "rb") as f:
+            f.seek(self.offset)
             content = f.read()
-            self.document.setPlainText(content)
+        self.offset += len(content)
+        cursor = QtGui.QTextCursor(self.document)
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(content.decode('utf-8', 'replace'))
         scrollbar = self.text.verticalScrollBar()
         scrollbar.setSliderPosition(scrollbar.maximum())
         return True
 
+    def add_message(self, message):
+        # the message is written in the log file to be kept with the job
+        # logs. The prefix distinguish it from the batch process logs.
+        with open(self.filepath, "a") as f:
+            f.write(MONITOR_MESSAGE_PREFIX + message + "\n")
+        self.update()
+
 
 class CacheVersionSelection(QtWidgets.QDialog):
     def __init__(self, names, multiselection=False, parent=None):
@@ -348,3 +579,8 @@ def wooden_legged_centipede(leg_number):
             leg = 0
         yield leg == leg_number
         leg += 1
+
+
+def remove_images(images):
+    for image in images:
+        os.remove(image)
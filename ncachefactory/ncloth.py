@@ -31,6 +31,6 @@ def clean_inputmesh_connection(clothnode_name, inattr):
 
 def is_output_too_streched(clothnode_name, tolerance_factor):
     return is_deformed_mesh_too_stretched(
-        find_input_mesh_dagpath(clothnode_name).name(),
         find_output_mesh_dagpath(clothnode_name).name(),
-        tolerence_factor=tolerance_factor)
\ No newline at end of file
+        find_input_mesh_dagpath(clothnode_name).name(),
+        tolerence_factor=tolerance_factor)
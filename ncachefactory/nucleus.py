@@ -0,0 +1,94 @@
+"""
+This module contains utils to explore the nucleus networks. It's used to
+isolate the part of a scene needed by a dynamic simulation and to split the
+dynamic nodes in groups which can be simulated independently.
+"""
+
+from maya import cmds
+from ncachefactory.arrayutils import group_by_shared_items
+
+
+OUTPUT_SHAPE_TYPES = 'mesh', 'nurbsCurve'
+DEPENDENCY_TYPES = 'nucleus', 'nCloth', 'hairSystem'
+
+
+def list_dynamic_network(nodes, cameras=None):
+    """ list all the nodes needed to simulate the given dynamic nodes: the
+    nucleus solvers, the colliders, the constraints, the fields, the input
+    meshes and their deformation history. The output shapes and the given
+    cameras are added to get a valid playblast.
+    """
+    network = set(cmds.ls(nodes, long=True))
+    history = cmds.listHistory(nodes, allConnections=True) or []
+    network.update(cmds.ls(history, long=True))
+    # the solvers are in the history, all the nodes they evaluate are part of
+    # the simulation (other cloths, colliders, constraints, fields).
+    for solver in cmds.ls(history, type='nucleus'):
+        solved = cmds.listConnections(solver, shapes=True) or []
+        solved_history = cmds.listHistory(solved, allConnections=True) or []
+        network.update(cmds.ls(solved + solved_history, long=True))
+    future = cmds.listHistory(nodes, future=True) or []
+    network.update(cmds.ls(future, type=OUTPUT_SHAPE_TYPES, long=True))
+    network.update(cmds.ls(cameras or [], long=True))
+    # the dag nodes has to be exported with their parents to keep the
+    # transformations.
+    dagnodes = cmds.ls(list(network), dag=True, long=True)
+    parents = cmds.listRelatives(dagnodes, allParents=True, fullPath=True)
+    network.update(parents or [])
+    return sorted(network)
+
+
+def export_dynamic_network(filename, nodes, cameras=None):
+    """ export the dynamic network of the given nodes as maya binary scene.
+    The selection is restored after the export.
+    """
+    selection = cmds.ls(selection=True)
+    cmds.select(list_dynamic_network(nodes, cameras), replace=True, noExpand=True)
+    try:
+        cmds.file(
+            filename, exportSelected=True, type="mayaBinary", force=True,
+            constructionHistory=True, channels=True, constraints=True,
+            expressions=True, shader=True, preserveReferences=False)
+    finally:
+        cmds.select(selection, replace=True, noExpand=True)
+    return filename
+
+
+def list_simulation_dependencies(node):
+    """ list the solvers and the dynamic nodes which can affect the
+    simulation of the given dynamic node: his solvers and the dynamic nodes
+    upstream his input mesh or the colliders of his solvers (e.g. a collider
+    driven by a cloth output).
+    """
+    solvers = cmds.ls(cmds.listConnections(node) or [], type='nucleus')
+    inputs = [node]
+    for solver in solvers:
+        solved = cmds.listConnections(solver, shapes=True) or []
+        inputs.extend(cmds.ls(solved, type='nRigid'))
+    history = cmds.listHistory(inputs) or []
+    dependencies = set(solvers)
+    dependencies.update(cmds.ls(history, type=DEPENDENCY_TYPES))
+    dependencies.discard(node)
+    return sorted(dependencies)
+
+
+def group_independent_nodes(nodes):
+    """ split the given dynamic nodes in groups which don't share a solver
+    or a collider. Each group can be cached in a separated process. """
+    dependencies = {node: list_simulation_dependencies(node) for node in nodes}
+    return group_by_shared_items(dependencies)
+
+
+def disable_other_solvers(nodes):
+    """ disable the solvers which doesn't simulate the given nodes. That
+    avoid a process to compute the simulations cached by the other ones. """
+    solvers = set()
+    for node in nodes:
+        dependencies = list_simulation_dependencies(node)
+        solvers.update(cmds.ls(dependencies, type='nucleus'))
+    disabled = []
+    for solver in cmds.ls(type='nucleus'):
+        if solver not in solvers:
+            cmds.setAttr(solver + '.enable', False)
+            disabled.append(solver)
+    return disabled
@@ -14,18 +14,39 @@ SAMPLES_EVALUATED_OPTIONVAR = 'ncachefactory_samples_evaluated'
 SAMPLES_SAVED_OPTIONVAR = 'ncachefactory_samples_saved'
 VERBOSE_OPTIONVAR = 'ncachefactory_verbose'
 RECORD_PLAYBLAST_OPTIONVAR = 'ncachefactory_record_playblast'
+DEFERRED_PLAYBLAST_OPTIONVAR = 'ncachefactory_deferred_playblast'
 PLAYBLAST_RESOLUTION_OPTIONVAR = 'ncachefactory_resolution_playblast'
 PLAYBLAST_VIEWPORT_OPTIONVAR = 'ncachefactory_playblast_viewport'
 PLAYBLAST_CAMERA_SELECTION_TYPE = 'ncachefactory_camera_selection_type'
+CAPTURE_TARGETS_OPTIONVAR = 'ncachefactory_capture_targets'
 EXPLOSION_DETECTION_OPTIONVAR = 'ncachefactory_explosion_detection'
 EXPLOSION_TOLERENCE_OPTIONVAR = 'ncachefactory_explosion_tolerence'
 TIMELIMIT_ENABLED_OPTIONVAR = 'ncachefactory_timelimit_enabled'
 TIMELIMIT_OPTIONVAR = 'ncachefactory_timelimit'
+ADAPTIVE_TIMELIMIT_ENABLED_OPTIONVAR = 'ncachefactory_adaptive_timelimit_enabled'
+ADAPTIVE_TIMELIMIT_FACTOR_OPTIONVAR = 'ncachefactory_adaptive_timelimit_factor'
+ADAPTIVE_TIMELIMIT_WARMUP_OPTIONVAR = 'ncachefactory_adaptive_timelimit_warmup'
+NOT_FINITE_DETECTION_OPTIONVAR = 'ncachefactory_not_finite_detection'
+VELOCITY_DETECTION_OPTIONVAR = 'ncachefactory_velocity_detection'
+VELOCITY_LIMIT_OPTIONVAR = 'ncachefactory_velocity_limit'
+BOUNDING_BOX_DETECTION_OPTIONVAR = 'ncachefactory_bounding_box_detection'
+BOUNDING_BOX_LIMIT_OPTIONVAR = 'ncachefactory_bounding_box_limit'
+SELF_PENETRATION_DETECTION_OPTIONVAR = 'ncachefactory_self_penetration_detection'
+SELF_PENETRATION_LIMIT_OPTIONVAR = 'ncachefactory_self_penetration_limit'
+DETECTORS_STRIDE_OPTIONVAR = 'ncachefactory_detectors_stride'
+DETECTORS_BUDGET_OPTIONVAR = 'ncachefactory_detectors_budget'
 FFMPEG_PATH_OPTIONVAR = 'ncachefactory_ffmpeg_path'
 MEDIAPLAYER_PATH_OPTIONVAR = 'ncachefactory_mediaplayer_path'
+ENCODING_PRESETS_OPTIONVAR = 'ncachefactory_encoding_presets'
 MAYAPY_PATH_OPTIONVAR = 'ncachefactory_mayapy_path'
 CACHEVERSION_SORTING_TYPE_OPTIONVAR = 'ncachefactory_cacherversion_sorting_type'
 WORKSPACES_RECENTLY_USED_OPTIONVAR = 'ncachefactory_recent_workspaces_used'
+BATCH_WORKERS_OPTIONVAR = 'ncachefactory_batch_workers'
+BATCH_FORK_WEDGING_OPTIONVAR = 'ncachefactory_batch_fork_wedging'
+BATCH_SLIM_SCENES_OPTIONVAR = 'ncachefactory_batch_slim_scenes'
+BATCH_CHECKPOINT_INTERVAL_OPTIONVAR = 'ncachefactory_batch_checkpoint_interval'
+BATCH_SPLIT_SOLVERS_OPTIONVAR = 'ncachefactory_batch_split_solvers'
+BATCH_MEMORY_LIMIT_OPTIONVAR = 'ncachefactory_batch_memory_limit'
 
 MULTICACHE_EXP_OPTIONVAR = 'ncachefactory_multicache_expanded'
 CACHEOPTIONS_EXP_OPTIONVAR = 'ncachefactory_cacheoptions_expanded'
@@ -38,20 +59,41 @@ OPTIONVARS = {
     CACHE_BEHAVIOR_OPTIONVAR: 0,
     VERBOSE_OPTIONVAR: 0,
     RECORD_PLAYBLAST_OPTIONVAR: 1,
+    DEFERRED_PLAYBLAST_OPTIONVAR: 0,
     SAMPLES_EVALUATED_OPTIONVAR: 1.0,
     SAMPLES_SAVED_OPTIONVAR: 1,
     PLAYBLAST_RESOLUTION_OPTIONVAR: '1024x640',
     PLAYBLAST_CAMERA_SELECTION_TYPE: 0,
+    CAPTURE_TARGETS_OPTIONVAR: '[]',
     PLAYBLAST_VIEWPORT_OPTIONVAR: '0 1 1 1 1 1 1 1 1 0 0 0 0 0 0 0 0 0 0 0 0 0',
     EXPLOSION_DETECTION_OPTIONVAR: 0,
     EXPLOSION_TOLERENCE_OPTIONVAR: 3,
     TIMELIMIT_ENABLED_OPTIONVAR: 0,
     TIMELIMIT_OPTIONVAR: 1,
+    ADAPTIVE_TIMELIMIT_ENABLED_OPTIONVAR: 0,
+    ADAPTIVE_TIMELIMIT_FACTOR_OPTIONVAR: 5.0,
+    ADAPTIVE_TIMELIMIT_WARMUP_OPTIONVAR: 5,
+    NOT_FINITE_DETECTION_OPTIONVAR: 0,
+    VELOCITY_DETECTION_OPTIONVAR: 0,
+    VELOCITY_LIMIT_OPTIONVAR: 50.0,
+    BOUNDING_BOX_DETECTION_OPTIONVAR: 0,
+    BOUNDING_BOX_LIMIT_OPTIONVAR: 10.0,
+    SELF_PENETRATION_DETECTION_OPTIONVAR: 0,
+    SELF_PENETRATION_LIMIT_OPTIONVAR: 5.0,
+    DETECTORS_STRIDE_OPTIONVAR: 1,
+    DETECTORS_BUDGET_OPTIONVAR: 50,
     FFMPEG_PATH_OPTIONVAR: '',
     MEDIAPLAYER_PATH_OPTIONVAR: '',
+    ENCODING_PRESETS_OPTIONVAR: '{}',
     MAYAPY_PATH_OPTIONVAR: '',
     CACHEVERSION_SORTING_TYPE_OPTIONVAR: 0,
     WORKSPACES_RECENTLY_USED_OPTIONVAR: '',
+    BATCH_WORKERS_OPTIONVAR: 0,
+    BATCH_FORK_WEDGING_OPTIONVAR: 0,
+    BATCH_SLIM_SCENES_OPTIONVAR: 0,
+    BATCH_CHECKPOINT_INTERVAL_OPTIONVAR: 0,
+    BATCH_SPLIT_SOLVERS_OPTIONVAR: 0,
+    BATCH_MEMORY_LIMIT_OPTIONVAR: 0,
     MULTICACHE_EXP_OPTIONVAR: 0,
     CACHEOPTIONS_EXP_OPTIONVAR: 0,
     COMPARISON_EXP_OPTIONVAR: 0,
@@ -1,15 +1,19 @@
 import os
-import re
 import shutil
 import logging
 import subprocess
 from functools import partial
 
 from maya import cmds
-import pymel.core as pm
 
 from ncachefactory.timecallbacks import (
-    add_to_time_callback, remove_from_time_callback)
+    add_to_time_callback, remove_from_time_callback,
+    get_timespent_since_last_frame_set)
+from ncachefactory.encoding import (
+    MovieEncoder, compile_image_sequence, get_encoding_service,
+    get_streamed_movie_filename, get_capture_filename, format_burnin,
+    encode_preset)
+from ncachefactory.comparison import render_comparison
 from ncachefactory.optionvars import (
     FFMPEG_PATH_OPTIONVAR, PLAYBLAST_VIEWPORT_OPTIONVAR,
     ensure_optionvars_exists)
@@ -18,15 +22,37 @@ from ncachefactory.optionvars import (
 OUTPUT_RENDER_FILENAME = 'ncache_playblast'
 RENDER_GLOBALS_FILTERVALUES = "hardwareRenderingGlobals.objectTypeFilterValueArray"
 RENDER_GLOBALS_FILTERNAMES = "hardwareRenderingGlobals.objectTypeFilterNameArray"
+# attributes of the defaultRenderGlobals edited by the playblast and restored
+# at the end of the record.
+RENDER_GLOBALS_ATTRIBUTES = (
+    'extensionPadding', 'currentRenderer', 'imageFormat', 'imageFilePrefix',
+    'animation', 'putFrameBeforeExt', 'outFormatControl', 'startFrame',
+    'endFrame')
 
 _backuped_render_settings = {}
 _registered_callback_function = None
 _blasted_images = []
+_encoder = None
+_encodings = None
+# camera and resolution of every movie recorded, the main one first. The
+# additional captures are streamed by the _capture_encoders.
+_captures = []
+_capture_encoders = []
 
 
 def start_playblast_record(
         directory, camera='perspShape', width=1024, height=748,
-        viewport_display_values=None):
+        viewport_display_values=None, burnin=None, encodings=None,
+        targets=None):
+    """ the burnin is a dict describing the cacheversion drawn on the frames
+    by the encoder (see encoding.format_burnin). The encodings is a dict
+    {preset name: ffmpeg arguments} used by encode_playblast_presets once
+    the playblast is moved in the cacheversion. The targets is a list of
+    additional captures rendered every frame, each one streamed to his own
+    movie: [{'camera': 'closeupShape', 'width': 640, 'height': 360}] """
+    global _encodings, _captures
+    _encodings = encodings
+    _captures = [{'camera': camera, 'width': width, 'height': height}]
     for cam in cmds.ls(type="camera"):
         cmds.setAttr(cam + '.renderable', cam == camera)
     # the current global render settings are backup to be reset at the end of
@@ -38,32 +64,94 @@ def start_playblast_record(
     set_render_settings_for_playblast(viewport_display_values)
     # change the maya settings for the playblast
     # set the camera background to grey, that black by default
-    attribute = "{}.backgroundColor".format(camera)
-    cmds.setAttr(attribute, 0.375, 0.375, 0.375, type="double3")
+    cameras = [camera] + [target['camera'] for target in targets or []]
+    for cam in set(cameras):
+        attribute = "{}.backgroundColor".format(cam)
+        cmds.setAttr(attribute, 0.375, 0.375, 0.375, type="double3")
     cmds.workspace(fileRule=['images', directory])
+    # the images are sent to ffmpeg as they are rendered, the movie is
+    # written during the record. The encoders are started with the first
+    # frame shot, its number is drawn by the encoders from there.
+    global _encoder
+    _encoder = create_movie_encoder(
+        output=get_streamed_movie_filename(directory), burnin=bool(burnin))
+    for target in targets or []:
+        output = get_capture_filename(
+            _encoder.output, target['camera'], target['width'],
+            target['height'])
+        encoder = create_movie_encoder(output=output, burnin=bool(burnin))
+        _capture_encoders.append(encoder)
+        _captures.append(dict(target))
 
     global _registered_callback_function
-    _registered_callback_function = partial(shoot_frame, camera, width, height)
+    _registered_callback_function = partial(
+        shoot_frame, camera, width, height, burnin)
     add_to_time_callback(_registered_callback_function)
 
 
-def shoot_frame(camera, width, height):
+def start_movie_encoders(start_frame):
+    """ start the main encoder and an encoder per additional capture """
+    global _encoder, _capture_encoders, _captures
+    try:
+        _encoder.start(start_frame)
+    except OSError:
+        logging.warning(
+            "ffmpeg can't be started, the movie is compiled at the end")
+        if _capture_encoders:
+            logging.warning("the captures are skipped")
+        _encoder = None
+        _capture_encoders = []
+        _captures = _captures[:1]
+        return
+    for encoder in _capture_encoders:
+        encoder.start(start_frame)
+
+
+def shoot_frame(camera, width, height, burnin=None):
     frame = cmds.currentTime(query=True)
     cmds.setAttr("defaultRenderGlobals.startFrame", frame)
     cmds.setAttr("defaultRenderGlobals.endFrame", frame)
+    if _encoder is not None and _encoder.process is None:
+        start_movie_encoders(frame)
+    text = None
+    if _encoder is not None and burnin:
+        # the text is sent inside the image, it can't be drawn on another
+        # frame.
+        timespent = get_timespent_since_last_frame_set()
+        seconds = timespent.total_seconds() if timespent else None
+        text = format_burnin(burnin, seconds)
+    # all the captures are rendered in the same image file. The main one is
+    # rendered last to keep his image for the monitor.
+    for capture, encoder in zip(_captures[1:], _capture_encoders):
+        image = cmds.ogsRender(
+            camera=capture['camera'], width=capture['width'],
+            height=capture['height'])
+        encoder.add_image(image, text)
     image = cmds.ogsRender(width=width, height=height)
     global _blasted_images
     _blasted_images.append(image)
+    if _encoder is None:
+        return
+    _encoder.add_image(image, text)
 
 
 def stop_playblast_record(directory):
-    global _blasted_images
-    source = compile_movie(_blasted_images)
-    # for image in _blasted_images:
-    #     os.remove(image)
-    _blasted_images = []
-    destination = os.path.join(directory, os.path.basename(source))
-    os.rename(source, destination)
+    global _encoder
+    close_capture_encoders()
+    destination = None
+    if _encoder is not None:
+        if _encoder.close() == 0:
+            destination = _encoder.output
+        else:
+            logging.warning(
+                "the movie streamed is invalid, the images are compiled")
+        _encoder = None
+    if destination is None:
+        source = compile_movie(_blasted_images)
+        destination = os.path.join(directory, os.path.basename(source))
+        os.rename(source, destination)
+    # the images are only kept until the movie is finalized.
+    remove_blasted_images()
     global _registered_callback_function
     remove_from_time_callback(_registered_callback_function)
     _registered_callback_function = None
@@ -71,6 +159,67 @@ def stop_playblast_record(directory):
     return destination
 
 
+def remove_blasted_images():
+    global _blasted_images
+    for image in set(_blasted_images):
+        if os.path.exists(image):
+            os.remove(image)
+    _blasted_images = []
+
+
+def close_movie_encoder():
+    """ close the encoder of a record interrupted by an error. The movie
+    streamed is kept valid until the last frame rendered. """
+    global _encoder
+    close_capture_encoders()
+    if _encoder is not None:
+        _encoder.close()
+    _encoder = None
+
+
+def close_capture_encoders():
+    global _capture_encoders
+    for capture, encoder in zip(_captures[1:], _capture_encoders):
+        encoder.close()
+        capture['filename'] = encoder.output
+    _capture_encoders = []
+
+
+def register_playblast_captures(cacheversion, playblast):
+    """ add the camera and the resolution of the movies recorded to the
+    cacheversion infos. The additional captures are moved next to the
+    playblast """
+    global _captures
+    captures, _captures = _captures, []
+    for capture in captures:
+        source = capture.pop('filename', None)
+        if source is None:
+            capture['filename'] = playblast
+        else:
+            capture['filename'] = get_capture_filename(
+                playblast, capture['camera'], capture['width'],
+                capture['height'])
+            os.rename(source, capture['filename'])
+        cacheversion.add_capture(capture)
+
+
+def encode_playblast_presets(cacheversion, playblast):
+    """ encode the playblast recorded with the presets given at the record
+    start and add them to the cacheversion infos """
+    global _encodings
+    encodings, _encodings = _encodings, None
+    if not encodings:
+        return
+    ffmpeg = cmds.optionVar(query=FFMPEG_PATH_OPTIONVAR)
+    for preset, arguments in sorted(encodings.items()):
+        try:
+            encoding = encode_preset(ffmpeg, playblast, preset, arguments)
+        except (OSError, subprocess.CalledProcessError):
+            logging.warning("playblast encoding failed: " + preset)
+            continue
+        cacheversion.add_encoding(encoding)
+
+
 def backup_current_render_settings():
     # clean existing backup
     for key in _backuped_render_settings.keys():
@@ -78,19 +227,23 @@ def backup_current_render_settings():
 
     settings = {}
     settings['viewport_filters'] = list_render_filter_options()
-    node = pm.PyNode('defaultRenderGlobals')
-    settings['rendersettings'] = {a: a.get() for a in node.listAttr()}
+    settings['rendersettings'] = {}
+    for attribute in RENDER_GLOBALS_ATTRIBUTES:
+        plug = 'defaultRenderGlobals.' + attribute
+        value = cmds.getAttr(plug)
+        settings['rendersettings'][plug] = value, cmds.getAttr(plug, type=True)
     _backuped_render_settings.update(settings)
 
 
 def gather_backuped_render_settings():
     values = [s[1] for s in _backuped_render_settings['viewport_filters']]
     cmds.setAttr(RENDER_GLOBALS_FILTERVALUES, values, type="Int32Array")
-    for attribute, value in _backuped_render_settings['rendersettings'].items():
-        try:
-            attribute.set(value)
-        except:
-            pass
+    settings = _backuped_render_settings['rendersettings']
+    for plug, (value, type_) in settings.items():
+        if type_ == 'string':
+            cmds.setAttr(plug, value or '', type='string')
+        else:
+            cmds.setAttr(plug, value)
 
 
 def set_render_settings_for_playblast(viewport_display_values):
@@ -130,16 +283,32 @@ def compile_movie(images):
     the function
     """
     ffmpeg = cmds.optionVar(query=FFMPEG_PATH_OPTIONVAR)
-    output = images[0][:-11] + ".mp4"
-    # this line analyse the filename given and build a filename expression
-    # understood by FFMMPEG. %6d mean 6 digit frame number.
-    images_expression = re.sub(r".\d\d\d\d\d\d.jpg", ".%6d.jpg", (images[0]))
-    # on some ffmpeg versions, that need the start frame specified for images
-    # sequences. This line infer the first frame from the first filename
-    startframe = int(images[0].split('.')[-2])
-    arguments = [
-        ffmpeg, "-framerate", "24", "-start_number", str(startframe),
-        "-i", images_expression, "-codec", "copy", output]
-    process = subprocess.Popen(arguments)
-    process.wait()
-    return output
+    return compile_image_sequence(ffmpeg, images)
+
+
+def create_movie_encoder(output, burnin=False):
+    """ create a streaming encoder using the ffmpeg set in the options. The
+    encoder isn't started. """
+    ffmpeg = cmds.optionVar(query=FFMPEG_PATH_OPTIONVAR)
+    return MovieEncoder(ffmpeg, output, burnin=burnin)
+
+
+def submit_movie_compilation(images, callback=None):
+    """ this function queue the compilation in the encoding service and
+    return the encoding job. The callback receives the job done, the movie
+    filename is the job result. """
+    # maya commands can't be called from the encoding threads.
+    ffmpeg = cmds.optionVar(query=FFMPEG_PATH_OPTIONVAR)
+    function = partial(compile_image_sequence, ffmpeg, images)
+    return get_encoding_service().submit(function, callback)
+
+
+def submit_comparison_render(
+        playblast_lists, ranges, names, mode, output, callback=None):
+    """ this function queue the comparison movie render in the encoding
+    service (see the comparison module) """
+    ffmpeg = cmds.optionVar(query=FFMPEG_PATH_OPTIONVAR)
+    function = partial(
+        render_comparison, ffmpeg, playblast_lists, ranges, names, mode,
+        output)
+    return get_encoding_service().submit(function, callback)
@@ -1,3 +1,4 @@
+import json
 from functools import partial
 import ConfigParser
 from PySide2 import QtCore, QtWidgets, QtGui
@@ -7,10 +8,12 @@ from ncachefactory.qtutils import get_icon
 from ncachefactory.camera import (
     DEFAULT_CAMERA, find_existing_production_cameras, find_current_camera)
 from ncachefactory.playblast import list_render_filter_options
+from ncachefactory.encoding import summarize_encodings
 from ncachefactory.optionvars import (
-    RECORD_PLAYBLAST_OPTIONVAR, PLAYBLAST_RESOLUTION_OPTIONVAR,
-    PLAYBLAST_VIEWPORT_OPTIONVAR, CONFIGFILE_PATH,
-    PLAYBLAST_CAMERA_SELECTION_TYPE)
+    RECORD_PLAYBLAST_OPTIONVAR, DEFERRED_PLAYBLAST_OPTIONVAR,
+    PLAYBLAST_RESOLUTION_OPTIONVAR, PLAYBLAST_VIEWPORT_OPTIONVAR,
+    CONFIGFILE_PATH, PLAYBLAST_CAMERA_SELECTION_TYPE,
+    ENCODING_PRESETS_OPTIONVAR, CAPTURE_TARGETS_OPTIONVAR)
 
 
 RESOLUTION_PRESETS = {
@@ -48,39 +51,91 @@ cfg.read(CONFIGFILE_PATH)
 for parameter, value in cfg.items('custom_resolutions'):
     key = parameter.replace("_", " ")
     RESOLUTION_PRESETS[key] = map(int, value.split('x'))
+# encoding presets {name: ffmpeg arguments} (see the encoding module)
+ENCODING_PRESETS = {}
+if cfg.has_section('encoding_presets'):
+    ENCODING_PRESETS.update(cfg.items('encoding_presets'))
+DEFERRED_PLAYBLAST_TOOLTIP = """\
+The in scene cache records the simulation only. The playblast is rendered
+from the cache by a background mayapy once the simulation is done."""
+ENCODING_PRESET_TOOLTIP = """\
+{arguments}
+average on {count} playblast(s) of the workspace:
+{size:.1f} MB encoded in {seconds:.1f} seconds"""
+CAPTURE_TARGET_LABEL = '{camera} {width}x{height}'
 
 
 class PlayblastOptions(QtWidgets.QWidget):
     def __init__(self, parent=None):
         super(PlayblastOptions, self).__init__(parent=parent)
-        self.setFixedHeight(250)
+        self.setFixedHeight(400)
+        self.workspace = None
         self._record_playblast = QtWidgets.QCheckBox('Record playblast')
+        text = 'Render after the simulation'
+        self._deferred_playblast = QtWidgets.QCheckBox(text)
+        self._deferred_playblast.setToolTip(DEFERRED_PLAYBLAST_TOOLTIP)
         self._camera_selector = CameraSelector()
         self._resolution = ResolutionSelecter()
+        self._encoding_presets = EncodingPresets()
+        self._capture_targets = CaptureTargets()
         self._viewport_options = DisplayOptions()
         self._viewport_optios_scroll_area = QtWidgets.QScrollArea()
         self._viewport_optios_scroll_area.setWidget(self._viewport_options)
         self.layout = QtWidgets.QFormLayout(self)
         self.layout.setSpacing(0)
         self.layout.addRow('', self._record_playblast)
+        self.layout.addRow('', self._deferred_playblast)
         self.layout.addItem(QtWidgets.QSpacerItem(10, 10))
         self.layout.addRow('Camera:', self._camera_selector)
         self.layout.addItem(QtWidgets.QSpacerItem(10, 10))
         self.layout.addRow('Resolution: ', self._resolution)
         self.layout.addItem(QtWidgets.QSpacerItem(10, 10))
+        self.layout.addRow('Encodings: ', self._encoding_presets)
+        self.layout.addItem(QtWidgets.QSpacerItem(10, 10))
+        self.layout.addRow('Also capture: ', self._capture_targets)
+        self.layout.addItem(QtWidgets.QSpacerItem(10, 10))
         text = 'Viewport options: '
         self.layout.addRow(text, self._viewport_optios_scroll_area)
 
         self.set_states()
         self._record_playblast.stateChanged.connect(self.save_states)
+        self._deferred_playblast.stateChanged.connect(self.save_states)
         self._resolution.width.textEdited.connect(self.save_states)
         self._resolution.height.textEdited.connect(self.save_states)
         self._camera_selector.buttonReleased.connect(self.save_states)
         self._viewport_options.optionModified.connect(self.save_states)
+        self._encoding_presets.presetsModified.connect(self.save_presets)
+        method = self._call_add_capture_target
+        self._capture_targets.addRequested.connect(method)
+        self._capture_targets.targetsModified.connect(self.save_states)
+
+    def _call_add_capture_target(self):
+        width, height = self._resolution.resolution
+        self._capture_targets.add_target(
+            self._camera_selector.camera, width, height)
+
+    def set_workspace(self, workspace, cacheversions):
+        """ the encoding presets are chosen per workspace, the statistics of
+        the presets used by the cacheversions are displayed as tooltips """
+        self.workspace = workspace
+        presets = json.loads(cmds.optionVar(query=ENCODING_PRESETS_OPTIONVAR))
+        self._encoding_presets.set_presets(presets.get(workspace, []))
+        self._encoding_presets.set_summary(
+            summarize_encodings([cv.infos for cv in cacheversions]))
+
+    def save_presets(self):
+        if self.workspace is None:
+            return
+        presets = json.loads(cmds.optionVar(query=ENCODING_PRESETS_OPTIONVAR))
+        presets[self.workspace] = self._encoding_presets.presets
+        value = json.dumps(presets)
+        cmds.optionVar(stringValue=[ENCODING_PRESETS_OPTIONVAR, value])
 
     def set_states(self):
         state = cmds.optionVar(query=RECORD_PLAYBLAST_OPTIONVAR)
         self._record_playblast.setChecked(state)
+        state = cmds.optionVar(query=DEFERRED_PLAYBLAST_OPTIONVAR)
+        self._deferred_playblast.setChecked(state)
 
         resolution = cmds.optionVar(query=PLAYBLAST_RESOLUTION_OPTIONVAR)
         width, height = map(int, resolution.split('x'))
@@ -89,9 +144,14 @@ class PlayblastOptions(QtWidgets.QWidget):
         value = cmds.optionVar(query=PLAYBLAST_CAMERA_SELECTION_TYPE)
         self._camera_selector.set_checked_id(value)
 
+        targets = json.loads(cmds.optionVar(query=CAPTURE_TARGETS_OPTIONVAR))
+        self._capture_targets.set_targets(targets)
+
     def save_states(self):
         state = self._record_playblast.isChecked()
         cmds.optionVar(intValue=[RECORD_PLAYBLAST_OPTIONVAR, state])
+        state = self._deferred_playblast.isChecked()
+        cmds.optionVar(intValue=[DEFERRED_PLAYBLAST_OPTIONVAR, state])
 
         resolution = "x".join(map(str, self._resolution.resolution))
         cmds.optionVar(stringValue=[PLAYBLAST_RESOLUTION_OPTIONVAR, resolution])
@@ -103,6 +163,9 @@ class PlayblastOptions(QtWidgets.QWidget):
         value = self._camera_selector.checked_id
         cmds.optionVar(intValue=[PLAYBLAST_CAMERA_SELECTION_TYPE, value])
 
+        value = json.dumps(self._capture_targets.targets)
+        cmds.optionVar(stringValue=[CAPTURE_TARGETS_OPTIONVAR, value])
+
     def select_ffmpeg_path(self):
         ffmpeg = QtWidgets.QFileDialog.getOpenFileName()
         if not ffmpeg:
@@ -116,12 +179,20 @@ class PlayblastOptions(QtWidgets.QWidget):
             'viewport_display_values': self._viewport_options.values,
             'width': self._resolution.resolution[0],
             'height': self._resolution.resolution[1],
-            'camera': self._camera_selector.camera}
+            'camera': self._camera_selector.camera,
+            'encodings': {
+                preset: ENCODING_PRESETS[preset]
+                for preset in self._encoding_presets.presets},
+            'targets': self._capture_targets.targets}
 
     @property
     def record_playblast(self):
         return self._record_playblast.isChecked()
 
+    @property
+    def deferred_playblast(self):
+        return self._deferred_playblast.isChecked()
+
 
 class CamerasCombo(QtWidgets.QComboBox):
     def __init__(self, parent=None):
@@ -214,6 +285,100 @@ class DisplayOptions(QtWidgets.QWidget):
         return [cb.isChecked() for cb in self.checkboxes]
 
 
+class EncodingPresets(QtWidgets.QWidget):
+    presetsModified = QtCore.Signal()
+
+    def __init__(self, parent=None):
+        super(EncodingPresets, self).__init__(parent=parent)
+        self.layout = QtWidgets.QHBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.checkboxes = []
+        for preset in sorted(ENCODING_PRESETS):
+            checkbox = QtWidgets.QCheckBox(preset)
+            checkbox.preset = preset
+            checkbox.setToolTip(ENCODING_PRESETS[preset])
+            checkbox.released.connect(self.presetsModified.emit)
+            self.checkboxes.append(checkbox)
+            self.layout.addWidget(checkbox)
+        self.layout.addStretch(1)
+
+    def set_presets(self, presets):
+        for checkbox in self.checkboxes:
+            checkbox.setChecked(checkbox.preset in presets)
+
+    def set_summary(self, summary):
+        for checkbox in self.checkboxes:
+            arguments = ENCODING_PRESETS[checkbox.preset]
+            total = summary.get(checkbox.preset)
+            if total is None:
+                checkbox.setToolTip(arguments)
+                continue
+            checkbox.setToolTip(ENCODING_PRESET_TOOLTIP.format(
+                arguments=arguments,
+                count=total['count'],
+                size=total['size'] / 1048576.0,
+                seconds=total['seconds']))
+
+    @property
+    def presets(self):
+        return [cb.preset for cb in self.checkboxes if cb.isChecked()]
+
+
+class CaptureTargets(QtWidgets.QWidget):
+    """ This widget list the additional cameras and resolutions captured
+    with the playblast. The add button request the camera and the resolution
+    currently set. """
+    addRequested = QtCore.Signal()
+    targetsModified = QtCore.Signal()
+
+    def __init__(self, parent=None):
+        super(CaptureTargets, self).__init__(parent=parent)
+        self.list = QtWidgets.QListWidget()
+        self.list.setFixedHeight(50)
+        self.add = QtWidgets.QPushButton('Add current')
+        self.add.released.connect(self.addRequested.emit)
+        self.remove = QtWidgets.QPushButton('Remove')
+        self.remove.released.connect(self._call_remove)
+        self.buttons_layout = QtWidgets.QHBoxLayout()
+        self.buttons_layout.setContentsMargins(0, 0, 0, 0)
+        self.buttons_layout.addWidget(self.add)
+        self.buttons_layout.addWidget(self.remove)
+
+        self.layout = QtWidgets.QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.layout.setSpacing(2)
+        self.layout.addWidget(self.list)
+        self.layout.addLayout(self.buttons_layout)
+
+    def _call_remove(self):
+        for item in self.list.selectedItems():
+            self.list.takeItem(self.list.row(item))
+        self.targetsModified.emit()
+
+    def add_target(self, camera, width, height):
+        target = {'camera': camera, 'width': width, 'height': height}
+        if target in self.targets:
+            return
+        self._add_item(target)
+        self.targetsModified.emit()
+
+    def set_targets(self, targets):
+        self.list.clear()
+        for target in targets:
+            self._add_item(target)
+
+    def _add_item(self, target):
+        item = QtWidgets.QListWidgetItem(CAPTURE_TARGET_LABEL.format(**target))
+        item.setData(QtCore.Qt.UserRole, target)
+        self.list.addItem(item)
+
+    @property
+    def targets(self):
+        return [
+            self.list.item(i).data(QtCore.Qt.UserRole)
+            for i in range(self.list.count())]
+
+
 class CameraSelector(QtWidgets.QWidget):
     buttonReleased = QtCore.Signal()
 
@@ -0,0 +1,140 @@
+"""
+This module contains the profile of the time callbacks.
+Between two frames cached, the time callback runs the registered functions
+(playblast, verbose, sanity checks ...). The profile separates the time spent
+by the solver (everything between two time callbacks: the evaluation and the
+cache writing) from the time spent by each function. Both the wall time and
+the cpu time are recorded.
+The profile is saved in the cacheversion directory as a binary sidecar: a
+flat array of doubles, one row per frame. The columns and a summary are stored
+in the infos:
+    'profile': {
+        'columns': [
+            'frame', 'solver', 'solver cpu', 'shoot_frame', 'shoot_frame cpu'],
+        'summary': {
+            'frames': 100,
+            'totals': {'solver': 80.2, 'solver cpu': 75.5, ...},
+            'overhead': 0.12}}
+"""
+
+import os
+import sys
+from array import array
+
+
+def get_monotonic_clock():
+    """ python 2 doesn't provide time.perf_counter and time.time can jump
+    with the system clock. On windows time.clock is a monotonic wall clock
+    but on unix it's the cpu time, so clock_gettime is called through ctypes.
+    """
+    if sys.platform == 'win32':
+        from time import clock
+        return clock
+    import ctypes
+    import ctypes.util
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    monotonic_id = 6 if sys.platform == 'darwin' else 1
+    try:
+        library = ctypes.CDLL(
+            ctypes.util.find_library('rt') or ctypes.util.find_library('c'),
+            use_errno=True)
+        clock_gettime = library.clock_gettime
+    except (OSError, AttributeError):
+        # the elapsed real time since a fixed point, with a lower resolution.
+        return lambda: os.times()[4]
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    def clock():
+        value = timespec()
+        if clock_gettime(monotonic_id, ctypes.byref(value)) != 0:
+            raise OSError(ctypes.get_errno(), 'clock_gettime failed')
+        return value.tv_sec + value.tv_nsec * 1e-9
+
+    return clock
+
+
+try:
+    from time import perf_counter as clock
+except ImportError:
+    clock = get_monotonic_clock()
+
+
+TIMINGS_FILENAME = 'timings.bin'
+FRAME = 'frame'
+SOLVER = 'solver'
+CPU_SUFFIX = ' cpu'
+
+
+class FrameProfile(object):
+    """ This object collect the timings of every frame cached. The callbacks
+    are described by a name. The ones sharing the same name are cumulated.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.frames = []
+
+    def add_frame(self, frame, solver, solver_cpu, callbacks):
+        """ callbacks is a list of tuple (name, wall time, cpu time) """
+        timings = {}
+        for name, wall, cpu in callbacks:
+            if name not in self.names:
+                self.names.append(name)
+            previous_wall, previous_cpu = timings.get(name, (0.0, 0.0))
+            timings[name] = previous_wall + wall, previous_cpu + cpu
+        self.frames.append((frame, solver, solver_cpu, timings))
+
+    @property
+    def columns(self):
+        columns = [FRAME, SOLVER, SOLVER + CPU_SUFFIX]
+        for name in self.names:
+            columns.extend((name, name + CPU_SUFFIX))
+        return columns
+
+    @property
+    def rows(self):
+        rows = []
+        for frame, solver, solver_cpu, timings in self.frames:
+            row = [frame, solver, solver_cpu]
+            for name in self.names:
+                row.extend(timings.get(name, (0.0, 0.0)))
+            rows.append(row)
+        return rows
+
+
+def summarize_profile(columns, rows):
+    """ this function return the total of every column and the overhead: the
+    ratio of the time spent in the callbacks. """
+    totals = {
+        column: sum(row[i] for row in rows)
+        for i, column in enumerate(columns) if column != FRAME}
+    callbacks = sum(
+        total for column, total in totals.items()
+        if column != SOLVER and not column.endswith(CPU_SUFFIX))
+    total = totals.get(SOLVER, 0) + callbacks
+    return {
+        'frames': len(rows),
+        'totals': totals,
+        'overhead': callbacks / total if total else None}
+
+
+def save_timings(directory, rows):
+    data = array('d', [value for row in rows for value in row])
+    with open(os.path.join(directory, TIMINGS_FILENAME), 'wb') as f:
+        data.tofile(f)
+
+
+def load_timings(directory, columns):
+    """ this function return the rows stored in the timings sidecar. The
+    columns stored in the infos are needed to split the flat array. """
+    filename = os.path.join(directory, TIMINGS_FILENAME)
+    if not os.path.exists(filename) or not columns:
+        return []
+    data = array('d')
+    with open(filename, 'rb') as f:
+        data.fromfile(f, os.path.getsize(filename) // data.itemsize)
+    width = len(columns)
+    return [list(data[i:i + width]) for i in range(0, len(data), width)]
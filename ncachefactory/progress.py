@@ -0,0 +1,131 @@
+"""
+This module contains the progress stream written by the batch processes in
+the cacheversion directory.
+The stream is a json-lines file: one json dict per line and per event. It's
+only appended, the readers keep the byte offset of the last line read and
+parse the new lines only. Every event contains his type, the time and the
+pid of the writer (a cacheversion can be recorded by several processes):
+    {"event": "frame", "time": 1569.2, "pid": 2563, "frame": 12,
+     "seconds": 0.84, "memory": 1250.5}
+"""
+
+import os
+import json
+import time
+
+
+PROGRESS_FILENAME = 'progress.jsonl'
+SCENE_OPENED = 'scene opened'
+STARTED = 'started'
+RESUMED = 'resumed'
+FRAME = 'frame'
+CHECKPOINT = 'checkpoint'
+SCORES = 'scores'
+KILLED = 'killed'
+FAILED = 'failed'
+FINISHED = 'finished'
+LIFECYCLE_EVENTS = SCENE_OPENED, STARTED, RESUMED, KILLED, FAILED, FINISHED
+
+
+def get_progress_filename(directory):
+    return os.path.join(directory, PROGRESS_FILENAME)
+
+
+def write_progress_event(directory, event, **data):
+    data.update(event=event, time=time.time(), pid=os.getpid())
+    line = (json.dumps(data, sort_keys=True) + '\n').encode('utf-8')
+    # the line is written with one call on a file opened in append mode. The
+    # lines written by several processes in the same stream aren't mixed.
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    descriptor = os.open(get_progress_filename(directory), flags)
+    try:
+        os.write(descriptor, line)
+    finally:
+        os.close(descriptor)
+
+
+class ProgressReader(object):
+    """ This object read incrementally a progress stream. The read method
+    return the events written since the last call. A line not fully written
+    yet is left for the next read.
+    """
+
+    def __init__(self, directory):
+        self.filename = get_progress_filename(directory)
+        self.offset = 0
+        self.events = []
+        self.statuses = {}
+
+    def read(self):
+        if not os.path.exists(self.filename):
+            return []
+        size = os.path.getsize(self.filename)
+        if size < self.offset:
+            # the stream has been removed and written again.
+            self.reset()
+        if size == self.offset:
+            return []
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        data = data[:data.rfind(b'\n') + 1]
+        self.offset += len(data)
+        events = [
+            json.loads(line.decode('utf-8'))
+            for line in data.splitlines() if line.strip()]
+        for event in events:
+            if event['event'] in LIFECYCLE_EVENTS:
+                self.statuses[event['pid']] = event
+        self.events.extend(events)
+        return events
+
+    def reset(self):
+        self.offset = 0
+        self.events = []
+        self.statuses = {}
+
+    def skip(self):
+        """ ignore the events already written in the stream """
+        self.reset()
+        if os.path.exists(self.filename):
+            self.offset = os.path.getsize(self.filename)
+
+    @property
+    def failure(self):
+        """ return the killed or failed event if one of the processes writing
+        the stream ended with it, None otherwise """
+        for pid in sorted(self.statuses):
+            event = self.statuses[pid]
+            if event['event'] in (KILLED, FAILED):
+                return event
+        return None
+
+
+def summarize_progress(events):
+    """ this function return a dict describing the progression of a job from
+    his progress events. The frame and the memory are None when no frame is
+    simulated yet. """
+    frames = [event for event in events if event['event'] == FRAME]
+    statuses = [e['event'] for e in events if e['event'] in LIFECYCLE_EVENTS]
+    seconds = [event['seconds'] for event in frames if event.get('seconds')]
+    memories = [event['memory'] for event in frames if event.get('memory')]
+    return {
+        'status': statuses[-1] if statuses else None,
+        'frame': frames[-1]['frame'] if frames else None,
+        'frames': len(frames),
+        'seconds': sum(seconds) / len(seconds) if seconds else None,
+        'memory': max(memories) if memories else None}
+
+
+def format_progress(summary, end_frame=None):
+    texts = [summary['status'] or 'pending']
+    if summary['frame'] is not None:
+        if end_frame is None:
+            texts.append("frame {}".format(summary['frame']))
+        else:
+            texts.append("frame {} / {}".format(summary['frame'], end_frame))
+    if summary['seconds'] is not None:
+        texts.append("{:.2f} s/frame".format(summary['seconds']))
+    if summary['memory'] is not None:
+        texts.append("{:.0f} MB".format(summary['memory']))
+    return ' | '.join(texts)
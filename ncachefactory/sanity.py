@@ -0,0 +1,203 @@
+"""
+This module contains the context of the simulation sanity checks run between
+every frame of a batch cache.
+The input and output meshes of the nCloth nodes and the start and output
+curves of the hairSystem nodes are resolved once at the job start and kept as
+MDagPath. The checks read the points directly from them,
+without any graph traversal during the simulation. A DG connection callback
+invalidates the context when a connection involving one of the resolved nodes
+changes. The meshes are resolved again at the next check.
+The outputs are read once per frame: the samples are kept until
+clear_samples is called and shared by the stretch checks and the detectors.
+"""
+
+import logging
+from maya import cmds
+import maya.api.OpenMaya as om2
+
+from ncachefactory.ncloth import (
+    find_input_mesh_dagpath, find_output_mesh_dagpath)
+from ncachefactory.mesh import (
+    create_dagpath_stretch_checker, get_dagpath_points, is_same_topology,
+    OBJECT_SPACE)
+from ncachefactory.hairsystem import (
+    find_curves_dagpaths, get_curves_points, get_curves_lengths)
+from ncachefactory.stretch import (
+    compute_stretch_ratios, summarize_stretch_ratios)
+from ncachefactory.detectors import NodeSample
+
+
+_context = None
+
+
+class SanityCheckContext(object):
+    """ This object keep the meshes handles and the stretch checkers of the
+    simulated nCloth nodes and the curves handles of the hairSystem nodes.
+    The nodes which can't be checked (no mesh or curve found or different
+    topologies) are listed in invalid_nodes.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = sorted(cmds.ls(nodes, type=('nCloth', 'hairSystem')))
+        self.invalid_nodes = []
+        self.meshes = {}
+        self.curves = {}
+        self.checkers = {}
+        self.rest_lengths = {}
+        self.samples = {}
+        self.watched = set()
+        self.valid = False
+        self.callback = None
+
+    def install(self):
+        function = self._connection_changed
+        self.callback = om2.MDGMessage.addConnectionCallback(function)
+
+    def uninstall(self):
+        if self.callback is None:
+            return
+        om2.MMessage.removeCallback(self.callback)
+        self.callback = None
+
+    def resolve(self):
+        self.invalid_nodes = []
+        self.meshes = {}
+        self.curves = {}
+        self.checkers = {}
+        self.rest_lengths = {}
+        self.samples = {}
+        self.watched = set()
+        for node in self.nodes:
+            if cmds.nodeType(node) == 'hairSystem':
+                self._resolve_hairsystem(node)
+                continue
+            try:
+                input_mesh = find_input_mesh_dagpath(node).getPath()
+                output_mesh = find_output_mesh_dagpath(node).getPath()
+            except ValueError:
+                self.invalid_nodes.append(node)
+                continue
+            if not is_same_topology(input_mesh, output_mesh):
+                self.invalid_nodes.append(node)
+                continue
+            self.meshes[node] = input_mesh, output_mesh
+            history = cmds.listHistory(node, future=True) or []
+            history = cmds.ls(history, long=True)
+            for name in [node, input_mesh.fullPathName()] + history:
+                self.watched.add(get_node_hash(name))
+        self.valid = True
+
+    def _resolve_hairsystem(self, node):
+        curves = find_curves_dagpaths(node)
+        if not curves:
+            self.invalid_nodes.append(node)
+            return
+        self.curves[node] = curves
+        history = cmds.listHistory(node, future=True) or []
+        history = cmds.ls(history, long=True)
+        start_curves = [curve.fullPathName() for curve, _ in curves]
+        for name in [node] + start_curves + history:
+            self.watched.add(get_node_hash(name))
+
+    def ensure_resolved(self):
+        if self.valid is False:
+            logging.info("sanity check context resolved")
+            self.resolve()
+
+    def _connection_changed(self, source, destination, *unused_args):
+        if self.valid is False:
+            return
+        for plug in (source, destination):
+            if om2.MObjectHandle(plug.node()).hashCode() in self.watched:
+                self.valid = False
+                return
+
+    def get_output_points(self, node, space=om2.MSpace.kWorld):
+        """ return the output mesh points or the output curves cvs as flat
+        list, None if the node can't be checked """
+        self.ensure_resolved()
+        if node in self.meshes:
+            return get_dagpath_points(self.meshes[node][1], space)
+        if node in self.curves:
+            outputs = [output for _, output in self.curves[node]]
+            return get_curves_points(outputs, space)
+        return None
+
+    def get_checker(self, node):
+        """ return the stretch checker of a nCloth node. The rest lengths are
+        the input mesh ones when the context is resolved. """
+        checker = self.checkers.get(node)
+        if checker is None:
+            checker = create_dagpath_stretch_checker(self.meshes[node][0])
+            self.checkers[node] = checker
+        return checker
+
+    def get_curves_ratios(self, node):
+        """ return the ratio between the output curves lengths and the start
+        curves lengths of a hairSystem node """
+        starts, outputs = zip(*self.curves[node])
+        rest_lengths = self.rest_lengths.get(node)
+        if rest_lengths is None:
+            rest_lengths = get_curves_lengths(starts)
+            self.rest_lengths[node] = rest_lengths
+        return compute_stretch_ratios(
+            get_curves_lengths(outputs), rest_lengths)
+
+    def clear_samples(self):
+        """ this must be called when the frame changes """
+        self.samples = {}
+
+    def get_sample(self, node):
+        """ return the current state of the node output used by the
+        detectors (see the detectors module), None if the node can't be
+        checked """
+        self.ensure_resolved()
+        if node not in self.samples:
+            self.samples[node] = self._read_sample(node)
+        return self.samples[node]
+
+    def _read_sample(self, node):
+        if node in self.meshes:
+            points = get_dagpath_points(self.meshes[node][1], OBJECT_SPACE)
+            checker = self.get_checker(node)
+            return NodeSample(node, points, checker.compute_ratios)
+        if node in self.curves:
+            points = self.get_output_points(node)
+            function = lambda _: self.get_curves_ratios(node)
+            return NodeSample(node, points, function, is_mesh=False)
+        return None
+
+    def get_samples(self):
+        samples = [self.get_sample(node) for node in self.nodes]
+        return [sample for sample in samples if sample is not None]
+
+    def compute_stretch_summary(self, node, tolerance=None):
+        """ return the stretch ratios distribution of the output mesh or
+        curves (see the stretch module). """
+        sample = self.get_sample(node)
+        if sample is None:
+            return None
+        return summarize_stretch_ratios(sample.ratios, tolerance)
+
+
+def get_node_hash(name):
+    node = om2.MSelectionList().add(name).getDependNode(0)
+    return om2.MObjectHandle(node).hashCode()
+
+
+def create_sanity_context(nodes):
+    """ create the sanity check context of a job and install his callback.
+    The context of the previous job is cleared. """
+    global _context
+    clear_sanity_context()
+    _context = SanityCheckContext(nodes)
+    _context.resolve()
+    _context.install()
+    return _context
+
+
+def clear_sanity_context():
+    global _context
+    if _context is not None:
+        _context.uninstall()
+    _context = None
@@ -0,0 +1,221 @@
+"""
+This module contains the dependency graph of the batch cache jobs. The jobs
+are started by the launch function given (a mayapy, a worker pool job ...).
+A job can depend on other jobs. It's launched when all of them are finished
+successfully and cancelled if one of them fails or is killed. The independent
+jobs run in parallel.
+The scheduler can receive an admission control: an object deciding if a job
+ready to run can be started now (see MemoryAdmission).
+The cacheversions used as input of a cache are recorded in the infos as
+lineage. The modification time of each input is stored at the moment it's
+used, a later change of the input makes the cacheversion outdated:
+    'lineage': [{
+        'directory': 'path to the input cacheversion',
+        'name': 'base garment',
+        'modification_time': 65252}]
+"""
+
+from ncachefactory.telemetry import summarize_resources, get_available_memory
+
+PENDING = 'pending'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class ScheduledJob(object):
+    """ This object is an handle on a job launched by a JobScheduler when
+    his dependencies are finished. The launch function has to return an
+    object providing the poll and kill methods (a process).
+    A batch process can end normally after an error in the simulation. If a
+    progress reader is given (see the progress module), the job is failed
+    when the stream report a failure, even if the process returned 0.
+    """
+
+    def __init__(self, key, launch_function, depends_on=None, progress=None):
+        self.key = key
+        self.launch_function = launch_function
+        self.depends_on = list(depends_on or [])
+        self.progress = progress
+        self.process = None
+        self.cancelled = False
+
+    @property
+    def state(self):
+        if self.cancelled:
+            return CANCELLED
+        if self.process is None:
+            return PENDING
+        returncode = self.process.poll()
+        if returncode is None:
+            return RUNNING
+        if returncode == 0 and self.progress is not None:
+            self.progress.read()
+            if self.progress.failure is not None:
+                return FAILED
+        return FINISHED if returncode == 0 else FAILED
+
+    @property
+    def resources(self):
+        """ return the last resources sampled by the job (see the telemetry
+        module), None if the job doesn't report them yet """
+        if self.progress is None or self.process is None:
+            return None
+        self.progress.read()
+        return summarize_resources(self.progress.events)
+
+    def start(self):
+        if self.progress is not None:
+            # the events of a previous cache in the same directory are ignored
+            self.progress.skip()
+        self.process = self.launch_function()
+
+    def poll(self):
+        if self.process is not None:
+            return self.process.poll()
+        return -9 if self.cancelled else None
+
+    def kill(self):
+        if self.process is None:
+            self.cancelled = True
+            return
+        self.process.kill()
+
+
+class JobScheduler(object):
+    """ This object launch the scheduled jobs as soon as their dependencies
+    are finished. The update method has to be called regularly, the monitor
+    does it. The dependencies which are not a job of the scheduler are
+    considered as already finished.
+    """
+
+    def __init__(self, admission=None):
+        self.jobs = []
+        self.admission = admission
+
+    def add_job(self, job):
+        jobs = self.jobs + [job]
+        check_dependencies({job.key: job.depends_on for job in jobs})
+        self.jobs = jobs
+
+    @property
+    def finished(self):
+        return all(job.state != PENDING for job in self.jobs)
+
+    def update(self):
+        jobs = {job.key: job for job in self.jobs}
+        for job in self.jobs:
+            if job.state != PENDING:
+                continue
+            states = [
+                jobs[key].state for key in job.depends_on if key in jobs]
+            if any(state in (FAILED, CANCELLED) for state in states):
+                job.kill()
+            elif all(state == FINISHED for state in states):
+                if self.admission and not self.admission.admit(self.jobs):
+                    # the job waits for the next update.
+                    continue
+                job.start()
+
+
+class MemoryAdmission(object):
+    """ This object allows a job to start only if the memory of the running
+    jobs plus the peak memory expected for the new one stay under the limit
+    (in megabytes). The expected peak is the highest reported by the jobs of
+    the scheduler, the given estimate until one of them reports it. The
+    memory available on the system is also respected when the platform
+    provides it. A job is always admitted when nothing runs.
+    """
+
+    def __init__(self, limit, estimate=0, available_memory_function=None):
+        self.limit = limit
+        self.estimate = estimate
+        function = available_memory_function or get_available_memory
+        self.available_memory_function = function
+
+    def admit(self, jobs):
+        running = [job for job in jobs if job.state == RUNNING]
+        if not running:
+            return True
+        summaries = {job: job.resources for job in jobs}
+        peaks = [s['peak_rss'] for s in summaries.values() if s]
+        expected = max(peaks + [self.estimate])
+        # the jobs just started don't report their memory yet.
+        used = sum(
+            summaries[job]['rss'] if summaries[job] else expected
+            for job in running)
+        if self.limit and used + expected > self.limit:
+            return False
+        available = self.available_memory_function()
+        return available is None or expected <= available
+
+
+def check_dependencies(dependencies):
+    """ this function receive a dict {key: [dependency, ...]} and raise a
+    ValueError if the dependencies contain a cycle. """
+    sort_by_dependencies(dependencies)
+
+
+def sort_by_dependencies(dependencies):
+    """ this function receive a dict {key: [dependency, ...]} and return the
+    keys sorted to have every key after his dependencies. The dependencies
+    which aren't keys are ignored. """
+    result = []
+    visiting = set()
+
+    def visit(key):
+        if key in result or key not in dependencies:
+            return
+        if key in visiting:
+            raise ValueError("cyclic dependency found on: {}".format(key))
+        visiting.add(key)
+        for dependency in dependencies[key]:
+            visit(dependency)
+        visiting.discard(key)
+        result.append(key)
+
+    for key in sorted(dependencies):
+        visit(key)
+    return result
+
+
+def build_lineage(inputs_infos):
+    """ this function return the lineage stored in the cacheversion infos.
+    It receive a dict {directory: infos} of the input cacheversions. """
+    return [{
+        'directory': directory,
+        'name': infos.get('name'),
+        'modification_time': infos.get('modification_time')}
+        for directory, infos in sorted(inputs_infos.items())]
+
+
+def find_outdated_inputs(lineage, infos_by_directory):
+    """ this function return the lineage inputs which are modified or
+    removed since they were used. """
+    outdated = []
+    for input_ in lineage or []:
+        infos = infos_by_directory.get(input_['directory'])
+        if infos is None:
+            outdated.append(input_)
+        elif infos.get('modification_time') != input_['modification_time']:
+            outdated.append(input_)
+    return outdated
+
+
+def find_outdated_directories(infos_by_directory):
+    """ this function return the directories of the outdated cacheversions
+    sorted to be recached in order. A cacheversion using an outdated one as
+    input is outdated too. """
+    dependencies = {
+        directory: [input_['directory'] for input_ in infos.get('lineage', [])]
+        for directory, infos in infos_by_directory.items()}
+    outdated = set()
+    for directory in sort_by_dependencies(dependencies):
+        infos = infos_by_directory[directory]
+        lineage = infos.get('lineage')
+        if find_outdated_inputs(lineage, infos_by_directory):
+            outdated.add(directory)
+        elif any(d in outdated for d in dependencies[directory]):
+            outdated.add(directory)
+    return [d for d in sort_by_dependencies(dependencies) if d in outdated]
@@ -1,9 +1,11 @@
 import os
+import logging
 from math import ceil, sqrt
-import tempfile
 from PySide2 import QtCore, QtWidgets, QtGui
 from ncachefactory.slider import Slider
-from ncachefactory.playblast import compile_movie
+from ncachefactory.comparison import COMPARISON_MODES
+from ncachefactory.playblast import (
+    create_movie_encoder, submit_comparison_render)
 
 
 POINT_RADIUS = 8
@@ -23,7 +25,7 @@ STATUS_COLORS = {
 STACKED_IMAGE_TEXTCOLOR = "#ffffff"
 COMPARATOR_TITLE = "Compare versions"
 CONTACTSHEET_TITLE = "Contact sheet"
-CONTACTSHEET_TEMPFILENAME = 'ncachemanager_contactsheet.{}.jpg'
+CONTACTSHEET_JPEG_QUALITY = 95
 
 
 class SequenceImageReader(QtWidgets.QWidget):
@@ -50,6 +52,18 @@ class SequenceImageReader(QtWidgets.QWidget):
         self.slider.maximum_settable_value = value
         self.slider.value = self.slider.maximum_settable_value
 
+    def truncate(self, count):
+        """ remove the pixmaps after the given count. That's used when a job
+        is resumed from a checkpoint. """
+        self._pixmaps = self._pixmaps[:count]
+        self.image.iskilled = False
+        self.image.isdone = False
+        self.slider.maximum_settable_value = count + self.slider.minimum
+        if self._pixmaps:
+            self.slider.value = self.slider.maximum_settable_value
+        else:
+            self.image.set_image(None)
+
     def _call_slider_value_changed(self, value):
         self.image.name = str(value)
         self.image.set_image(self._pixmaps[self.slider.position])
@@ -109,13 +123,18 @@ class ImageViewer(QtWidgets.QWidget):
 
 
 class SequenceStackedImagesReader(QtWidgets.QWidget):
-    def __init__(self, pixmaps1, pixmaps2, frames, names=None, parent=None):
+    def __init__(
+            self, pixmaps1, pixmaps2, frames, names=None, playblast_lists=None,
+            ranges=None, parent=None):
         super(SequenceStackedImagesReader, self).__init__(parent, QtCore.Qt.Tool)
         self.setWindowTitle(COMPARATOR_TITLE)
         self.isplaying = False
         self.pixmaps1 = pixmaps1
         self.pixmaps2 = pixmaps2
         self.names = [n for n in map(str, frames)]
+        self.versionnames = names
+        self.playblast_lists = playblast_lists
+        self.ranges = ranges
 
         self.timer = QtCore.QBasicTimer()
 
@@ -144,6 +163,19 @@ class SequenceStackedImagesReader(QtWidgets.QWidget):
 
         self.playstop = QtWidgets.QPushButton("Play")
         self.playstop.released.connect(self._call_playstop)
+        self.mode = QtWidgets.QComboBox()
+        self.mode.addItems(COMPARISON_MODES)
+        self.export = QtWidgets.QPushButton("Export movie")
+        self.export.released.connect(self._call_export)
+        # the movie is rendered from the playblasts compiled.
+        self.export.setEnabled(bool(
+            self.playblast_lists and all(self.playblast_lists)))
+
+        self.export_layout = QtWidgets.QHBoxLayout()
+        self.export_layout.setContentsMargins(0, 0, 0, 0)
+        self.export_layout.setSpacing(0)
+        self.export_layout.addWidget(self.mode)
+        self.export_layout.addWidget(self.export)
 
         self.layout = QtWidgets.QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
@@ -152,6 +184,7 @@ class SequenceStackedImagesReader(QtWidgets.QWidget):
         self.layout.addWidget(self.slider)
         self.layout.addWidget(self.blender)
         self.layout.addWidget(self.playstop)
+        self.layout.addLayout(self.export_layout)
 
     def timerEvent(self, event):
         if not (self.slider.start <= self.slider.value < self.slider.end):
@@ -181,6 +214,26 @@ class SequenceStackedImagesReader(QtWidgets.QWidget):
             self.isplaying = False
             self.timer.stop()
 
+    def _call_export(self):
+        destination = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'export comparison', '', "Mp4 (*.mp4);;All Files (*)")
+        if not destination[0]:
+            return
+        # the render is done by the encoding service, the interface isn't
+        # blocked.
+        submit_comparison_render(
+            playblast_lists=self.playblast_lists,
+            ranges=self.ranges,
+            names=self.versionnames,
+            mode=self.mode.currentText(),
+            output=destination[0],
+            callback=comparison_rendered)
+
+
+def comparison_rendered(job):
+    if job.error is not None:
+        logging.error("comparison movie render failed: {}".format(job.error))
+
 
 class StackedImagesViewer(QtWidgets.QWidget):
     def __init__(self, layernames=None, parent=None):
@@ -311,14 +364,16 @@ class ContactSheetImagesReader(QtWidgets.QWidget):
         self.playstop.released.connect(self._call_playstop)
         self.export = QtWidgets.QPushButton("Export")
         self.export.released.connect(self._call_export)
+        self.progress = QtWidgets.QProgressBar()
+        self.progress.setVisible(False)
+        self.exporter = None
 
         self.buttons_layout = QtWidgets.QHBoxLayout()
         self.buttons_layout.setContentsMargins(0, 0, 0, 0)
         self.buttons_layout.setSpacing(0)
         self.buttons_layout.addWidget(self.playstop)
         self.buttons_layout.addWidget(self.export)
-        # set the grid dlayout under a dummy widget to allow widget.grabWindow
-        # to export a video
+        self.buttons_layout.addWidget(self.progress)
         self.grid_widget = QtWidgets.QWidget()
         self.grid_layout = QtWidgets.QGridLayout(self.grid_widget)
         row = 0
@@ -361,27 +416,129 @@ class ContactSheetImagesReader(QtWidgets.QWidget):
 
     def closeEvent(self, event):
         self.timer.stop()
+        if self.exporter is not None:
+            self.exporter.cancel()
+            self.exporter.wait()
 
     def _call_export(self):
+        if self.exporter is not None:
+            self.exporter.cancel()
+            return
         destination = QtWidgets.QFileDialog.getSaveFileName(
             self, 'export contact sheet', '', "Mp4 (*.mp4);;All Files (*)")
         if not destination[0]:
             return
+        end = min(self.slider.end + 1, len(self.pixmap_lists[0]))
+        frames = range(self.slider.start, end)
+        # the pixmaps can't be used outside the interface thread, the
+        # exporter receives images.
+        image_lists = [
+            [pixmap.toImage() if pixmap else None for pixmap in pixmaps]
+            for pixmaps in self.pixmap_lists]
+        encoder = create_movie_encoder(destination[0])
+        try:
+            encoder.start()
+        except OSError:
+            message = "ffmpeg can't be started, check the path in the options"
+            QtWidgets.QMessageBox.warning(self, CONTACTSHEET_TITLE, message)
+            return
+        self.exporter = ContactSheetExporter(
+            image_lists, self.names, frames, encoder, parent=self)
+        self.exporter.progressed.connect(self.progress.setValue)
+        self.exporter.finished.connect(self._call_export_finished)
+        self.progress.setRange(0, len(frames))
+        self.progress.setValue(0)
+        self.progress.setVisible(True)
+        self.export.setText("Cancel")
+        self.exporter.start()
+
+    def _call_export_finished(self):
+        self.exporter = None
+        self.progress.setVisible(False)
+        self.export.setText("Export")
+
+
+class ContactSheetExporter(QtCore.QThread):
+    """ This thread composites the contact sheet frames offscreen and sends
+    them to the encoder given. The movie is removed if the export is
+    cancelled. """
+    progressed = QtCore.Signal(int)
+
+    def __init__(self, image_lists, names, frames, encoder, parent=None):
+        super(ContactSheetExporter, self).__init__(parent)
+        self.image_lists = image_lists
+        self.names = names
+        self.frames = frames
+        self.encoder = encoder
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        tile_size = get_contactsheet_tile_size(self.image_lists)
+        columns = int(ceil(sqrt(len(self.image_lists))))
+        try:
+            for i, frame in enumerate(self.frames):
+                if self.cancelled:
+                    break
+                images = [images[frame] for images in self.image_lists]
+                image = render_contactsheet(
+                    images, self.names, tile_size, columns)
+                self.encoder.add_frame(encode_jpeg(image))
+                self.progressed.emit(i + 1)
+        finally:
+            self.encoder.close()
+        if self.cancelled and os.path.exists(self.encoder.output):
+            os.remove(self.encoder.output)
 
-        images = []
-        folder = tempfile.gettempdir()
-        for i in range(self.slider.start, self.slider.end + 1):
-            self.slider.value = i
-            jpg = CONTACTSHEET_TEMPFILENAME.format(str(i).zfill(6))
-            output = os.path.join(folder, jpg)
-            pixmap = QtGui.QPixmap.grabWindow(self.grid_widget.winId())
-            pixmap.save(output, 'jpg', quality=100)
-            images.append(output)
-        source = compile_movie(images)
-        os.rename(source, destination[0])
 
+def get_contactsheet_tile_size(image_lists):
+    for images in image_lists:
         for image in images:
-            os.remove(image)
+            if image is not None:
+                return image.size()
+    return QtCore.QSize(640, 480)
+
+
+def render_contactsheet(images, names, tile_size, columns):
+    rows = int(ceil(len(images) / float(columns)))
+    width, height = tile_size.width(), tile_size.height()
+    contactsheet = QtGui.QImage(
+        width * columns, height * rows, QtGui.QImage.Format_RGB32)
+    contactsheet.fill(QtGui.QColor(NOIMAGE_COLORS["bordercolor"]))
+    painter = QtGui.QPainter()
+    painter.begin(contactsheet)
+    try:
+        for i, (image, name) in enumerate(zip(images, names)):
+            row, column = divmod(i, columns)
+            rect = QtCore.QRect(column * width, row * height, width, height)
+            if image is None:
+                draw_empty_image(painter, rect, name)
+                continue
+            painter.drawImage(rect, image)
+            draw_tile_name(painter, rect, name)
+    finally:
+        painter.end()
+    return contactsheet
+
+
+def encode_jpeg(image):
+    buffer_ = QtCore.QBuffer()
+    buffer_.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer_, 'JPG', CONTACTSHEET_JPEG_QUALITY)
+    return buffer_.data().data()
+
+
+def draw_tile_name(painter, rect, name):
+    font = QtGui.QFont()
+    font.setBold(True)
+    font.setItalic(False)
+    font.setPixelSize(15)
+    painter.setFont(font)
+    painter.setPen(QtGui.QPen(QtGui.QColor(STACKED_IMAGE_TEXTCOLOR)))
+    flags = QtCore.Qt.AlignCenter | QtCore.Qt.AlignBottom
+    painter.drawText(QtCore.QRectF(rect), flags, name)
 
 
 def draw_stacked_imagesview(painter, stacked_imagesview, alpha=1):
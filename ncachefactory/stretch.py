@@ -0,0 +1,102 @@
+"""
+This module contains the edges stretch computation used by the simulation
+sanity checks. The maya meshes are read by the mesh module, this one only
+receives their points and edges.
+The edges topology (the vertex indexes of every edge) and the rest lengths
+are extracted once per mesh. Every frame, the deformed points are read in bulk
+and all the edge lengths are computed together. Numpy is used if available,
+otherwise that fallback on a pure python implementation.
+The meshes points are flat lists [x, y, z, x, y, z ...] and the edges are
+flat lists of vertex indexes [start, end, start, end ...].
+"""
+
+from array import array
+from math import sqrt
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+PERCENTILES = 50, 95, 99
+
+
+def compute_edge_lengths(points, edges):
+    if numpy is not None:
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        edges = numpy.asarray(edges, dtype=int).reshape(-1, 2)
+        vectors = points[edges[:, 0]] - points[edges[:, 1]]
+        return numpy.sqrt((vectors * vectors).sum(axis=1))
+    lengths = array('d')
+    for i in range(0, len(edges), 2):
+        start, end = edges[i] * 3, edges[i + 1] * 3
+        lengths.append(sqrt(
+            (points[start] - points[end]) ** 2 +
+            (points[start + 1] - points[end + 1]) ** 2 +
+            (points[start + 2] - points[end + 2]) ** 2))
+    return lengths
+
+
+def compute_stretch_ratios(lengths, rest_lengths):
+    """ this function return the ratio between the edge lengths and their
+    rest lengths. The edges with a null rest length are ignored. """
+    if numpy is not None:
+        lengths = numpy.asarray(lengths)
+        rest_lengths = numpy.asarray(rest_lengths)
+        mask = rest_lengths > 0
+        return lengths[mask] / rest_lengths[mask]
+    return array('d', [
+        length / rest_length
+        for length, rest_length in zip(lengths, rest_lengths)
+        if rest_length > 0])
+
+
+def percentile(sorted_values, value):
+    """ return the nearest rank percentile of values already sorted """
+    index = int(round(value / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def summarize_stretch_ratios(ratios, tolerance=None):
+    """ this function return the distribution of the stretch ratios. If a
+    tolerance is given, the number of edges exceeding it is returned too.
+    e.i. {'edges': 1200, 'max': 1.8, 'mean': 1.01, 'p50': 1.0, 'p95': 1.2,
+    'p99': 1.4, 'over': 0} """
+    if not len(ratios):
+        return None
+    if numpy is not None:
+        ratios = numpy.sort(ratios)
+        over = int((ratios > tolerance).sum()) if tolerance else None
+        mean = float(ratios.mean())
+    else:
+        ratios = sorted(ratios)
+        over = len([r for r in ratios if r > tolerance]) if tolerance else None
+        mean = sum(ratios) / len(ratios)
+    summary = {
+        'edges': len(ratios),
+        'max': float(ratios[-1]),
+        'mean': mean,
+        'over': over}
+    for value in PERCENTILES:
+        summary['p{}'.format(value)] = float(percentile(ratios, value))
+    return summary
+
+
+class StretchChecker(object):
+    """ This object keep the topology and the rest lengths of a mesh to
+    compute quickly the stretch of his deformed points.
+    """
+
+    def __init__(self, edges, rest_points):
+        if numpy is not None:
+            self.edges = numpy.asarray(edges, dtype=int)
+        else:
+            self.edges = array('l', edges)
+        self.rest_lengths = compute_edge_lengths(rest_points, self.edges)
+
+    def compute_ratios(self, points):
+        lengths = compute_edge_lengths(points, self.edges)
+        return compute_stretch_ratios(lengths, self.rest_lengths)
+
+    def summarize(self, points, tolerance=None):
+        return summarize_stretch_ratios(self.compute_ratios(points), tolerance)
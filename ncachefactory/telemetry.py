@@ -0,0 +1,165 @@
+"""
+This module contains the resources telemetry of the batch processes.
+Every frame, the batch script samples the resources used by his process and
+writes them in the frame event of the progress stream (see the progress
+module):
+    {"event": "frame", ..., "rss": 1250.5, "cpu": 84.2,
+     "read_bytes": 1048576, "write_bytes": 2097152, "files": 42}
+The rss is in megabytes and the cpu time in seconds. The values are read in
+/proc/self on linux. The ones not available on the platform are None.
+When a batch process exits, his resource usage collected by os.wait4 is
+added to the cacheversion infos:
+    'rusage': [{
+        'pid': 2563, 'returncode': 0, 'user': 80.1, 'system': 2.5,
+        'maxrss': 2500.1, 'inblock': 120, 'oublock': 25000}]
+"""
+
+import os
+import sys
+try:
+    import resource
+except ImportError:
+    # not available on windows
+    resource = None
+
+
+PROC_DIRECTORY = '/proc/self'
+MEMINFO_FILENAME = '/proc/meminfo'
+RESOURCE_KEYS = 'rss', 'cpu', 'read_bytes', 'write_bytes', 'files'
+
+
+def get_resident_memory():
+    """ return the resident memory of the current process in megabytes """
+    try:
+        with open(os.path.join(PROC_DIRECTORY, 'statm'), 'r') as f:
+            pages = int(f.read().split()[1])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1048576.0
+
+
+def get_cpu_time():
+    """ return the user and system cpu time spent by the process """
+    times = os.times()
+    return times[0] + times[1]
+
+
+def get_peak_memory():
+    """ return the peak memory used by the current process in megabytes.
+    None if the platform doesn't provide it. """
+    if resource is None:
+        return None
+    return convert_maxrss(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def convert_maxrss(maxrss):
+    # the max rss is in bytes on mac and in kilobytes on linux.
+    divisor = 1048576.0 if sys.platform == 'darwin' else 1024.0
+    return maxrss / divisor
+
+
+def get_io_bytes():
+    """ return the bytes read and written on the storage by the current
+    process """
+    try:
+        with open(os.path.join(PROC_DIRECTORY, 'io'), 'r') as f:
+            lines = f.readlines()
+    except (IOError, OSError):
+        # the file can be restricted even on linux.
+        return None, None
+    values = {}
+    for line in lines:
+        key, _, value = line.partition(':')
+        values[key.strip()] = int(value)
+    return values.get('read_bytes'), values.get('write_bytes')
+
+
+def get_open_files_count():
+    try:
+        return len(os.listdir(os.path.join(PROC_DIRECTORY, 'fd')))
+    except OSError:
+        return None
+
+
+def sample_resources():
+    read_bytes, write_bytes = get_io_bytes()
+    return {
+        'rss': get_resident_memory(),
+        'cpu': get_cpu_time(),
+        'read_bytes': read_bytes,
+        'write_bytes': write_bytes,
+        'files': get_open_files_count()}
+
+
+def get_available_memory():
+    """ return the memory available on the system in megabytes. None if the
+    platform doesn't provide it. """
+    try:
+        with open(MEMINFO_FILENAME, 'r') as f:
+            lines = f.readlines()
+    except (IOError, OSError):
+        return None
+    for line in lines:
+        if line.startswith('MemAvailable:'):
+            return int(line.split()[1]) / 1024.0
+    return None
+
+
+def get_returncode(status):
+    """ convert a wait status in a subprocess like return code """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def build_rusage(pid, status, rusage):
+    return {
+        'pid': pid,
+        'returncode': get_returncode(status),
+        'user': rusage.ru_utime,
+        'system': rusage.ru_stime,
+        'maxrss': convert_maxrss(rusage.ru_maxrss),
+        'inblock': rusage.ru_inblock,
+        'oublock': rusage.ru_oublock}
+
+
+def wait_process(pid, options=0):
+    """ wait a child process with os.wait4 and return his resource usage.
+    None if the process isn't terminated (with os.WNOHANG option). """
+    pid, status, rusage = os.wait4(pid, options)
+    if pid == 0:
+        return None
+    return build_rusage(pid, status, rusage)
+
+
+def summarize_resources(events):
+    """ this function return the last resources sampled in the frame events.
+    When several processes write the stream, their values are cumulated
+    except the peak rss which is the highest of a single process. None if
+    no resource is sampled yet. """
+    lasts = {}
+    peak = None
+    for event in events:
+        if event.get('rss') is None:
+            continue
+        lasts[event['pid']] = event
+        peak = max(peak, event['rss']) if peak is not None else event['rss']
+    if not lasts:
+        return None
+    summary = {'peak_rss': peak}
+    for key in RESOURCE_KEYS:
+        values = [e[key] for e in lasts.values() if e.get(key) is not None]
+        summary[key] = sum(values) if values else None
+    return summary
+
+
+def extract_resource_series(events, key):
+    """ return a list of (frame, value) of a resource sampled in the frame
+    events sorted by frame. The values of several processes sampled at the
+    same frame are cumulated. """
+    values = {}
+    for event in events:
+        if event.get(key) is None or event.get('frame') is None:
+            continue
+        values.setdefault(event['frame'], {})[event['pid']] = event[key]
+    return [(frame, sum(values[frame].values())) for frame in sorted(values)]
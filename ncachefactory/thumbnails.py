@@ -0,0 +1,111 @@
+"""
+This module contains the thumbnails store of the cacheversions.
+Two images are extracted from the playblasts of every cacheversion by ffmpeg:
+    - a poster frame: the frame in the middle of the cache.
+    - a sprite sheet: a grid of small frames picked regularly in the cache.
+The images are stored in a folder of the workspace, named from the
+cacheversion folder:
+    workspace/thumbnails/version_000.poster.jpg
+    workspace/thumbnails/version_000.sprites.jpg
+They are generated again when a playblast is newer.
+"""
+
+import os
+import subprocess
+
+
+THUMBNAILS_FOLDERNAME = 'thumbnails'
+POSTER_FILENAME = '{}.poster.jpg'
+SPRITES_FILENAME = '{}.sprites.jpg'
+THUMBNAIL_WIDTH = 160
+SPRITE_COLUMNS = 4
+SPRITE_ROWS = 4
+
+
+def get_thumbnails_directory(directory):
+    workspace = os.path.dirname(os.path.normpath(directory))
+    return os.path.join(workspace, THUMBNAILS_FOLDERNAME)
+
+
+def get_thumbnail_filenames(directory):
+    """ return the poster and the sprite sheet filenames of the cacheversion
+    directory given """
+    name = os.path.basename(os.path.normpath(directory))
+    thumbnails_directory = get_thumbnails_directory(directory)
+    return (
+        os.path.join(thumbnails_directory, POSTER_FILENAME.format(name)),
+        os.path.join(thumbnails_directory, SPRITES_FILENAME.format(name)))
+
+
+def is_thumbnail_outdated(directory, playblasts):
+    playblasts = [p for p in playblasts if os.path.exists(p)]
+    if not playblasts:
+        return False
+    last_modification = max(os.path.getmtime(p) for p in playblasts)
+    for filename in get_thumbnail_filenames(directory):
+        if not os.path.exists(filename):
+            return True
+        if os.path.getmtime(filename) < last_modification:
+            return True
+    return False
+
+
+def get_frame_count(infos):
+    """ return the number of frames of the playblasts described by the infos.
+    The range of the nodes is the one really cached, the cache can be killed
+    before the end frame. """
+    ranges = [node['range'] for node in infos.get('nodes', {}).values()]
+    if not ranges:
+        return infos['end_frame'] - infos['start_frame'] + 1
+    return int(max(r[1] for r in ranges) - min(r[0] for r in ranges) + 1)
+
+
+def build_input_arguments(ffmpeg, playblasts):
+    arguments = [ffmpeg, '-y', '-loglevel', 'error']
+    for playblast in playblasts:
+        arguments.extend(['-i', playblast])
+    return arguments
+
+
+def build_concat_filter(playblasts):
+    # the playblasts of a resumed cache are concatenated.
+    if len(playblasts) < 2:
+        return ''
+    inputs = ''.join('[{}:v]'.format(i) for i in range(len(playblasts)))
+    return '{}concat=n={}:v=1:a=0,'.format(inputs, len(playblasts))
+
+
+def build_poster_arguments(ffmpeg, playblasts, output, frame):
+    graph = "{}select='gte(n\\,{})',scale={}:-2".format(
+        build_concat_filter(playblasts), frame, THUMBNAIL_WIDTH)
+    arguments = build_input_arguments(ffmpeg, playblasts)
+    arguments.extend(['-filter_complex', graph, '-frames:v', '1', output])
+    return arguments
+
+
+def build_sprites_arguments(ffmpeg, playblasts, output, frames):
+    step = max(1, frames // (SPRITE_COLUMNS * SPRITE_ROWS))
+    graph = "{}select='not(mod(n\\,{}))',scale={}:-2,tile={}x{}".format(
+        build_concat_filter(playblasts), step, THUMBNAIL_WIDTH,
+        SPRITE_COLUMNS, SPRITE_ROWS)
+    arguments = build_input_arguments(ffmpeg, playblasts)
+    arguments.extend(['-filter_complex', graph, '-frames:v', '1', output])
+    return arguments
+
+
+def generate_thumbnails(ffmpeg, directory, playblasts, frames):
+    """ extract the poster frame and the sprite sheet of a cacheversion and
+    return their filenames """
+    poster, sprites = get_thumbnail_filenames(directory)
+    thumbnails_directory = os.path.dirname(poster)
+    try:
+        os.makedirs(thumbnails_directory)
+    except OSError:
+        # the folder can be created by another thread in the meantime.
+        if not os.path.isdir(thumbnails_directory):
+            raise
+    subprocess.check_call(
+        build_poster_arguments(ffmpeg, playblasts, poster, frames // 2))
+    subprocess.check_call(
+        build_sprites_arguments(ffmpeg, playblasts, sprites, frames))
+    return poster, sprites
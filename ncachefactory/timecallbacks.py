@@ -6,14 +6,20 @@ caches. But this callback execute the functions contained by the _functions
 list.
 To add a function to the callback, use add_to_time_callback and to remove it,
 use function: remove_from_time_callback
+Every function call is profiled, the time spent by the solver between two
+frames is measured apart (see the profiling module).
 """
 
-from datetime import datetime
+from datetime import timedelta
 import logging
 import traceback
 from maya import cmds
 import maya.api.OpenMaya as om2
 
+from ncachefactory.profiling import (
+    FrameProfile, summarize_profile, save_timings, load_timings, clock)
+from ncachefactory.telemetry import get_cpu_time
+
 
 ROOT_MESSAGE = "frame {frame_number}, {body}"
 TIMESPENT_BODY = "is cached in {timespent}"
@@ -23,13 +29,17 @@ _time_callback_muted = False
 _time_callback = None
 _last_frame = None
 _last_time = None
+_last_cpu_time = None
+_solver_time = None
 _functions = []
+_profile = FrameProfile()
 
 
 def register_time_callback():
     global _time_callback
     if _time_callback is not None:
         unregister_time_callback()
+    reset_time_infos()
     _time_callback = om2.MEventMessage.addEventCallback(
         'timeChanged', time_callback)
 
@@ -50,20 +60,36 @@ def time_callback(*useless_callback_args):
     """
     if is_time_callback_muted():
         return
+    global _solver_time
+    # the solver time is measured before the functions call. It's the time
+    # spent since the end of the last callback.
+    solver_cpu_time = None
+    if _last_time is not None:
+        _solver_time = clock() - _last_time
+        solver_cpu_time = get_cpu_time() - _last_cpu_time
     mute_time_callback()
+    timings = []
     for callable_object in _functions:
+        name = get_callable_name(callable_object)
+        start_time, start_cpu_time = clock(), get_cpu_time()
         try:
             callable_object()
         except Exception:
-            name = get_callable_name(callable_object)
             message = "time callback {} failed".format(name)
             logging.error(message + '\n' + traceback.format_exc())
+        timings.append((
+            name, clock() - start_time, get_cpu_time() - start_cpu_time))
 
     unmute_time_callback()
+    if _solver_time is not None:
+        frame = cmds.currentTime(query=True)
+        _profile.add_frame(frame, _solver_time, solver_cpu_time, timings)
     update_time_infos()
 
 
 def get_callable_name(callable_object):
+    # the functools.partial objects doesn't have name.
+    callable_object = getattr(callable_object, 'func', callable_object)
     try:
         name = callable_object.__name__
     except AttributeError:
@@ -116,9 +142,22 @@ def update_time_infos():
     """
     if is_time_callback_muted():
         return
-    global _last_frame, _last_time
+    global _last_frame, _last_time, _last_cpu_time
     _last_frame = int(cmds.currentTime(query=True))
-    _last_time = datetime.now()
+    _last_time = clock()
+    _last_cpu_time = get_cpu_time()
+
+
+def reset_time_infos():
+    """ this function clear the time infos and the profile of the last
+    cache. Otherwise, the first frame of the next cache would include all the
+    time spent between the two caches. """
+    global _last_frame, _last_time, _last_cpu_time, _solver_time, _profile
+    _last_frame = None
+    _last_time = None
+    _last_cpu_time = None
+    _solver_time = None
+    _profile = FrameProfile()
 
 
 def time_verbose():
@@ -135,6 +174,26 @@ def time_verbose():
 
 
 def get_timespent_since_last_frame_set():
+    """ return the time spent by the solver to compute the current frame. The
+    time spent by the time callback functions is excluded. """
     if _last_time is None:
         return None
-    return datetime.now() - _last_time
+    if _solver_time is not None and is_time_callback_muted():
+        return timedelta(seconds=_solver_time)
+    return timedelta(seconds=clock() - _last_time)
+
+
+def get_frame_profile():
+    return _profile
+
+
+def save_frame_profile(cacheversion, append=False):
+    """ save the profile of the last cache as timings sidecar in the
+    cacheversion. With append, the profile is added to the existing one if
+    the columns match. """
+    columns, rows = _profile.columns, _profile.rows
+    previous = cacheversion.infos.get('profile')
+    if append and previous and previous['columns'] == columns:
+        rows = load_timings(cacheversion.directory, columns) + rows
+    save_timings(cacheversion.directory, rows)
+    cacheversion.set_profile(columns, summarize_profile(columns, rows))
@@ -0,0 +1,113 @@
+"""
+This module contains the adaptive time limit used to kill the stuck or
+exploding batch simulations.
+The limit is a multiple of the median time per frame. During the warm up
+(the first simulated frames), the median is unknown and the baseline learned
+from the previous cacheversions of the same scene is used instead.
+After every batch cache, a summary of the frames timings is stored in the
+cacheversion infos:
+    'frame_timings': {'frames': 100, 'median': 0.8, 'mean': 0.9, 'max': 2.1}
+"""
+
+
+DEFAULT_FACTOR = 5.0
+DEFAULT_WARMUP = 5
+DEFAULT_WINDOW = 24
+# below this value in seconds, a frame is never considered too slow. That
+# avoid to kill light simulations because of the time spent by the system.
+DEFAULT_MINIMUM = 1.0
+
+
+def median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def summarize_frame_timings(timings):
+    if not timings:
+        return None
+    return {
+        'frames': len(timings),
+        'median': median(timings),
+        'mean': sum(timings) / float(len(timings)),
+        'max': max(timings)}
+
+
+def get_cacheversion_frame_time(infos):
+    """
+    This function return the time per frame of a cacheversion. That use the
+    frame timings summary if it exists. Otherwise, that fallback on the
+    nodes timespent divided by their cached range.
+    """
+    summary = infos.get('frame_timings')
+    if summary:
+        return summary['median']
+    frame_times = []
+    for node_infos in infos.get('nodes', {}).values():
+        timespent = node_infos.get('timespent')
+        start_frame, end_frame = node_infos.get('range', (0, 0))
+        if not timespent or end_frame <= start_frame:
+            continue
+        frame_times.append(timespent / float(end_frame - start_frame))
+    return max(frame_times) if frame_times else None
+
+
+def compute_timelimit_baseline(infos_list, source_scene):
+    """
+    This function return the median time per frame of the cacheversions
+    infos simulated from the given scene. None if no version match.
+    """
+    frame_times = []
+    for infos in infos_list:
+        scene = infos.get('batch', {}).get('source_scene') or infos.get('scene')
+        if not source_scene or scene != source_scene:
+            continue
+        frame_time = get_cacheversion_frame_time(infos)
+        if frame_time is not None:
+            frame_times.append(frame_time)
+    return median(frame_times)
+
+
+class AdaptiveTimeLimit(object):
+    """ This object collect the frame timings of a simulation and detect the
+    frames exceeding the limit. A factor of 0 disable the limit, but the
+    timings are still collected.
+    """
+
+    def __init__(
+            self, factor=DEFAULT_FACTOR, warmup=DEFAULT_WARMUP, baseline=None,
+            window=DEFAULT_WINDOW, minimum=DEFAULT_MINIMUM):
+        self.factor = factor
+        self.warmup = warmup
+        self.baseline = baseline
+        self.window = window
+        self.minimum = minimum
+        self.timings = []
+
+    @property
+    def threshold(self):
+        if not self.factor:
+            return None
+        if len(self.timings) >= self.warmup:
+            reference = median(self.timings[-self.window:])
+        else:
+            reference = self.baseline
+        if reference is None:
+            return None
+        return max(self.minimum, reference * self.factor)
+
+    def add_frame_time(self, seconds):
+        """ register the time spent by a frame and return True if it exceeds
+        the limit computed with the previous frames """
+        threshold = self.threshold
+        self.timings.append(seconds)
+        return threshold is not None and seconds > threshold
+
+    @property
+    def summary(self):
+        return summarize_frame_timings(self.timings)
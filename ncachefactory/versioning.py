@@ -17,6 +17,44 @@ DEFAULT_INFOS = {
     'comment': 'comme ci comme ca',
     'playblasts': [],
     'scene': 'path to maya scene' or None,
+    'batch': {
+        'slim': False,
+        'flash_time': 12.5,
+        'scene_size': 1048576,
+        'scene_open_time': 30.2,
+        'source_scene': 'path to the artist maya scene',
+        'arguments': ['batch script arguments used to resume the cache'],
+        'groups': [['nCloth1', 'nCloth2'], ['hairSystem1']]},
+    'frame_timings': {'frames': 100, 'median': 0.8, 'mean': 0.9, 'max': 2.1},
+    'profile': {
+        'columns': ['frame', 'solver', 'solver cpu', ...],
+        'summary': {
+            'frames': 100, 'totals': {'solver': 80.2}, 'overhead': 0.1}},
+    'detection': {
+        'detector': 'velocity',
+        'node': 'nClothShape1',
+        'frame': 125,
+        'reason': 'vertex velocity 125.3 exceeds 50.0 units per frame'},
+    'rusage': [{
+        'pid': 2563, 'returncode': 0, 'user': 80.1, 'system': 2.5,
+        'maxrss': 2500.1, 'inblock': 120, 'oublock': 25000}],
+    'captures': [{
+        'filename': 'path to playblast_0000.closeupShape_640x360.mp4',
+        'camera': 'closeupShape',
+        'width': 640,
+        'height': 360}],
+    'encodings': [{
+        'preset': 'review',
+        'filename': 'path to playblast_0000.review.mp4',
+        'size': 2516582,
+        'seconds': 4.2}],
+    'lineage': [{
+        'directory': 'path to the input cacheversion',
+        'name': 'base garment',
+        'modification_time': 65252}],
+    'wedging': {
+        'design': {'method': 'grid', 'parameters': [], ...},
+        'overrides': {'nClothShape1.stretchResistance': 12.5}},
     'nodes': {
         'nodename_1': {
             'range': (100, 150)}},
@@ -27,9 +65,11 @@ DEFAULT_INFOS = {
 import os
 import json
 import glob
+import errno
 import shutil
 import time
 import xml.etree.ElementTree
+from contextlib import contextmanager
 
 
 INFOS_FILENAME = 'infos.json'
@@ -37,6 +77,11 @@ PLAYBLAST_FILENAME = 'playblast_{}.mp4'
 VERSION_FOLDERNAME = 'version_{}'
 WORKSPACE_FOLDERNAME = 'ncaches'
 LOG_FILENAME = 'infos.log'
+LOCK_FILENAME = 'infos.lock'
+# a lock older than this time in seconds is considered as left by a dead
+# process and is removed.
+LOCK_TIMEOUT = 10
+CHECKPOINT_FILENAME = 'checkpoint_{}.mb'
 
 
 class CacheVersion(object):
@@ -51,6 +96,16 @@ class CacheVersion(object):
     def save_infos(self):
         save_json(self.infos_path, self.infos)
 
+    @contextmanager
+    def locked_infos(self):
+        """ reload the infos, let them be edited and save them with a lock.
+        The same version can be recorded by several processes, that avoid
+        to lose the edits done by the others. """
+        with file_lock(os.path.join(self.directory, LOCK_FILENAME)):
+            self.update()
+            yield self.infos
+            self.save_infos()
+
     def get_files(self, extension_filter=None):
         return [
             os.path.join(self.directory, f) for f in os.listdir(self.directory)
@@ -61,41 +116,77 @@ class CacheVersion(object):
 
     def set_range(self, nodes=None, start_frame=None, end_frame=None):
         assert start_frame or end_frame
-        nodes = nodes or self.infos.get('nodes')
-        if not nodes:
-            self.save_infos()
-            return
-        for node in nodes:
-            # if only one value is modified, the other one is kept
-            start = start_frame or self.infos.get('nodes')[node]['range'][0]
-            end = end_frame or self.infos.get('nodes')[node]['range'][1]
-            _, node = split_namespace_nodename(node)
-            self.infos.get('nodes')[node]['range'] = start, end
-        self.save_infos()
-
-    def set_timespent(self, nodes=None, seconds=0):
-        nodes = nodes or self.infos.get('nodes')
-        if nodes:
+        with self.locked_infos():
+            nodes = nodes or self.infos.get('nodes')
+            if not nodes:
+                return
             for node in nodes:
+                # if only one value is modified, the other one is kept
+                range_ = self.infos.get('nodes')[node]['range']
+                start = start_frame or range_[0]
+                end = end_frame or range_[1]
                 _, node = split_namespace_nodename(node)
-                self.infos['nodes'][node]['timespent'] = seconds
-        self.save_infos()
+                self.infos.get('nodes')[node]['range'] = start, end
+
+    def set_timespent(self, nodes=None, seconds=0):
+        with self.locked_infos():
+            nodes = nodes or self.infos.get('nodes')
+            if nodes:
+                for node in nodes:
+                    _, node = split_namespace_nodename(node)
+                    self.infos['nodes'][node]['timespent'] = seconds
 
     def add_playblast(self, playblast_filename):
-        self.infos.get('playblasts').append(playblast_filename)
-        self.save_infos()
+        with self.locked_infos():
+            self.infos.get('playblasts').append(playblast_filename)
 
     def set_comment(self, comment):
-        self.infos['comment'] = comment
-        self.save_infos()
+        with self.locked_infos():
+            self.infos['comment'] = comment
 
     def set_name(self, name):
-        self.infos['name'] = name
-        self.save_infos()
+        with self.locked_infos():
+            self.infos['name'] = name
 
     def set_scene(self, path):
-        self.infos['scene'] = path
-        self.save_infos()
+        with self.locked_infos():
+            self.infos['scene'] = path
+
+    def set_batch_infos(self, **infos):
+        with self.locked_infos():
+            self.infos.setdefault('batch', {}).update(infos)
+
+    def set_wedging_infos(self, design, overrides):
+        with self.locked_infos():
+            self.infos['wedging'] = {'design': design, 'overrides': overrides}
+
+    def set_frame_timings(self, summary):
+        with self.locked_infos():
+            self.infos['frame_timings'] = summary
+
+    def set_lineage(self, lineage):
+        with self.locked_infos():
+            self.infos['lineage'] = lineage
+
+    def set_profile(self, columns, summary):
+        with self.locked_infos():
+            self.infos['profile'] = {'columns': columns, 'summary': summary}
+
+    def set_detection(self, detection):
+        with self.locked_infos():
+            self.infos['detection'] = detection
+
+    def add_capture(self, capture):
+        with self.locked_infos():
+            self.infos.setdefault('captures', []).append(capture)
+
+    def add_encoding(self, encoding):
+        with self.locked_infos():
+            self.infos.setdefault('encodings', []).append(encoding)
+
+    def add_rusage(self, rusage):
+        with self.locked_infos():
+            self.infos.setdefault('rusage', []).append(rusage)
 
     @property
     def name(self):
@@ -109,8 +200,8 @@ class CacheVersion(object):
         self.infos = load_json(self.infos_path)
 
     def update_modification_time(self):
-        self.infos['modification_time'] = time.time()
-        self.save_infos()
+        with self.locked_infos():
+            self.infos['modification_time'] = time.time()
 
     def __eq__(self, cacheversion):
         assert isinstance(cacheversion, CacheVersion)
@@ -132,8 +223,41 @@ def load_json(filename):
 
 
 def save_json(filename, data):
-    with open(filename, 'w') as f:
-        return json.dump(data, f, indent=2)
+    # the infos are read by other processes during the caches, the data are
+    # written in a temporary file and renamed to never expose a partially
+    # written file.
+    temporary = filename + '.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(data, f, indent=2)
+    if os.path.exists(filename) and os.name == 'nt':
+        os.remove(filename)
+    os.rename(temporary, filename)
+
+
+@contextmanager
+def file_lock(filename, timeout=LOCK_TIMEOUT):
+    """ this context acquire a lock shared between processes, the lock is
+    a file created exclusively. """
+    while True:
+        try:
+            flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY
+            descriptor = os.open(filename, flags)
+            break
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+        try:
+            if time.time() - os.path.getmtime(filename) > timeout:
+                os.remove(filename)
+        except OSError:
+            # the lock is released between the check and the remove.
+            pass
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(descriptor)
+        os.remove(filename)
 
 
 def list_available_cacheversion_directories(workspace):
@@ -282,6 +406,28 @@ def get_log_filename(cacheversion):
     return os.path.join(cacheversion.directory, LOG_FILENAME)
 
 
+def get_checkpoint_filename(directory, frame):
+    return os.path.join(directory, CHECKPOINT_FILENAME.format(int(frame)))
+
+
+def list_checkpoints(directory):
+    """ return the checkpoint scenes saved during a batch cache as a list
+    of tuple (frame, filename) sorted by frame """
+    checkpoints = []
+    pattern = os.path.join(directory, CHECKPOINT_FILENAME.format('*'))
+    prefix, suffix = CHECKPOINT_FILENAME.split('{}')
+    for filename in glob.glob(pattern):
+        frame = os.path.basename(filename)[len(prefix):-len(suffix)]
+        if frame.isdigit():
+            checkpoints.append((int(frame), filename))
+    return sorted(checkpoints)
+
+
+def get_last_checkpoint(directory):
+    checkpoints = list_checkpoints(directory)
+    return checkpoints[-1] if checkpoints else (None, None)
+
+
 def list_tmp_jpeg_under_cacheversion(cacheversion):
     jpegs = []
     directory = cacheversion.directory
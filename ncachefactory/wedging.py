@@ -0,0 +1,120 @@
+"""
+This module is the wedging design engine.
+A wedging parameter is a dict describing an attribute and the values
+explored: {'attribute': 'nClothShape1.stretchResistance', 'values': [1, 5]}.
+A design build a list of overrides from several parameters. An override is a
+dict {attribute: value} applied on the scene before a wedging cache.
+Designs available:
+    - grid: all the combinations of the parameters values.
+    - random: random points picked in the parameters min max.
+    - latin hypercube: the parameters min max are divided in as many strata
+    as jobs, every strata is used once per parameter. The points are better
+    distributed than random.
+"""
+
+import random
+from itertools import product
+
+
+GRID = 'grid'
+RANDOM = 'random'
+LATIN_HYPERCUBE = 'latin hypercube'
+DESIGN_METHODS = GRID, RANDOM, LATIN_HYPERCUBE
+DEFAULT_PRECISION = 3
+
+
+def compute_wedging_design(
+        parameters, method=GRID, budget=0, seed=None,
+        precision=DEFAULT_PRECISION):
+    """
+    This function create a list of overrides from the given parameters.
+    The budget is the maximum number of jobs (0 is no limit for the grid).
+    The random designs need a budget. Equivalent overrides (the same once
+    rounded to the given precision) are removed.
+    """
+    check_parameters(parameters)
+    if method == GRID:
+        overrides = grid_design(parameters)
+        overrides = deduplicate_overrides(overrides, precision)
+        if 0 < budget < len(overrides):
+            msg = "grid design contains {} jobs, that exceeds the budget: {}"
+            raise ValueError(msg.format(len(overrides), budget))
+        return overrides
+    if method not in DESIGN_METHODS:
+        raise ValueError("unknown design method: {}".format(method))
+    if budget < 1:
+        raise ValueError("{} design needs a budget".format(method))
+    generator = random.Random(seed)
+    function = random_design if method == RANDOM else latin_hypercube_design
+    overrides = function(parameters, budget, generator)
+    return deduplicate_overrides(overrides, precision)
+
+
+def check_parameters(parameters):
+    if not parameters:
+        raise ValueError("no wedging parameter defined")
+    attributes = [parameter['attribute'] for parameter in parameters]
+    if len(set(attributes)) != len(attributes):
+        raise ValueError("an attribute is defined twice: {}".format(attributes))
+    for parameter in parameters:
+        if not parameter['values']:
+            msg = "no values defined for {}".format(parameter['attribute'])
+            raise ValueError(msg)
+
+
+def grid_design(parameters):
+    attributes = [parameter['attribute'] for parameter in parameters]
+    values = [parameter['values'] for parameter in parameters]
+    return [dict(zip(attributes, point)) for point in product(*values)]
+
+
+def random_design(parameters, budget, generator):
+    return [
+        {p['attribute']: generator.uniform(min(p['values']), max(p['values']))
+         for p in parameters}
+        for _ in range(budget)]
+
+
+def latin_hypercube_design(parameters, budget, generator):
+    overrides = [{} for _ in range(budget)]
+    for parameter in parameters:
+        minimum, maximum = min(parameter['values']), max(parameter['values'])
+        strata_size = (maximum - minimum) / float(budget)
+        strata = list(range(budget))
+        generator.shuffle(strata)
+        for override, stratum in zip(overrides, strata):
+            value = minimum + (stratum + generator.random()) * strata_size
+            override[parameter['attribute']] = value
+    return overrides
+
+
+def deduplicate_overrides(overrides, precision=DEFAULT_PRECISION):
+    """
+    This function remove the overrides equivalent once their values are
+    rounded. The values kept aren't rounded and the order is kept.
+    """
+    result = []
+    known = set()
+    for override in overrides:
+        key = tuple(sorted(
+            (k, round(v, precision)) for k, v in override.items()))
+        if key in known:
+            continue
+        known.add(key)
+        result.append(override)
+    return result
+
+
+def build_design_infos(
+        parameters, method=GRID, budget=0, seed=None,
+        precision=DEFAULT_PRECISION):
+    """
+    This function return the design description stored in the cacheversion
+    infos.
+    """
+    return {
+        'method': method,
+        'parameters': parameters,
+        'budget': budget,
+        'seed': seed,
+        'precision': precision}
@@ -13,15 +13,73 @@ The script create a ncache in background, this is the arguments orders
     -playblast_camera
     -timelimit
     -stretchmax
+    -overrides
+
+The script can also be launched with the single argument "--worker". It starts
+a persistent mayapy which initialize maya once and wait for jobs on the
+standard input. A job is a json list of the arguments described above written
+on one line. The jobs are processed one after the other and the scene is reset
+between each of them. When a job is done, the worker writes a line prefixed
+by WORKER_MESSAGE_PREFIX on the standard output.
+
+On linux, the option --fork-wedges allows to process an attribute wedging
+with only one scene load. The scene is opened once, then the process is
+forked for every wedging value. The children share the scene loaded in memory
+(copy on write), apply their own value and cache in their own version
+directory. The pid of each child is written in his version directory.
+
+With the option --checkpoint-interval, the dynamic state is set as initial
+state and the scene is saved in the version directory every n frames. A killed
+or crashed job can be relaunched with the same arguments and the flag --resume
+to append the cache from the last checkpoint.
+
+A cache version can be recorded by several processes, one per group of nodes
+which can be simulated independently. The option --isolate disable the
+solvers which doesn't simulate the given nodes and --no-playblast let only one
+process record the playblast.
+
+The option --playblast-only doesn't simulate: the cache already recorded in
+the version directory is connected and the playblast is rendered from it.
+That's used to render the playblast of a cache recorded in the interactive
+session without playblast.
+
+The option --inputs receive a json list of cacheversion directories. They are
+plugged as input shapes before the cache and recorded as lineage in the infos.
+
+The option --detectors receive a json list of explosion detectors run between
+the frames (see the ncachefactory.detectors module). The detector which kills
+the simulation is recorded in the infos.
+
+The option --encodings receive a json dict of encoding presets. The playblast
+is encoded with every preset at the end of the record (see the
+ncachefactory.encoding module).
+
+The option --targets receive a json list of additional cameras and
+resolutions captured every frame. Each one is recorded in his own movie.
+
+The progression is written as json events in the progress stream of the
+version directory (see the ncachefactory.progress module): scene opened, cache
+started, every frame simulated, checkpoints, kill, failure and end. The frame
+events contain the resources used by the process: memory, cpu time, io bytes
+and open files (see the ncachefactory.telemetry module).
 """
 
 import os
+import sys
+import json
+import signal
+import time
 import logging
 import argparse
-from datetime import datetime
+import traceback
 from functools import partial
 
 
+WORKER_FLAG = '--worker'
+WORKER_MESSAGE_PREFIX = 'ncachefactory_worker:'
+FORKED_PID_FILENAME = 'process.pid'
+FORKED_KILL_FILENAME = 'process.killed'
+FORKED_STATUS_FILENAME = 'process.status'
 PLAYBLAST_DISPLAY_HELP = """\
 List of 0 and 1 for True and False in and string. e.i : "1 0 1 1 1 1 0 0 1 0"
 Thats a list of option to display in the playblast render.
@@ -33,8 +91,41 @@ Here's the positional value:
 PLAYBLAST_RES_HELP = 'resolution of rendered playblast. e.i. "1024 768"'
 TIMELIMIT_HELP = "time limit per frame evaluated in second (0 is no limit)"
 STRETCH_LIMIT_HELP = "Stretch max supported by output mesh (0 is no limit)"
-ATTRIBUTE_OVERRIDE_HELP = "Plug name which is overrided for simlulation"
-ATTRIBUTE_OVERRIDE_VALUE_HELP = "Attribute overrided value"
+OVERRIDES_HELP = """\
+Json dict of plugs overrided for simulation with their value.
+e.i. '{"nClothShape1.stretchResistance": 12.5}'"""
+FORK_WEDGES_HELP = """\
+Json list of [directory, overrides] pairs. The scene is opened once and the
+process is forked for each pair (linux only)"""
+FORK_JOBS_HELP = "Maximum forked simulations running together (0 is no limit)"
+CHECKPOINTS_HELP = """\
+Frames where the successive halving scores are recorded. e.i. "120 140 180"
+"""
+REFERENCE_HELP = "Cacheversion directory used to compute the divergence score"
+TIMELIMIT_FACTOR_HELP = """\
+Kill the simulation when a frame exceeds the median time per frame multiplied
+by this factor (0 is no limit)"""
+TIMELIMIT_WARMUP_HELP = "Frames simulated before to use the median time"
+TIMELIMIT_BASELINE_HELP = """\
+Time per frame learned from previous caches used during the warmup"""
+CHECKPOINT_INTERVAL_HELP = """\
+Save a checkpoint scene every n frames to allow resume (0 is no checkpoint)"""
+RESUME_HELP = "Resume the cache from the last checkpoint saved"
+ISOLATE_HELP = "Disable the solvers which doesn't simulate the cached nodes"
+NO_PLAYBLAST_HELP = "Record the cache without playblast"
+PLAYBLAST_ONLY_HELP = "Render the playblast of the cache already recorded"
+INPUTS_HELP = """\
+Json list of cacheversion directories plugged as input shapes before the cache
+"""
+DETECTORS_HELP = """\
+Json list of explosion detectors. e.i.
+'[{"name": "velocity", "threshold": 50.0, "stride": 1, "budget": 0.05}]'"""
+ENCODINGS_HELP = """\
+Json dict of playblast encoding presets. e.i.
+'{"review": "-c:v libx264 -crf 23 -pix_fmt yuv420p"}'"""
+TARGETS_HELP = """\
+Json list of additional cameras and resolutions captured. e.i.
+'[{"camera": "closeupShape", "width": 640, "height": 360}]'"""
 
 INFOS = """\
 Scripts Arguments:
@@ -49,11 +140,22 @@ Scripts Arguments:
     - Blasted camera = {arguments.playblast_camera}
     - Time limit = {arguments.timelimit}
     - Stretch max supported = {arguments.stretchmax} * input edge length
-    - Attribute override = {arguments.attribute_override}
-    - Attribute override value = {arguments.attribute_override_value}
+    - Attribute overrides = {arguments.overrides}
+    - Checkpoint interval = {arguments.checkpoint_interval}
+    - Resume = {arguments.resume}
+    - Isolate solvers = {arguments.isolate}
+    - No playblast = {arguments.no_playblast}
+    - Playblast only = {arguments.playblast_only}
+    - Inputs = {arguments.inputs}
+    - Detectors = {arguments.detectors}
+    - Encodings = {arguments.encodings}
+    - Additional captures = {arguments.targets}
 """
+# set in the children processes forked by the --fork-wedges mode.
+_forked_child = False
 
-try:
+
+def parse_arguments(args=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('directory', help="Cache Version directory")
     parser.add_argument('scene', help="Maya file location")
@@ -67,123 +169,702 @@ try:
     parser.add_argument('playblast_camera', help="camershape name")
     parser.add_argument('timelimit', help=TIMELIMIT_HELP, type=int)
     parser.add_argument('stretchmax', help=STRETCH_LIMIT_HELP, type=int)
-    parser.add_argument('attribute_override', help=ATTRIBUTE_OVERRIDE_HELP)
-    parser.add_argument('attribute_override_value', help=ATTRIBUTE_OVERRIDE_VALUE_HELP, type=float)
-    arguments = parser.parse_args()
-
-    def force_log_info(message):
-        # remove all the existing logging handlers that can already set by
-        # default by maya. If those handlers aren't deleted, the module refuse
-        # to set is output in an external log file.
-        for handler in logging.root.handlers[:]:
-            logging.root.removeHandler(handler)
-        logfile = os.path.join(arguments.directory, 'infos.log')
-        logging.basicConfig(filename=logfile, level=logging.INFO)
-        logging.info(message)
-
-    # Log the arguments informations.
-    if arguments.attribute_override == "":
-        arguments.attribute_override = None
-        arguments.attribute_override_value = None
-    force_log_info(INFOS.format(arguments=arguments))
-
-    force_log_info("initializing maya ...")
-    from maya import cmds, mel
-    from ncachefactory.versioning import CacheVersion
-    from ncachefactory.cachemanager import record_in_existing_cacheversion
-    from ncachefactory.ncloth import is_output_too_streched
-    from ncachefactory.viewporttext import create_viewport_text
-    from ncachefactory.timecallbacks import (
-        add_to_time_callback, get_timespent_since_last_frame_set, time_verbose,
-        register_time_callback)
+    parser.add_argument('overrides', help=OVERRIDES_HELP, type=json.loads)
+    parser.add_argument('--fork-wedges', help=FORK_WEDGES_HELP, default=None)
+    parser.add_argument('--fork-jobs', help=FORK_JOBS_HELP, type=int, default=0)
+    parser.add_argument('--checkpoints', help=CHECKPOINTS_HELP, default="")
+    parser.add_argument('--reference', help=REFERENCE_HELP, default=None)
+    parser.add_argument(
+        '--timelimit-factor', help=TIMELIMIT_FACTOR_HELP, type=float,
+        default=0)
+    parser.add_argument(
+        '--timelimit-warmup', help=TIMELIMIT_WARMUP_HELP, type=int, default=5)
+    parser.add_argument(
+        '--timelimit-baseline', help=TIMELIMIT_BASELINE_HELP, type=float,
+        default=None)
+    parser.add_argument(
+        '--checkpoint-interval', help=CHECKPOINT_INTERVAL_HELP, type=int,
+        default=0)
+    parser.add_argument('--resume', help=RESUME_HELP, action='store_true')
+    parser.add_argument('--isolate', help=ISOLATE_HELP, action='store_true')
+    parser.add_argument(
+        '--no-playblast', help=NO_PLAYBLAST_HELP, action='store_true')
+    parser.add_argument(
+        '--playblast-only', help=PLAYBLAST_ONLY_HELP, action='store_true')
+    parser.add_argument(
+        '--inputs', help=INPUTS_HELP, type=json.loads, default=[])
+    parser.add_argument(
+        '--detectors', help=DETECTORS_HELP, type=json.loads, default=[])
+    parser.add_argument(
+        '--encodings', help=ENCODINGS_HELP, type=json.loads, default={})
+    parser.add_argument(
+        '--targets', help=TARGETS_HELP, type=json.loads, default=[])
+    return parser.parse_args(args)
+
+
+def force_log_info(directory, message):
+    # remove all the existing logging handlers that can already set by
+    # default by maya. If those handlers aren't deleted, the module refuse
+    # to set is output in an external log file.
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
+    logfile = os.path.join(directory, 'infos.log')
+    logging.basicConfig(filename=logfile, level=logging.INFO)
+    logging.info(message)
+
+
+def initialize_maya():
     import maya.standalone
     maya.standalone.initialize(name='python')
-    force_log_info("... maya initialized")
-
-    def simulation_sanity_checks(nodes, timelimit, stretchmax):
-        """ this function is a time changed callback which kill the
-        simulation in case of explosion detected """
-        result = False
-        if stretchmax > 0:
-            for node in nodes:
-                if is_output_too_streched(node, stretchmax):
-                    result = True
-                    message = "excessive strech detect for node: " + node
-                    logging.error(message)
-                    break
-
-        timespent = get_timespent_since_last_frame_set()
-        if timespent is not None:
-            if 0 < timelimit < timespent.seconds:
-                message = "simulation time exceeds the limit allowed: {}"
-                logging.error(message.format(timespent))
-                result = True
-
-        if result is True:
-            logging.error("User defined explosion limit reached.")
-            cmds.quit(force=True)
-            exit()
 
+
+def write_frame_progress(directory):
+    """ this function is a time changed callback which write the frame event
+    in the progress stream """
+    from maya import cmds
+    from ncachefactory.progress import write_progress_event, FRAME
+    from ncachefactory.telemetry import sample_resources, get_peak_memory
+    from ncachefactory.timecallbacks import get_timespent_since_last_frame_set
+
+    timespent = get_timespent_since_last_frame_set()
+    write_progress_event(
+        directory, FRAME,
+        frame=cmds.currentTime(query=True),
+        seconds=timespent.total_seconds() if timespent else None,
+        memory=get_peak_memory(),
+        **sample_resources())
+
+
+def kill_simulation(directory, message, **data):
+    from maya import cmds
+    from ncachefactory.progress import write_progress_event, KILLED
+
+    logging.error("User defined explosion limit reached.")
+    write_progress_event(
+        directory, KILLED, reason=message,
+        frame=cmds.currentTime(query=True), **data)
+    if _forked_child:
+        # the maya exit procedures are owned by the parent process.
+        force_log_info(directory, "process is terminated")
+        os._exit(1)
+    cmds.quit(force=True)
+    exit()
+
+
+def simulation_sanity_checks(directory, context, timelimit, stretchmax):
+    """ this function is a time changed callback which kill the
+    simulation in case of explosion detected """
+    from ncachefactory.timecallbacks import get_timespent_since_last_frame_set
+
+    messages = []
+    if stretchmax > 0:
+        for node in context.nodes:
+            summary = context.compute_stretch_summary(node, stretchmax)
+            if summary and summary['over']:
+                message = (
+                    "excessive strech detect for node: {}, {} edges over "
+                    "the limit, max ratio {:.2f}, 99th percentile {:.2f}")
+                message = message.format(
+                    node, summary['over'], summary['max'], summary['p99'])
+                logging.error(message)
+                messages.append(message)
+                break
+
+    timespent = get_timespent_since_last_frame_set()
+    if timespent is not None:
+        if 0 < timelimit < timespent.seconds:
+            message = "simulation time exceeds the limit allowed: {}"
+            message = message.format(timespent)
+            logging.error(message)
+            messages.append(message)
+
+    if messages:
+        kill_simulation(directory, ', '.join(messages))
+
+
+def run_detectors(directory, context, suite):
+    """ this function is a time changed callback which run the explosion
+    detectors due at the current frame and kill the simulation if one of
+    them fires """
+    from maya import cmds
+    from ncachefactory.versioning import CacheVersion
+
+    frame = cmds.currentTime(query=True)
+    detection = suite.check(frame, context.get_samples)
+    for message in suite.pop_messages():
+        force_log_info(directory, message)
+    if detection is None:
+        return
+    CacheVersion(directory).set_detection(detection)
+    message = "{detector} detector fired on {node}: {reason}"
+    message = message.format(**detection)
+    logging.error(message)
+    kill_simulation(directory, message, detection=detection)
+
+
+def check_adaptive_timelimit(directory, adaptive_timelimit):
+    """ this function is a time changed callback which collect the frames
+    timings and kill the simulation if a frame is too slow """
+    from ncachefactory.timecallbacks import get_timespent_since_last_frame_set
+
+    timespent = get_timespent_since_last_frame_set()
+    if timespent is None:
+        return
+    seconds = timespent.total_seconds()
+    threshold = adaptive_timelimit.threshold
+    if adaptive_timelimit.add_frame_time(seconds) is False:
+        return
+    message = "frame simulated in {:.2f}s exceeds the adaptive limit: {:.2f}s"
+    message = message.format(seconds, threshold)
+    logging.error(message)
+    kill_simulation(directory, message)
+
+
+def record_checkpoint_scores(
+        directory, context, start_frame, checkpoints, reference, start_time):
+    """ this function is a time changed callback which record the successive
+    halving scores when a checkpoint frame is reached """
+    from maya import cmds
+    from ncachefactory import halving
+    from ncachefactory.progress import write_progress_event, SCORES
+
+    frame = int(cmds.currentTime(query=True))
+    if frame not in checkpoints:
+        return
+    summaries = [context.compute_stretch_summary(n) for n in context.nodes]
+    stretch = max([s['max'] for s in summaries if s] or [0])
+    points = []
+    for node in context.nodes:
+        # the mesh points can be a numpy array, it can't be tested as bool.
+        node_points = context.get_output_points(node)
+        if node_points is not None:
+            points.extend(node_points)
+    halving.save_points_snapshot(directory, frame, points)
+    divergence = None
+    if reference:
+        reference_points = halving.load_points_snapshot(reference, frame)
+        if reference_points is not None:
+            divergence = halving.compute_divergence(points, reference_points)
+    scores = {
+        halving.STRETCH: stretch,
+        halving.DIVERGENCE: divergence,
+        halving.TIME_PER_FRAME: (
+            (time.time() - start_time) / max(1, frame - start_frame))}
+    halving.record_checkpoint_scores(directory, frame, scores)
+    write_progress_event(directory, SCORES, frame=frame, scores=scores)
+    message = "checkpoint {} scores: {}".format(frame, scores)
+    force_log_info(directory, message)
+
+
+def save_checkpoint(directory, nodes, start_frame, interval, start_time):
+    """ this function is a time changed callback which set the current
+    dynamic state as initial state and save the scene in the version directory
+    every interval frames. Only the last checkpoint is kept.
+    The cache is recorded by a single maya command, the scene can't be saved
+    between two frames outside of the callback. The scene is saved in a
+    temporary file renamed once complete, a failed save is skipped and the
+    previous checkpoint is kept. """
+    from maya import cmds
+    from ncachefactory.versioning import (
+        CacheVersion, get_checkpoint_filename, list_checkpoints,
+        CHECKPOINT_FILENAME)
+    from ncachefactory.progress import write_progress_event, CHECKPOINT
+
+    frame = int(cmds.currentTime(query=True))
+    if frame <= start_frame or (frame - start_frame) % interval:
+        return
+    cloth_nodes = cmds.ls(nodes, type='nCloth')
+    if cloth_nodes:
+        cmds.nBase(cloth_nodes, edit=True, stuffStart=True)
+    scene = cmds.file(query=True, sceneName=True)
+    filename = get_checkpoint_filename(directory, frame)
+    # the temporary name isn't listed as checkpoint (see list_checkpoints).
+    temp = os.path.join(directory, CHECKPOINT_FILENAME.format('tmp'))
+    try:
+        cmds.file(rename=temp)
+        cmds.file(save=True, type='mayaBinary', force=True)
+    except RuntimeError:
+        message = "checkpoint at frame {} failed:\n{}".format(
+            frame, traceback.format_exc())
+        force_log_info(directory, message)
+        return
+    finally:
+        cmds.file(rename=scene)
+    os.rename(temp, filename)
+    for checkpoint_frame, checkpoint in list_checkpoints(directory):
+        if checkpoint_frame != frame:
+            os.remove(checkpoint)
+    # the infos are updated to describe the cache recorded until the
+    # checkpoint, if the process dies, the version stays consistent.
+    cacheversion = CacheVersion(directory)
+    cacheversion.set_range(nodes, start_frame=start_frame, end_frame=frame)
+    cacheversion.set_timespent(nodes, seconds=time.time() - start_time)
+    force_log_info(directory, "checkpoint saved at frame {}".format(frame))
+    write_progress_event(directory, CHECKPOINT, frame=frame, scene=filename)
+
+
+def record(arguments):
+    """ Open the scene and record the cache described by the arguments. This
+    expect maya already initialized. """
+    if arguments.resume:
+        resume(arguments)
+        return
+    if arguments.playblast_only:
+        open_scene(arguments)
+        record_playblast_in_opened_scene(arguments)
+        return
+    scene_open_time = open_scene(arguments)
+    record_scene_open_time(arguments.directory, scene_open_time)
+    record_in_opened_scene(arguments)
+
+
+def open_scene(arguments):
+    """ open the scene and return the time spent in seconds """
+    from maya import cmds
     # force dg evaluation to DG to ensure not multi thread usage.
     cmds.evaluationManager(mode="off")
-    force_log_info('open maya scene ...')
+    force_log_info(arguments.directory, 'open maya scene ...')
+    start_time = time.time()
     cmds.file(arguments.scene, open=True, force=True)
-    force_log_info('maya scene opened')
+    scene_open_time = time.time() - start_time
+    message = 'maya scene opened in {:.2f} seconds'.format(scene_open_time)
+    force_log_info(arguments.directory, message)
+    return scene_open_time
+
+
+def record_scene_open_time(directory, scene_open_time):
+    from ncachefactory.versioning import CacheVersion
+    from ncachefactory.progress import write_progress_event, SCENE_OPENED
+    CacheVersion(directory).set_batch_infos(scene_open_time=scene_open_time)
+    write_progress_event(directory, SCENE_OPENED, seconds=scene_open_time)
+
+
+def record_in_opened_scene(arguments):
+    from maya import cmds
+    from ncachefactory.versioning import CacheVersion
+    from ncachefactory.cachemanager import record_in_existing_cacheversion
+    from ncachefactory.progress import write_progress_event, STARTED, FINISHED
+    from ncachefactory.timecallbacks import save_frame_profile
+
     cacheversion = CacheVersion(arguments.directory)
 
-    attribute = arguments.attribute_override
-    value = arguments.attribute_override_value
-    if attribute:
+    for attribute, value in sorted(arguments.overrides.items()):
         if not cmds.objExists(attribute):
             msg = "{} doesn't exists and cannot be overrided".format(attribute)
             raise ValueError(msg)
         cmds.setAttr(attribute, value)
-        force_log_info("attribute \"{}\" set to {}".format(attribute, value))
+        message = "attribute \"{}\" set to {}".format(attribute, value)
+        force_log_info(arguments.directory, message)
 
-    text = '{}\n{}'.format(cacheversion.name, cacheversion.infos['comment'])
-    create_viewport_text(text, arguments.playblast_camera)
+    if arguments.inputs:
+        plug_inputs(arguments, cacheversion)
+    if arguments.isolate:
+        isolate_solvers(arguments)
 
     cmds.currentTime(arguments.start_frame, edit=True)
-    # add the check to callbacks
+    adaptive_timelimit = install_time_callbacks(arguments, time.time())
+    write_progress_event(
+        arguments.directory, STARTED,
+        nodes=arguments.nodes.split(', '),
+        start_frame=arguments.start_frame,
+        end_frame=arguments.end_frame)
+    record_in_existing_cacheversion(
+        cacheversion=cacheversion,
+        start_frame=arguments.start_frame,
+        end_frame=arguments.end_frame,
+        nodes=arguments.nodes.split(', '),
+        evaluate_every_frame=arguments.evaluate_every_frame,
+        save_every_evaluation=arguments.save_every_evaluation,
+        behavior=0,
+        playblast=not arguments.no_playblast,
+        playblast_viewport_options=get_playblast_viewport_options(arguments))
+    cacheversion.set_frame_timings(adaptive_timelimit.summary)
+    # when the cache is splitted in several processes, only the one which
+    # record the playblast save his profile.
+    if not arguments.no_playblast:
+        save_frame_profile(cacheversion)
+    write_progress_event(
+        arguments.directory, FINISHED, timings=adaptive_timelimit.summary)
+
+
+def record_playblast_in_opened_scene(arguments):
+    from ncachefactory.versioning import CacheVersion
+    from ncachefactory.cachemanager import record_cacheversion_playblast
+    from ncachefactory.timecallbacks import (
+        add_to_time_callback, time_verbose, register_time_callback)
+
+    cacheversion = CacheVersion(arguments.directory)
+    add_to_time_callback(time_verbose)
+    register_time_callback()
+    playblast = record_cacheversion_playblast(
+        cacheversion=cacheversion,
+        start_frame=arguments.start_frame,
+        end_frame=arguments.end_frame,
+        nodes=arguments.nodes.split(', '),
+        playblast_viewport_options=get_playblast_viewport_options(arguments))
+    force_log_info(arguments.directory, "playblast recorded: " + playblast)
+
+
+def plug_inputs(arguments, cacheversion):
+    """ plug the input cacheversions as input shapes and record them in the
+    lineage of the cacheversion """
+    from ncachefactory.versioning import CacheVersion
+    from ncachefactory.cachemanager import plug_cacheversion_to_inputmesh
+    from ncachefactory.scheduler import build_lineage
+
+    inputs = [CacheVersion(directory) for directory in arguments.inputs]
+    for input_ in inputs:
+        plug_cacheversion_to_inputmesh(input_)
+        message = "{} plugged as input shape".format(input_.name)
+        force_log_info(arguments.directory, message)
+    inputs_infos = {input_.directory: input_.infos for input_ in inputs}
+    cacheversion.set_lineage(build_lineage(inputs_infos))
+
+
+def isolate_solvers(arguments):
+    from ncachefactory.nucleus import disable_other_solvers
+    solvers = disable_other_solvers(arguments.nodes.split(', '))
+    if solvers:
+        message = "solvers disabled: {}".format(', '.join(solvers))
+        force_log_info(arguments.directory, message)
+
+
+def resume(arguments):
+    """ Open the last checkpoint scene saved in the version directory and
+    append the cache from the checkpoint frame to the end frame. """
+    from ncachefactory.versioning import get_last_checkpoint
+    from ncachefactory.progress import write_progress_event, RESUMED
+
+    frame, scene = get_last_checkpoint(arguments.directory)
+    if scene is None:
+        raise ValueError("no checkpoint found in " + arguments.directory)
+    message = "resume from checkpoint at frame {}".format(frame)
+    force_log_info(arguments.directory, message)
+    arguments.scene = scene
+    scene_open_time = open_scene(arguments)
+    write_progress_event(
+        arguments.directory, RESUMED, frame=frame, seconds=scene_open_time)
+    resume_in_opened_scene(arguments, frame)
+
+
+def resume_in_opened_scene(arguments, frame):
+    from maya import cmds
+    from ncachefactory.versioning import CacheVersion
+    from ncachefactory.cachemanager import (
+        append_to_cacheversion, connect_cacheversion)
+    from ncachefactory.progress import write_progress_event, FINISHED
+    from ncachefactory.timecallbacks import save_frame_profile
+
+    cacheversion = CacheVersion(arguments.directory)
+    nodes = arguments.nodes.split(', ')
+    # the checkpoint contains the dynamic state as initial state, the solvers
+    # have to start at the checkpoint frame.
+    for nucleus in cmds.ls(cmds.listHistory(nodes), type='nucleus'):
+        cmds.setAttr(nucleus + '.startFrame', frame)
+    if arguments.isolate:
+        isolate_solvers(arguments)
+    connect_cacheversion(cacheversion, nodes=nodes, behavior=0)
+    cmds.playbackOptions(max=arguments.end_frame)
+    cmds.currentTime(frame, edit=True)
+
+    timespents = [
+        node_infos.get('timespent') or 0
+        for node_infos in cacheversion.infos['nodes'].values()]
+    # the start time is shifted with the time already spent to keep the
+    # checkpoints timespent consistent.
+    start_time = time.time() - max(timespents or [0])
+    adaptive_timelimit = install_time_callbacks(arguments, start_time)
+    append_to_cacheversion(
+        cacheversion=cacheversion,
+        nodes=nodes,
+        evaluate_every_frame=arguments.evaluate_every_frame,
+        save_every_evaluation=arguments.save_every_evaluation,
+        playblast=not arguments.no_playblast,
+        playblast_viewport_options=get_playblast_viewport_options(arguments))
+    end_frame = cmds.currentTime(query=True)
+    cacheversion.set_range(
+        nodes, start_frame=arguments.start_frame, end_frame=end_frame)
+    cacheversion.set_frame_timings(adaptive_timelimit.summary)
+    if not arguments.no_playblast:
+        save_frame_profile(cacheversion, append=True)
+    write_progress_event(
+        arguments.directory, FINISHED, timings=adaptive_timelimit.summary)
+
+
+def install_time_callbacks(arguments, start_time):
+    """ register the sanity checks, the halving scores and the checkpoints
+    as time changed callbacks and return the adaptive time limit used """
+    from ncachefactory.timelimit import AdaptiveTimeLimit
+    from ncachefactory.timecallbacks import (
+        add_to_time_callback, time_verbose, register_time_callback)
+    from ncachefactory.sanity import create_sanity_context
+    from ncachefactory.detectors import DetectorSuite, create_detectors
+
+    # the meshes checked are resolved once before the simulation.
+    context = create_sanity_context(arguments.nodes.split(', '))
+    if context.invalid_nodes:
+        message = "nodes ignored by the sanity checks: {}".format(
+            ', '.join(context.invalid_nodes))
+        force_log_info(arguments.directory, message)
+    # the outputs are read once per frame for all the checks below.
+    add_to_time_callback(context.clear_samples)
     add_to_time_callback(time_verbose)
+    add_to_time_callback(partial(write_frame_progress, arguments.directory))
     func = partial(
         simulation_sanity_checks,
-        arguments.nodes.split(', '),
+        arguments.directory,
+        context,
         arguments.timelimit,
         arguments.stretchmax)
     add_to_time_callback(func)
+    if arguments.detectors:
+        suite = DetectorSuite(create_detectors(arguments.detectors))
+        func = partial(run_detectors, arguments.directory, context, suite)
+        add_to_time_callback(func)
+    if arguments.checkpoints:
+        func = partial(
+            record_checkpoint_scores,
+            arguments.directory,
+            context,
+            arguments.start_frame,
+            [int(frame) for frame in arguments.checkpoints.split(' ')],
+            arguments.reference,
+            start_time)
+        add_to_time_callback(func)
+    if arguments.checkpoint_interval > 0:
+        func = partial(
+            save_checkpoint,
+            arguments.directory,
+            arguments.nodes.split(', '),
+            arguments.start_frame,
+            arguments.checkpoint_interval,
+            start_time)
+        add_to_time_callback(func)
+    # the frame timings are always collected to learn the baseline used by
+    # the next caches.
+    adaptive_timelimit = AdaptiveTimeLimit(
+        factor=arguments.timelimit_factor,
+        warmup=arguments.timelimit_warmup,
+        baseline=arguments.timelimit_baseline)
+    func = partial(
+        check_adaptive_timelimit, arguments.directory, adaptive_timelimit)
+    add_to_time_callback(func)
     register_time_callback()
+    return adaptive_timelimit
 
+
+def get_playblast_viewport_options(arguments):
     display_values = [
         bool(int(value))
         for value in arguments.viewport_display_values.split(' ')]
     if display_values[-1] == 1:
         display_values[-1] = 0
         msg = 'Ornament option in viewport is not supported and turned off'
-        force_log_info(msg)
+        force_log_info(arguments.directory, msg)
 
     width, height = map(int, arguments.playblast_resolution.split(" "))
-    playblast_viewport_options = {
+    return {
         'width': width,
         'height': height,
         'viewport_display_values': display_values,
-        'camera': arguments.playblast_camera}
+        'camera': arguments.playblast_camera,
+        'burnin': get_burnin_infos(arguments),
+        'encodings': arguments.encodings,
+        'targets': arguments.targets}
+
 
+def get_burnin_infos(arguments):
+    """ return the cacheversion infos drawn on the playblast by the encoder
+    (see ncachefactory.encoding.format_burnin) """
+    from ncachefactory.versioning import CacheVersion
     cacheversion = CacheVersion(arguments.directory)
-    record_in_existing_cacheversion(
-        cacheversion=cacheversion,
-        start_frame=arguments.start_frame,
-        end_frame=arguments.end_frame,
-        nodes=arguments.nodes.split(', '),
-        evaluate_every_frame=arguments.evaluate_every_frame,
-        save_every_evaluation=arguments.save_every_evaluation,
-        behavior=0,
-        playblast=True,
-        playblast_viewport_options=playblast_viewport_options)
-    force_log_info("process is terminated")
+    return {
+        'name': cacheversion.name,
+        'comment': cacheversion.infos.get('comment'),
+        'overrides': arguments.overrides}
+
+
+def reset_scene():
+    """ Clean the callbacks installed by a job and open an empty scene to let
+    the worker ready for the next job. """
+    from maya import cmds
+    from ncachefactory.timecallbacks import (
+        unregister_time_callback, clear_time_callback_functions)
+    from ncachefactory.sanity import clear_sanity_context
+    from ncachefactory.playblast import close_movie_encoder
+    try:
+        unregister_time_callback()
+    except RuntimeError:
+        # no callback registered by the last job
+        pass
+    clear_time_callback_functions()
+    clear_sanity_context()
+    close_movie_encoder()
+    cmds.file(new=True, force=True)
+
+
+def record_failure(directory):
+    """ log the current exception and write it in the progress stream """
+    from ncachefactory.progress import write_progress_event, FAILED
+    error = traceback.format_exc()
+    logging.error(error)
+    write_progress_event(
+        directory, FAILED, error=error.strip().splitlines()[-1])
+
+
+def send_worker_message(directory, status):
+    message = json.dumps({'directory': directory, 'status': status})
+    sys.stdout.write(WORKER_MESSAGE_PREFIX + message + '\n')
+    sys.stdout.flush()
+
+
+def run_worker():
+    initialize_maya()
+    while True:
+        line = sys.stdin.readline()
+        # an empty string means the standard input is closed, the parent
+        # process doesn't need the worker anymore.
+        if not line:
+            break
+        if not line.strip():
+            continue
+        try:
+            arguments = parse_arguments(json.loads(line))
+        except (ValueError, SystemExit):
+            # argparse exits on invalid arguments, the worker has to stay
+            # alive and answer to not block his pool.
+            sys.stderr.write("invalid job: " + line)
+            send_worker_message(None, 'failed')
+            continue
+        status = 'finished'
+        force_log_info(arguments.directory, INFOS.format(arguments=arguments))
+        try:
+            record(arguments)
+        except Exception:
+            record_failure(arguments.directory)
+            status = 'failed'
+        force_log_info(arguments.directory, "process is terminated")
+        reset_scene()
+        send_worker_message(arguments.directory, status)
+
+
+def wait_forked_child(children):
+    """ wait the end of a forked child, write his exit status and record
+    his resource usage in his cacheversion infos """
+    from ncachefactory.versioning import CacheVersion
+    from ncachefactory.telemetry import wait_process
+
+    rusage = wait_process(-1)
+    directory = children.pop(rusage['pid'], None)
+    if directory is not None:
+        write_forked_status(directory, rusage['returncode'])
+        CacheVersion(directory).add_rusage(rusage)
+
+
+def write_forked_status(directory, returncode):
+    """ the children aren't owned by the monitor, the parent writes their
+    exit status in their cacheversion directory """
+    filename = os.path.join(directory, FORKED_STATUS_FILENAME)
+    with open(filename + '.tmp', 'w') as f:
+        f.write(str(returncode))
+    # the rename is atomic, the monitor never reads a partial file.
+    os.rename(filename + '.tmp', filename)
+
+
+def run_forked_wedging(arguments):
+    """ Open the scene once and fork the process for every wedging value.
+    Each child record his own cacheversion and the parent waits for all of
+    them. """
+    global _forked_child
+    wedges = json.loads(arguments.fork_wedges)
+    for directory, _ in wedges:
+        force_log_info(directory, "initializing maya ...")
+    initialize_maya()
+    for directory, _ in wedges:
+        force_log_info(directory, "... maya initialized")
+    scene_open_time = open_scene(arguments)
+    for directory, _ in wedges:
+        record_scene_open_time(directory, scene_open_time)
+
+    children = {}
+    for directory, overrides in wedges:
+        if 0 < arguments.fork_jobs <= len(children):
+            wait_forked_child(children)
+        # the job can be killed by the user before his fork.
+        if os.path.exists(os.path.join(directory, FORKED_KILL_FILENAME)):
+            force_log_info(directory, "process is terminated")
+            continue
+        pid = os.fork()
+        if pid == 0:
+            # child process, the scene is already loaded.
+            _forked_child = True
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            status = 1
+            arguments.directory = directory
+            arguments.overrides = overrides
+            try:
+                force_log_info(directory, INFOS.format(arguments=arguments))
+                record_in_opened_scene(arguments)
+                status = 0
+            except Exception:
+                record_failure(directory)
+            finally:
+                force_log_info(directory, "process is terminated")
+                # os._exit skip the python and maya exit procedures which are
+                # owned by the parent process.
+                os._exit(status)
+        filename = os.path.join(directory, FORKED_PID_FILENAME)
+        with open(filename + '.tmp', 'w') as f:
+            f.write(str(pid))
+        os.rename(filename + '.tmp', filename)
+        children[pid] = directory
+        # the kill file can be written by the monitor during the fork, before
+        # the pid file is available.
+        if os.path.exists(os.path.join(directory, FORKED_KILL_FILENAME)):
+            os.kill(pid, signal.SIGKILL)
+
+    while children:
+        wait_forked_child(children)
+
+
+def record_forked_wedging_failure(arguments):
+    """ the children record their own failure, the error of the parent
+    process is recorded in the wedges which aren't forked yet """
+    for directory, _ in json.loads(arguments.fork_wedges):
+        if not os.path.exists(os.path.join(directory, FORKED_PID_FILENAME)):
+            record_failure(directory)
+            force_log_info(directory, "process is terminated")
+
+
+def terminate_forked_children(signum, frame):
+    # the parent is killed, that has to be propagated to the wedges children.
+    os.killpg(os.getpgid(0), signal.SIGKILL)
+
+
+def run():
+    arguments = parse_arguments()
+    if arguments.fork_wedges:
+        os.setpgid(0, 0)
+        signal.signal(signal.SIGTERM, terminate_forked_children)
+        try:
+            run_forked_wedging(arguments)
+        except Exception:
+            record_forked_wedging_failure(arguments)
+        return
+    try:
+        # Log the arguments informations.
+        force_log_info(arguments.directory, INFOS.format(arguments=arguments))
+        force_log_info(arguments.directory, "initializing maya ...")
+        initialize_maya()
+        force_log_info(arguments.directory, "... maya initialized")
+        record(arguments)
+    except Exception:
+        record_failure(arguments.directory)
+    force_log_info(arguments.directory, "process is terminated")
 
-except Exception:
-    import traceback
-    logging.error(traceback.format_exc())
-    force_log_info("process is terminated")
 
+if __name__ == "__main__":
+    if sys.argv[1:] == [WORKER_FLAG]:
+        run_worker()
+    else:
+        run()
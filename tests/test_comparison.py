@@ -0,0 +1,43 @@
+import pytest
+from ncachefactory.comparison import (
+    build_comparison_arguments, build_comparison_filtergraph,
+    get_comparison_offsets, sanitize_label, SIDE_BY_SIDE, WIPE, DIFFERENCE)
+
+
+def test_comparison_offsets():
+    assert get_comparison_offsets([[10, 50], [15, 60]]) == [0, 5]
+    assert get_comparison_offsets([[20, 50], [10, 30]]) == [10, 0]
+
+
+def test_side_by_side_filtergraph():
+    graph = build_comparison_filtergraph(
+        playblast_counts=[1, 2], offsets=[0, 5], names=['a', 'b'],
+        mode=SIDE_BY_SIDE)
+    chains = graph.split(';')
+    assert chains[0].startswith('[0:v]setsar=1,drawtext=')
+    assert chains[1].startswith(
+        '[1:v][2:v]concat=n=2:v=1:a=0,setsar=1,tpad=start=5:color=black')
+    assert chains[-1] == '[v0][v1]hstack=inputs=2[out]'
+
+
+def test_wipe_and_difference_filtergraph():
+    graph = build_comparison_filtergraph(
+        [1, 1, 1], [0, 0, 0], ['a', 'b', 'c'], WIPE)
+    assert graph.endswith('[w1][s2]overlay=x=W*2/3:y=0[out]')
+    graph = build_comparison_filtergraph(
+        [1, 1], [0, 0], ['a', 'b'], DIFFERENCE)
+    assert '[v0]split=1[r1]' in graph
+    assert graph.endswith('[out]')
+    assert 'hstack' not in graph
+    with pytest.raises(ValueError):
+        build_comparison_filtergraph([1], [0], ['a'], SIDE_BY_SIDE)
+
+
+def test_comparison_arguments():
+    arguments = build_comparison_arguments(
+        'ffmpeg', [['a.mp4'], ['b0.mp4', 'b1.mp4']], [[1, 10], [1, 10]],
+        ['a', 'b'], SIDE_BY_SIDE, 'out.mp4')
+    assert arguments[:4] == ['ffmpeg', '-y', '-loglevel', 'error']
+    assert arguments.count('-i') == 3
+    assert arguments[-1] == 'out.mp4'
+    assert sanitize_label("it's:v1") == 'it_s_v1'
@@ -0,0 +1,59 @@
+from ncachefactory.detectors import (
+    DetectorSuite, NodeSample, create_detectors, VELOCITY, BOUNDING_BOX,
+    NOT_FINITE, SELF_PENETRATION)
+
+
+def create_sample(points, ratios=None, is_mesh=True):
+    return NodeSample('node', points, lambda _: ratios, is_mesh=is_mesh)
+
+
+def test_detectors():
+    settings = [
+        {'name': VELOCITY, 'threshold': 2.0},
+        {'name': BOUNDING_BOX, 'threshold': 3.0},
+        {'name': NOT_FINITE}]
+    suite = DetectorSuite(create_detectors(settings))
+    assert suite.detectors[0].name == NOT_FINITE
+    points = [0.0, 0.0, 0.0, 1.0, 1.0, 1.0]
+    assert suite.check(1, lambda: [create_sample(points)]) is None
+    points = [0.0, 0.0, 0.0, 1.0, 1.0, 2.5]
+    assert suite.check(2, lambda: [create_sample(points)]) is None
+    points = [0.0, 0.0, 0.0, 1.0, 1.0, 5.0]
+    detection = suite.check(3, lambda: [create_sample(points)])
+    assert detection['detector'] == VELOCITY
+    assert detection['node'] == 'node'
+    assert detection['frame'] == 3
+    points = [0.0, 0.0, float('nan'), 1.0, 1.0, 5.0]
+    detection = suite.check(4, lambda: [create_sample(points)])
+    assert detection['detector'] == NOT_FINITE
+
+
+def test_ratios_detectors():
+    settings = [{'name': SELF_PENETRATION, 'threshold': 0.3}]
+    suite = DetectorSuite(create_detectors(settings))
+    sample = create_sample([], [1.0, 0.1, 1.0, 1.0])
+    assert suite.check(1, lambda: [sample]) is None
+    sample = create_sample([], [1.0, 0.1, 0.1, 1.0])
+    assert suite.check(2, lambda: [sample])['detector'] == SELF_PENETRATION
+    # the hair curves don't have self penetration check.
+    sample = create_sample([], [1.0, 0.1, 0.1, 1.0], is_mesh=False)
+    assert suite.check(3, lambda: [sample]) is None
+
+
+def test_detectors_stride_and_budget():
+    settings = [{'name': NOT_FINITE, 'stride': 2, 'budget': 1e-9}]
+    suite = DetectorSuite(create_detectors(settings))
+    detector = suite.detectors[0]
+    calls = []
+
+    def samples():
+        calls.append(1)
+        return [create_sample([0.0, 0.0, 0.0])]
+
+    for frame in range(1, 11):
+        suite.check(frame, samples)
+    # the samples are created only for the frames checked.
+    assert len(calls) == 5
+    assert detector.stride == 4
+    assert len(suite.pop_messages()) == 1
+    assert suite.pop_messages() == []
@@ -0,0 +1,138 @@
+import os
+import time
+import struct
+import threading
+import subprocess
+from distutils.spawn import find_executable
+import pytest
+from ncachefactory.encoding import (
+    MovieEncoder, EncodingService, build_encoder_arguments, format_burnin,
+    build_preset_arguments, summarize_encodings, get_capture_filename,
+    add_jpeg_description, FINISHED, FAILED)
+
+
+FFMPEG = find_executable('ffmpeg')
+
+
+@pytest.mark.skipif(FFMPEG is None, reason="ffmpeg not found")
+def test_movie_encoder(tmpdir):
+    pattern = os.path.join(str(tmpdir), 'image.%06d.jpg')
+    subprocess.check_call([
+        FFMPEG, '-loglevel', 'error', '-f', 'lavfi', '-i',
+        'testsrc=size=64x64:rate=24', '-frames:v', '10', pattern])
+    output = os.path.join(str(tmpdir), 'movie.mp4')
+    encoder = MovieEncoder(FFMPEG, output)
+    encoder.start()
+    for i in range(1, 11):
+        encoder.add_image(pattern % i)
+    assert encoder.running
+    assert encoder.close() == 0
+    assert encoder.frames == 10
+    assert os.path.getsize(output) > 0
+
+
+def test_encoding_service():
+    service = EncodingService(size=2)
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+
+    def encode(value):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.01)
+        with lock:
+            state['running'] -= 1
+        if value == 3:
+            raise ValueError("corrupted image")
+        return value
+
+    callbacks = []
+    jobs = [
+        service.submit(lambda v=v: encode(v), callbacks.append)
+        for v in range(6)]
+    done = []
+    timeout = time.time() + 5
+    while len(done) < len(jobs) and time.time() < timeout:
+        done.extend(service.process_callbacks())
+        time.sleep(0.005)
+    service.terminate()
+    assert len(done) == len(jobs)
+    assert callbacks == done
+    assert state['peak'] <= 2
+    states = [job.state for job in jobs]
+    assert states == [FINISHED] * 3 + [FAILED] + [FINISHED] * 2
+    assert isinstance(jobs[3].error, ValueError)
+    results = [job.result for job in jobs if job.state == FINISHED]
+    assert results == [0, 1, 2, 4, 5]
+
+
+def test_encoding_service_broken_callback():
+    service = EncodingService(size=1)
+
+    def callback(job):
+        if job.result == 0:
+            raise RuntimeError("broken callback")
+        callbacks.append(job)
+
+    callbacks = []
+    jobs = [service.submit(lambda v=v: v, callback) for v in range(3)]
+    done = []
+    timeout = time.time() + 5
+    while len(done) < len(jobs) and time.time() < timeout:
+        done.extend(service.process_callbacks())
+        time.sleep(0.005)
+    service.terminate()
+    assert done == jobs
+    assert callbacks == jobs[1:]
+
+
+def test_burnin():
+    infos = {
+        'name': 'version_0003', 'comment': '',
+        'overrides': {'nClothShape1.stretchResistance': 50}}
+    text = format_burnin(infos, seconds=1.256)
+    assert text.split('\n') == [
+        'version_0003', 'nClothShape1.stretchResistance = 50',
+        '1.26 s/frame']
+    arguments = build_encoder_arguments(
+        'ffmpeg', 'movie.mp4', burnin=True, start_frame=101)
+    assert 'copy' not in arguments
+    burnin_filter = arguments[arguments.index('-vf') + 1]
+    assert "%{metadata\\:ImageDescription}" in burnin_filter
+    assert "frame %{eif\\:n+101\\:d}" in burnin_filter
+    # the text is sent in an EXIF segment inserted after the start of image.
+    data = add_jpeg_description(b'\xff\xd8\xff\xdb', text)
+    assert data[:4] == b'\xff\xd8\xff\xe1'
+    length = struct.unpack('>H', data[4:6])[0]
+    assert data[6:12] == b'Exif\0\0'
+    assert data[4 + length:] == b'\xff\xdb'
+    tiff = data[12:4 + length]
+    tag, _, count, offset = struct.unpack('<HHII', tiff[10:22])
+    assert tag == 0x010E
+    assert tiff[offset:offset + count] == text.encode('utf-8') + b'\0'
+
+
+def test_encoding_presets():
+    arguments = build_preset_arguments(
+        'ffmpeg', 'playblast_0000.mp4', 'playblast_0000.review.mp4',
+        '-c:v libx264 -crf 23')
+    assert arguments[-7:-1] == [
+        '-c:v', 'libx264', '-crf', '23', '-threads', '0']
+    infos_list = [
+        {'encodings': [
+            {'preset': 'review', 'size': 100, 'seconds': 2.0},
+            {'preset': 'proxy', 'size': 300, 'seconds': 1.0}]},
+        {'encodings': [{'preset': 'review', 'size': 200, 'seconds': 4.0}]},
+        {}]
+    summary = summarize_encodings(infos_list)
+    assert summary['review'] == {'count': 2, 'size': 150.0, 'seconds': 3.0}
+    assert summary['proxy']['count'] == 1
+
+
+def test_capture_filename():
+    filename = get_capture_filename(
+        '/cache/playblast_0000.mp4', 'rig:closeupShape', 640, 360)
+    assert filename == '/cache/playblast_0000.rig_closeupShape_640x360.mp4'
+    filename = get_capture_filename('ncache_playblast.mp4', '|cam', 320, 180)
+    assert filename == 'ncache_playblast._cam_320x180.mp4'
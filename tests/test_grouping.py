@@ -0,0 +1,12 @@
+from ncachefactory.arrayutils import group_by_shared_items
+
+
+def test_group_by_shared_items():
+    items_by_key = {
+        'cloth1': ['nucleus1'],
+        'cloth2': ['nucleus1', 'cloth3'],
+        'cloth3': ['nucleus2'],
+        'hair1': ['nucleus3']}
+    assert group_by_shared_items(items_by_key) == [
+        ['cloth1', 'cloth2', 'cloth3'], ['hair1']]
+    assert group_by_shared_items({}) == []
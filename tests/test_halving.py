@@ -0,0 +1,56 @@
+from ncachefactory.halving import (
+    SuccessiveHalving, compute_checkpoints, compute_divergence,
+    record_checkpoint_scores, save_points_snapshot, load_points_snapshot)
+
+
+class FakeProcess(object):
+    def __init__(self, returncode=None):
+        self.returncode = returncode
+
+    def poll(self):
+        return self.returncode
+
+
+def test_compute_checkpoints():
+    assert compute_checkpoints(0, 100) == [20, 40, 80]
+    assert compute_checkpoints(100, 150) == [110, 120, 140]
+
+
+def test_points_snapshot(tmpdir):
+    directory = str(tmpdir)
+    save_points_snapshot(directory, 20, [0.0, 1.0, 2.0])
+    assert list(load_points_snapshot(directory, 20)) == [0.0, 1.0, 2.0]
+    assert load_points_snapshot(directory, 40) is None
+    assert compute_divergence([0, 0, 0, 1, 1, 1], [0, 0, 1, 1, 1, 0]) == 1.0
+    assert compute_divergence([0, 0, 0], [0, 0, 0, 1, 1, 1]) is None
+
+
+def test_successive_halving(tmpdir):
+    killed = []
+    halving = SuccessiveHalving([20, 40], metric='stretch', keep_ratio=0.5)
+    for i, stretch in enumerate([1.5, 3.0, 1.1, 2.0]):
+        directory = tmpdir.mkdir(str(i)).strpath
+        halving.add_job(directory, FakeProcess(), killed.append)
+        if i < 3:
+            record_checkpoint_scores(directory, 20, {'stretch': stretch})
+    halving.update()
+    # the last job didn't reach the checkpoint yet.
+    assert not killed and halving.round == 0
+    record_checkpoint_scores(halving.jobs[3][0], 20, {'stretch': 2.0})
+    halving.update()
+    assert len(killed) == 2 and halving.round == 1
+    assert [job[0] for job in halving.survivors] == [
+        halving.jobs[2][0], halving.jobs[0][0]]
+
+
+def test_successive_halving_without_ranking(tmpdir):
+    killed = []
+    halving = SuccessiveHalving([20], metric='divergence', keep_ratio=0.5)
+    for i in range(3):
+        directory = tmpdir.mkdir(str(i)).strpath
+        halving.add_job(directory, FakeProcess(), killed.append)
+        # the divergence isn't computed without reference.
+        record_checkpoint_scores(directory, 20, {'divergence': None})
+    halving.update()
+    assert not killed and halving.round == 1
+    assert len(halving.survivors) == 3
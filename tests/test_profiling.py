@@ -0,0 +1,32 @@
+import time
+from ncachefactory.profiling import (
+    FrameProfile, summarize_profile, save_timings, load_timings,
+    get_monotonic_clock)
+
+
+def test_frame_profile(tmpdir):
+    profile = FrameProfile()
+    profile.add_frame(1, 2.0, 1.5, [('shoot_frame', 1.0, 0.5)])
+    profile.add_frame(2, 4.0, 3.5, [
+        ('time_verbose', 0.5, 0.5), ('shoot_frame', 1.0, 0.5),
+        ('shoot_frame', 0.5, 0.5)])
+    columns = profile.columns
+    assert columns == [
+        'frame', 'solver', 'solver cpu', 'shoot_frame', 'shoot_frame cpu',
+        'time_verbose', 'time_verbose cpu']
+    assert profile.rows == [
+        [1, 2.0, 1.5, 1.0, 0.5, 0.0, 0.0],
+        [2, 4.0, 3.5, 1.5, 1.0, 0.5, 0.5]]
+    summary = summarize_profile(columns, profile.rows)
+    assert summary['frames'] == 2
+    assert summary['totals']['solver'] == 6.0
+    assert summary['overhead'] == 3.0 / 9.0
+    save_timings(str(tmpdir), profile.rows)
+    assert load_timings(str(tmpdir), columns) == profile.rows
+
+
+def test_monotonic_clock():
+    clock = get_monotonic_clock()
+    start = clock()
+    time.sleep(0.01)
+    assert 0 < clock() - start < 1
@@ -0,0 +1,35 @@
+from ncachefactory.progress import (
+    ProgressReader, write_progress_event, get_progress_filename,
+    summarize_progress, STARTED, FRAME, KILLED, FINISHED)
+
+
+def test_progress_reader(tmpdir):
+    directory = str(tmpdir)
+    reader = ProgressReader(directory)
+    assert reader.read() == []
+    write_progress_event(directory, STARTED, start_frame=1, end_frame=10)
+    write_progress_event(directory, FRAME, frame=2, seconds=1.0, memory=10)
+    assert [e['event'] for e in reader.read()] == [STARTED, FRAME]
+    assert reader.read() == []
+    # a line partially written is read when it's complete.
+    with open(get_progress_filename(directory), 'a') as f:
+        f.write('{"event": "frame", "frame": 3, ')
+    assert reader.read() == []
+    with open(get_progress_filename(directory), 'a') as f:
+        f.write('"pid": 1, "seconds": 3.0, "memory": 20}\n')
+    assert reader.read()[0]['frame'] == 3
+    assert reader.failure is None
+    write_progress_event(directory, KILLED, reason='too slow')
+    reader.read()
+    assert reader.failure['reason'] == 'too slow'
+    summary = summarize_progress(reader.events)
+    assert summary['status'] == KILLED
+    assert summary['frame'] == 3
+    assert summary['seconds'] == 2.0
+    assert summary['memory'] == 20
+    # the events written before a skip are ignored.
+    reader.skip()
+    write_progress_event(directory, FINISHED)
+    reader.read()
+    assert reader.failure is None
+    assert summarize_progress(reader.events)['status'] == FINISHED
@@ -0,0 +1,109 @@
+import pytest
+from ncachefactory.scheduler import (
+    JobScheduler, ScheduledJob, MemoryAdmission, sort_by_dependencies,
+    build_lineage, find_outdated_directories, PENDING, RUNNING, CANCELLED,
+    FAILED)
+from ncachefactory.progress import (
+    ProgressReader, write_progress_event, FAILED as FAILED_EVENT, FRAME)
+
+
+class FakeProcess(object):
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+
+def test_sort_by_dependencies():
+    dependencies = {'c': ['b'], 'b': ['a', 'external'], 'a': []}
+    assert sort_by_dependencies(dependencies) == ['a', 'b', 'c']
+    with pytest.raises(ValueError):
+        sort_by_dependencies({'a': ['b'], 'b': ['a']})
+
+
+def test_job_scheduler():
+    processes = {}
+
+    def launch(key):
+        processes[key] = FakeProcess()
+        return processes[key]
+
+    scheduler = JobScheduler()
+    for key, depends_on in (('a', []), ('b', []), ('c', ['a']), ('d', ['b'])):
+        job = ScheduledJob(key, lambda key=key: launch(key), depends_on)
+        scheduler.add_job(job)
+    scheduler.update()
+    # independent branches run together
+    assert sorted(processes) == ['a', 'b']
+    assert scheduler.jobs[2].state == PENDING
+    processes['a'].returncode = 0
+    processes['b'].kill()
+    scheduler.update()
+    assert scheduler.jobs[2].state == RUNNING
+    assert scheduler.jobs[3].state == CANCELLED
+    assert scheduler.jobs[3].poll() == -9
+    assert scheduler.finished
+    with pytest.raises(ValueError):
+        scheduler.add_job(ScheduledJob('a', None, ['c']))
+
+
+def test_find_outdated_directories():
+    base = {'name': 'base', 'modification_time': 10}
+    layer = {
+        'modification_time': 20,
+        'lineage': build_lineage({'base': base})}
+    top = {'modification_time': 30, 'lineage': build_lineage({'layer': layer})}
+    infos = {'base': base, 'layer': layer, 'top': top}
+    assert find_outdated_directories(infos) == []
+    base['modification_time'] = 40
+    assert find_outdated_directories(infos) == ['layer', 'top']
+
+
+def test_scheduled_job_progress_failure(tmpdir):
+    directory = str(tmpdir)
+    write_progress_event(directory, FAILED_EVENT, error='previous cache')
+    process = FakeProcess()
+    job = ScheduledJob(
+        directory, lambda: process, progress=ProgressReader(directory))
+    job.start()
+    process.returncode = 0
+    assert job.state != FAILED
+    # the batch process return 0 even if the simulation raised an error.
+    write_progress_event(directory, FAILED_EVENT, error='ValueError')
+    assert job.state == FAILED
+
+
+def test_memory_admission(tmpdir):
+    processes = {}
+
+    def launch(key):
+        processes[key] = FakeProcess()
+        return processes[key]
+
+    admission = MemoryAdmission(
+        limit=1000, estimate=300, available_memory_function=lambda: None)
+    scheduler = JobScheduler(admission)
+    for key in ('a', 'b', 'c', 'd'):
+        directory = tmpdir.mkdir(key).strpath
+        job = ScheduledJob(
+            directory, lambda key=key: launch(key),
+            progress=ProgressReader(directory))
+        scheduler.add_job(job)
+    scheduler.update()
+    # the jobs without telemetry are expected to use the estimate.
+    assert len(processes) == 3
+    write_progress_event(scheduler.jobs[0].key, FRAME, frame=1, rss=600)
+    scheduler.update()
+    assert len(processes) == 3
+    processes['a'].returncode = 0
+    processes['b'].returncode = 0
+    scheduler.update()
+    # the peak reported by the first job is expected for the next ones.
+    assert len(processes) == 3
+    write_progress_event(scheduler.jobs[2].key, FRAME, frame=1, rss=100)
+    scheduler.update()
+    assert len(processes) == 4
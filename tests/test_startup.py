@@ -0,0 +1,65 @@
+"""
+Import time benchmark of the modules used by the batch workers. The modules
+are imported in a fresh interpreter, the maya modules are imported before the
+measure when they are available. The test fails if the import exceeds the
+budget or if a module loads a dependency reserved to the interface.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+STARTUP_BUDGET = 0.5
+WORKER_STARTUP_BUDGET = 2.0
+PURE_MODULES = (
+    'ncachefactory.arrayutils', 'ncachefactory.comparison',
+    'ncachefactory.detectors', 'ncachefactory.encoding',
+    'ncachefactory.halving', 'ncachefactory.profiling',
+    'ncachefactory.progress', 'ncachefactory.scheduler',
+    'ncachefactory.stretch', 'ncachefactory.telemetry',
+    'ncachefactory.thumbnails', 'ncachefactory.timelimit',
+    'ncachefactory.versioning', 'ncachefactory.wedging')
+WORKER_MODULES = (
+    'ncachefactory.cachemanager', 'ncachefactory.sanity',
+    'ncachefactory.timecallbacks', 'ncachefactory.nucleus',
+    'ncachefactory.playblast')
+HEAVY_MODULES = 'pymel.core', 'PySide2.QtWidgets', 'maya.OpenMayaUI'
+BENCHMARK_SCRIPT = """
+import sys
+import json
+import time
+try:
+    import maya.cmds
+    import maya.api.OpenMaya
+except ImportError:
+    pass
+start = time.time()
+for name in sys.argv[1:]:
+    __import__(name)
+seconds = time.time() - start
+heavy_modules = [name for name in {} if name in sys.modules]
+print(json.dumps({{'seconds': seconds, 'heavy_modules': heavy_modules}}))
+""".format(HEAVY_MODULES)
+
+
+def measure_import(modules):
+    arguments = [sys.executable, '-c', BENCHMARK_SCRIPT] + list(modules)
+    output = subprocess.check_output(arguments, cwd=ROOT)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def test_pure_modules_startup():
+    result = measure_import(PURE_MODULES)
+    assert result['heavy_modules'] == []
+    assert result['seconds'] < STARTUP_BUDGET
+
+
+def test_worker_modules_startup():
+    pytest.importorskip('maya.cmds')
+    result = measure_import(WORKER_MODULES)
+    assert result['heavy_modules'] == []
+    assert result['seconds'] < WORKER_STARTUP_BUDGET
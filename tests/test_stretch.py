@@ -0,0 +1,20 @@
+from ncachefactory import stretch
+from ncachefactory.stretch import StretchChecker
+
+
+def test_stretch_checker(monkeypatch):
+    # a square with a diagonal, the top edge is stretched twice.
+    rest_points = [0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0]
+    points = [0, 0, 0, 1, 0, 0, 1, 1, 0, -1, 1, 0]
+    edges = [0, 1, 1, 2, 2, 3, 3, 0, 0, 2]
+    for numpy in set([stretch.numpy, None]):
+        monkeypatch.setattr(stretch, 'numpy', numpy)
+        checker = StretchChecker(edges, rest_points)
+        ratios = [round(r, 3) for r in checker.compute_ratios(points)]
+        assert ratios == [1.0, 1.0, 2.0, 1.414, 1.0]
+        summary = checker.summarize(points, tolerance=1.5)
+        assert summary['edges'] == 5
+        assert summary['max'] == 2.0
+        assert summary['p50'] == 1.0
+        assert summary['over'] == 1
+        assert checker.summarize(rest_points)['over'] is None
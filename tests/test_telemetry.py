@@ -0,0 +1,42 @@
+import os
+import sys
+import pytest
+from ncachefactory.telemetry import (
+    sample_resources, summarize_resources, extract_resource_series,
+    wait_process, RESOURCE_KEYS)
+
+
+def test_summarize_resources():
+    assert summarize_resources([{'event': 'started', 'pid': 1}]) is None
+    events = [
+        {'pid': 1, 'frame': 1, 'rss': 100.0, 'cpu': 1.0, 'files': 10},
+        {'pid': 2, 'frame': 1, 'rss': 200.0, 'cpu': 2.0, 'files': None},
+        {'pid': 1, 'frame': 2, 'rss': 150.0, 'cpu': 3.0, 'files': 12}]
+    summary = summarize_resources(events)
+    assert summary['rss'] == 350.0
+    assert summary['peak_rss'] == 200.0
+    assert summary['cpu'] == 5.0
+    assert summary['files'] == 12
+    assert summary['read_bytes'] is None
+    series = extract_resource_series(events, 'rss')
+    assert series == [(1, 300.0), (2, 150.0)]
+
+
+def test_sample_resources():
+    resources = sample_resources()
+    assert sorted(resources) == sorted(RESOURCE_KEYS)
+    assert resources['cpu'] >= 0
+    if sys.platform.startswith('linux'):
+        assert resources['rss'] > 0
+        assert resources['files'] > 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="fork not available")
+def test_wait_process():
+    pid = os.fork()
+    if pid == 0:
+        os._exit(3)
+    rusage = wait_process(pid)
+    assert rusage['pid'] == pid
+    assert rusage['returncode'] == 3
+    assert rusage['maxrss'] > 0
@@ -0,0 +1,44 @@
+import os
+import time
+from ncachefactory.thumbnails import (
+    build_poster_arguments, build_sprites_arguments, get_frame_count,
+    get_thumbnail_filenames, is_thumbnail_outdated)
+
+
+def test_thumbnail_filenames():
+    directory = os.path.join('workspace', 'version_003')
+    poster, sprites = get_thumbnail_filenames(directory + os.sep)
+    thumbnails = os.path.join('workspace', 'thumbnails')
+    assert poster == os.path.join(thumbnails, 'version_003.poster.jpg')
+    assert sprites == os.path.join(thumbnails, 'version_003.sprites.jpg')
+
+
+def test_thumbnail_outdated(tmpdir):
+    directory = os.path.join(str(tmpdir), 'version_000')
+    os.makedirs(directory)
+    playblast = os.path.join(directory, 'playblast_0000.mp4')
+    assert not is_thumbnail_outdated(directory, [playblast])
+    open(playblast, 'w').close()
+    assert is_thumbnail_outdated(directory, [playblast])
+    os.makedirs(os.path.join(str(tmpdir), 'thumbnails'))
+    for filename in get_thumbnail_filenames(directory):
+        open(filename, 'w').close()
+    past = time.time() - 10
+    os.utime(playblast, (past, past))
+    assert not is_thumbnail_outdated(directory, [playblast])
+
+
+def test_thumbnail_arguments():
+    infos = {
+        'start_frame': 1, 'end_frame': 100,
+        'nodes': {'a': {'range': (1, 64)}, 'b': {'range': (1, 60)}}}
+    assert get_frame_count(infos) == 64
+    assert get_frame_count({'start_frame': 1, 'end_frame': 100}) == 100
+    arguments = build_poster_arguments('ffmpeg', ['a.mp4'], 'p.jpg', 32)
+    graph = arguments[arguments.index('-filter_complex') + 1]
+    assert graph == "select='gte(n\\,32)',scale=160:-2"
+    arguments = build_sprites_arguments(
+        'ffmpeg', ['a.mp4', 'b.mp4'], 's.jpg', 64)
+    graph = arguments[arguments.index('-filter_complex') + 1]
+    assert graph.startswith('[0:v][1:v]concat=n=2:v=1:a=0,')
+    assert graph.endswith("select='not(mod(n\\,4))',scale=160:-2,tile=4x4")
@@ -0,0 +1,31 @@
+from ncachefactory.timelimit import (
+    AdaptiveTimeLimit, compute_timelimit_baseline, median)
+
+
+def test_median():
+    assert median([3, 1, 2]) == 2
+    assert median([4, 1, 2, 3]) == 2.5
+    assert median([]) is None
+
+
+def test_compute_timelimit_baseline():
+    infos_list = [
+        {'scene': 'a.ma', 'frame_timings': {'median': 2.0}},
+        {'scene': 'a.ma', 'nodes': {'n': {'timespent': 40, 'range': (0, 10)}}},
+        {'batch': {'source_scene': 'a.ma'}, 'frame_timings': {'median': 3.0}},
+        {'scene': 'b.ma', 'frame_timings': {'median': 50.0}}]
+    assert compute_timelimit_baseline(infos_list, 'a.ma') == 3.0
+    assert compute_timelimit_baseline(infos_list, 'c.ma') is None
+
+
+def test_adaptive_timelimit():
+    limit = AdaptiveTimeLimit(factor=3, warmup=3, baseline=2.0, minimum=1.0)
+    # the baseline is used during the warm up.
+    assert limit.add_frame_time(5.0) is False
+    assert limit.add_frame_time(7.0) is True
+    assert limit.add_frame_time(1.0) is False
+    # the rolling median is used after.
+    assert limit.add_frame_time(15.0) is False
+    assert limit.add_frame_time(22.0) is True
+    assert limit.summary['frames'] == 5
+    assert AdaptiveTimeLimit(factor=0).add_frame_time(1000) is False
@@ -0,0 +1,32 @@
+import os
+from ncachefactory.versioning import (
+    CacheVersion, INFOS_FILENAME, LOCK_FILENAME, save_json,
+    get_checkpoint_filename, list_checkpoints, get_last_checkpoint)
+
+
+def test_checkpoints(tmpdir):
+    directory = str(tmpdir)
+    assert get_last_checkpoint(directory) == (None, None)
+    for frame in (110, 90, 100):
+        open(get_checkpoint_filename(directory, frame), 'w').close()
+    tmpdir.join('checkpoint_backup.mb').write('')
+    frames = [frame for frame, _ in list_checkpoints(directory)]
+    assert frames == [90, 100, 110]
+    frame, filename = get_last_checkpoint(directory)
+    assert frame == 110
+    assert filename == get_checkpoint_filename(directory, 110)
+
+
+def test_locked_infos(tmpdir):
+    directory = str(tmpdir)
+    save_json(os.path.join(directory, INFOS_FILENAME), {'nodes': {}})
+    cacheversion1 = CacheVersion(directory)
+    cacheversion2 = CacheVersion(directory)
+    # the second instance has outdated infos, the edit of the first one
+    # have to be kept.
+    with cacheversion1.locked_infos() as infos:
+        infos['nodes']['cloth1'] = {'range': [1, 10]}
+    with cacheversion2.locked_infos() as infos:
+        infos['nodes']['cloth2'] = {'range': [1, 10]}
+    assert sorted(CacheVersion(directory).infos['nodes']) == ['cloth1', 'cloth2']
+    assert not os.path.exists(os.path.join(directory, LOCK_FILENAME))
@@ -0,0 +1,41 @@
+import pytest
+from ncachefactory.wedging import (
+    compute_wedging_design, deduplicate_overrides, GRID, RANDOM,
+    LATIN_HYPERCUBE)
+
+
+PARAMETERS = [
+    {'attribute': 'nCloth1.stretchResistance', 'values': [1.0, 10.0, 100.0]},
+    {'attribute': 'nCloth1.bendResistance', 'values': [0.0, 1.0]}]
+
+
+def test_grid_design():
+    overrides = compute_wedging_design(PARAMETERS, GRID)
+    assert len(overrides) == 6
+    assert overrides[0] == {
+        'nCloth1.stretchResistance': 1.0, 'nCloth1.bendResistance': 0.0}
+    with pytest.raises(ValueError):
+        compute_wedging_design(PARAMETERS, GRID, budget=5)
+
+
+def test_random_designs():
+    for method in (RANDOM, LATIN_HYPERCUBE):
+        overrides = compute_wedging_design(PARAMETERS, method, 8, seed=12)
+        assert len(overrides) == 8
+        assert overrides == compute_wedging_design(PARAMETERS, method, 8, seed=12)
+        for override in overrides:
+            assert 1.0 <= override['nCloth1.stretchResistance'] <= 100.0
+            assert 0.0 <= override['nCloth1.bendResistance'] <= 1.0
+        with pytest.raises(ValueError):
+            compute_wedging_design(PARAMETERS, method)
+
+
+def test_latin_hypercube_strata():
+    overrides = compute_wedging_design(PARAMETERS, LATIN_HYPERCUBE, 4, seed=3)
+    strata = sorted(int(o['nCloth1.bendResistance'] * 4) for o in overrides)
+    assert strata == [0, 1, 2, 3]
+
+
+def test_deduplicate_overrides():
+    overrides = [{'a': 1.0001}, {'a': 1.0002}, {'a': 2.0}]
+    assert deduplicate_overrides(overrides, 2) == [{'a': 1.0001}, {'a': 2.0}]